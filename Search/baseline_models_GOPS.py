@@ -2,6 +2,7 @@ import re
 from typing import Dict, List
 from Search.headers import *
 from Search.prompts import *
+from Search.llm_batching import batch_single_action
 
 # Parse helper funcs
 def parse_bracketed_list(string: str) -> List[str]:
@@ -49,26 +50,64 @@ class GOPSState(State):
         stochastic: a random card is revealed
         simultaneous: both players choose a card to play
         dummy: end states
+
+    In canonical mode the id is canonical_key() instead of the full history, so that histories that
+    reach the same strategic position share one node in ValueGraph and one transposition table entry
     '''
 
-    def __init__(self, state_type, prize_cards, player_cards, opponent_cards, num_cards, done=False, reward=0.0):
+    def __init__(self, state_type, prize_cards, player_cards, opponent_cards, num_cards, done=False, reward=0.0, canonical=False):
         self.prize_cards = tuple(prize_cards)
         self.player_cards = tuple(player_cards)
         self.opponent_cards = tuple(opponent_cards)
+        self.num_cards = num_cards
+        self.canonical = canonical
 
         # should call super first, otherwise state_type will be overwritten
-        id = tuple([self.prize_cards, self.player_cards, self.opponent_cards, num_cards, state_type])
+        if canonical:
+            id = self.canonical_key(state_type)
+        else:
+            id = tuple([self.prize_cards, self.player_cards, self.opponent_cards, num_cards, state_type])
         # turn = self.STATE_TYPES[state_type]
         super().__init__(id, state_type, done=done, reward=reward)
 
-        self.num_cards = num_cards
+    def canonical_key(self, state_type=None):
+        '''
+        Returns a key that is the same for all histories that reach the same strategic position:
+        the same cards left in both hands and in the prize deck, the same contested points and
+        the same score difference. The order in which cards were played does not matter, and
+        neither do the scores themselves since the value of a state is the final score difference
+
+        Args:
+            state_type: state type to use in the key, defaults to the state type of the state
+
+        Returns:
+            key: (state_type, num_cards, player hand, opponent hand, prize deck, contested points, score difference)
+        '''
+        if state_type is None:
+            state_type = self.state_type
+        player_score, opponent_score, contested_points = self.score_summary()
+        return (state_type, self.num_cards, self._remaining(self.player_cards), self._remaining(self.opponent_cards),
+                self._remaining(self.prize_cards), contested_points, player_score - opponent_score)
+
+    def _remaining(self, cards):
+        '''
+        Returns the sorted tuple of cards from 1 to num_cards that are not in cards
+        '''
+        return tuple(card for card in range(1, self.num_cards+1) if card not in cards)
 
     def copy(self):
         '''
         Returns a copy of the state
         '''
         return GOPSState(self.state_type, self.prize_cards, self.player_cards, 
-                         self.opponent_cards, self.num_cards, self.done, self.reward)
+                         self.opponent_cards, self.num_cards, self.done, self.reward, self.canonical)
+
+    def to_canonical(self):
+        '''
+        Returns a copy of the state in canonical mode
+        '''
+        return GOPSState(self.state_type, self.prize_cards, self.player_cards,
+                         self.opponent_cards, self.num_cards, self.done, self.reward, canonical=True)
     
     def calculate_score(self):
         '''
@@ -86,6 +125,30 @@ class GOPSState(State):
                 opponent_score += contested_points
                 contested_points = 0
         return (player_score, opponent_score)
+
+    def score_summary(self):
+        '''
+        Calculates the scores of both players from the rounds played so far, and the contested points,
+        which are the points of revealed prize cards that have not been won yet (including the prize card
+        of the current round in simultaneous states)
+
+        Returns:
+            player_score, opponent_score, contested_points
+        '''
+        contested_points = 0
+        player_score = 0
+        opponent_score = 0
+        for idx, single_score in enumerate(self.prize_cards):
+            contested_points += single_score
+            if idx >= len(self.player_cards):
+                continue
+            if self.player_cards[idx] > self.opponent_cards[idx]:
+                player_score += contested_points
+                contested_points = 0
+            elif self.player_cards[idx] < self.opponent_cards[idx]:
+                opponent_score += contested_points
+                contested_points = 0
+        return (player_score, opponent_score, contested_points)
         
 class GOPSForwardTransitor(ForwardTransitor):
 
@@ -174,9 +237,192 @@ class GOPSForwardTransitor(ForwardTransitor):
             raise ValueError('Invalid state type: ' + state_type)
         
 
-        out_state = GOPSState(state_type, prize_cards, player_cards, opponent_cards, num_cards, done, reward)
+        out_state = GOPSState(state_type, prize_cards, player_cards, opponent_cards, num_cards, done, reward, state.canonical)
         return out_state
 
+class GOPSBitmaskState(GOPSState):
+    '''
+    GOPS state backed by integers, for searches that call the transitor many times
+
+    Bit card-1 of player_mask, opponent_mask and prize_mask is set if the card has been played or revealed.
+    The histories are the cards in the order they were played, packed into integers with card_bits bits
+    per card and the latest card in the lowest bits. Scores and contested points are maintained
+    incrementally by GOPSBitmaskForwardTransitor, with the same convention as GOPSState.score_summary.
+
+    prize_cards, player_cards and opponent_cards are decoded from the histories when accessed, so the state
+    can be used with the GOPS enumerators and value heuristics
+    '''
+
+    def __init__(self, state_type, num_cards, player_mask=0, opponent_mask=0, prize_mask=0,
+                 player_history=0, opponent_history=0, prize_history=0,
+                 player_score=0, opponent_score=0, contested_points=0, done=False, reward=0.0, canonical=False):
+        self.num_cards = num_cards
+        self.card_bits = num_cards.bit_length()
+        self.player_mask = player_mask
+        self.opponent_mask = opponent_mask
+        self.prize_mask = prize_mask
+        self.player_history = player_history
+        self.opponent_history = opponent_history
+        self.prize_history = prize_history
+        self.player_score = player_score
+        self.opponent_score = opponent_score
+        self.contested_points = contested_points
+        self.canonical = canonical
+
+        if canonical:
+            id = (state_type, num_cards, player_mask, opponent_mask, prize_mask, contested_points, player_score - opponent_score)
+        else:
+            id = (prize_history, player_history, opponent_history, num_cards, state_type)
+        State.__init__(self, id, state_type, done=done, reward=reward)
+
+    @classmethod
+    def from_state(cls, state: GOPSState):
+        '''
+        Returns the bitmask state with the same history as a GOPSState
+        '''
+        card_bits = state.num_cards.bit_length()
+        masks = []
+        histories = []
+        for cards in (state.player_cards, state.opponent_cards, state.prize_cards):
+            mask = 0
+            history = 0
+            for card in cards:
+                mask |= 1 << (card-1)
+                history = (history << card_bits) | card
+            masks.append(mask)
+            histories.append(history)
+        player_score, opponent_score, contested_points = state.score_summary()
+        return cls(state.state_type, state.num_cards, *masks, *histories, player_score, opponent_score,
+                   contested_points, state.done, state.reward, state.canonical)
+
+    def _decode(self, history):
+        '''
+        Returns the tuple of cards packed in history, in the order they were played
+        '''
+        cards = []
+        card_mask = (1 << self.card_bits) - 1
+        while history:
+            cards.append(history & card_mask)
+            history >>= self.card_bits
+        return tuple(reversed(cards))
+
+    @property
+    def prize_cards(self):
+        return self._decode(self.prize_history)
+
+    @property
+    def player_cards(self):
+        return self._decode(self.player_history)
+
+    @property
+    def opponent_cards(self):
+        return self._decode(self.opponent_history)
+
+    def get_masks(self):
+        '''
+        Returns:
+            player_mask, opponent_mask, prize_mask: masks of the cards played by the player and the opponent and the prize cards revealed
+        '''
+        return (self.player_mask, self.opponent_mask, self.prize_mask)
+
+    def score_summary(self):
+        '''
+        Returns:
+            player_score, opponent_score, contested_points
+        '''
+        return (self.player_score, self.opponent_score, self.contested_points)
+
+    def canonical_key(self, state_type=None):
+        '''
+        Returns a key that is the same for all histories that reach the same strategic position, see GOPSState.canonical_key
+        '''
+        if state_type is None:
+            state_type = self.state_type
+        return (state_type, self.num_cards, self.player_mask, self.opponent_mask, self.prize_mask,
+                self.contested_points, self.player_score - self.opponent_score)
+
+    def copy(self):
+        '''
+        Returns a copy of the state
+        '''
+        return GOPSBitmaskState(self.state_type, self.num_cards, self.player_mask, self.opponent_mask, self.prize_mask,
+                                self.player_history, self.opponent_history, self.prize_history, self.player_score,
+                                self.opponent_score, self.contested_points, self.done, self.reward, self.canonical)
+
+    def to_canonical(self):
+        '''
+        Returns a copy of the state in canonical mode
+        '''
+        state = self.copy()
+        state.canonical = True
+        state.id = self.canonical_key()
+        return state
+
+class GOPSBitmaskForwardTransitor(ForwardTransitor):
+    '''
+    Forward transitor for GOPSBitmaskState, which updates the masks, histories and scores in constant time
+    '''
+
+    def __init__(self):
+        super().__init__()
+
+    def transition(self, state: GOPSBitmaskState, actions):
+        '''
+        Transitions to the next state given the current state and action
+
+        Args:
+            state: current state
+            actions: actions taken by the protagonist and the antagonist (ie cards played by the player and the opponent), or prize card played by the environment
+
+        Returns:
+            next_state: next state
+        '''
+        num_cards = state.num_cards
+        card_bits = state.card_bits
+        player_score = state.player_score
+        opponent_score = state.opponent_score
+        contested_points = state.contested_points
+
+        if state.state_type == 'simultaneous':
+            player_card, opponent_card = actions
+            player_bit = 1 << (player_card-1)
+            opponent_bit = 1 << (opponent_card-1)
+
+            # assert that the cards are between 1 and num_cards and have not been played
+            assert 1 <= player_card <= num_cards and not state.player_mask & player_bit
+            assert 1 <= opponent_card <= num_cards and not state.opponent_mask & opponent_bit
+
+            # the winner of the round takes the contested points, which stay contested on a tie
+            if player_card > opponent_card:
+                player_score += contested_points
+                contested_points = 0
+            elif player_card < opponent_card:
+                opponent_score += contested_points
+                contested_points = 0
+
+            # the game is done once all prize cards have been revealed and played for
+            done = state.prize_mask == (1 << num_cards) - 1
+            return GOPSBitmaskState('dummy' if done else 'stochastic', num_cards,
+                                    state.player_mask | player_bit, state.opponent_mask | opponent_bit, state.prize_mask,
+                                    (state.player_history << card_bits) | player_card,
+                                    (state.opponent_history << card_bits) | opponent_card,
+                                    state.prize_history, player_score, opponent_score, contested_points,
+                                    done, float(player_score - opponent_score) if done else 0.0, state.canonical)
+
+        elif state.state_type == 'stochastic':
+            prize_bit = 1 << (actions-1)
+
+            # assert that the prize card is between 1 and num_cards and has not been revealed
+            assert 1 <= actions <= num_cards and not state.prize_mask & prize_bit
+
+            return GOPSBitmaskState('simultaneous', num_cards, state.player_mask, state.opponent_mask,
+                                    state.prize_mask | prize_bit, state.player_history, state.opponent_history,
+                                    (state.prize_history << card_bits) | actions, player_score, opponent_score,
+                                    contested_points + actions, False, 0.0, state.canonical)
+
+        else:
+            raise ValueError('Invalid state type: ' + state.state_type)
+
 class GOPSActionEnumerator(ActionEnumerator):
 
     def __init__(self):
@@ -347,22 +593,18 @@ class GPT35ValueHeuristic(ValueHeuristic):
     Value heuristic for GPT-3.5
     '''
 
-    def __init__(self, model):
+    def __init__(self, model, max_concurrency=8):
         '''
         Args:
             model: GPT-3.5 model
+            max_concurrency: maximum number of model calls in flight in evaluate_many
         '''
         self.model = model
+        self.max_concurrency = max_concurrency
 
-    def evaluate(self, state: GOPSState) -> Dict:
+    def get_prompts(self, state: GOPSState):
         '''
-        Predicts the value of the state
-
-        Args:
-            state: current state
-
-        Returns:
-            value: value of the state
+        Returns the probability prompt and the verbalized value prompt for the state
         '''
         # Prepare input
         prob_prompt = "Current State: {state}\n".format(state=state.notes)
@@ -375,19 +617,7 @@ class GPT35ValueHeuristic(ValueHeuristic):
         prize_cards = state.prize_cards
 
         # Calculate the score for the state
-        contested_score = 0
-        player_score = 0
-        opponent_score = 0
-        for idx, single_score in enumerate(list(state.prize_cards)):
-            contested_score += single_score
-            if player_cards[idx] > opponent_cards[idx]:
-                player_score += contested_score
-                contested_score = 0
-            elif player_cards[idx] < opponent_cards[idx]:
-                opponent_score += contested_score
-                contested_score = 0
-            elif player_cards[idx] == opponent_cards[idx]:
-                contested_score += single_score
+        player_score, opponent_score, contested_score = state.score_summary()
 
         player_hand = [i for i in range(1, state.num_cards+1)]
         opponent_hand = [i for i in range(1, state.num_cards+1)]
@@ -408,19 +638,43 @@ class GPT35ValueHeuristic(ValueHeuristic):
             opponent_score=opponent_score
         )
 
-        # Uncomment the following to use the model
-
-        # Call the model
-        prob_output = self.model.single_action(prob_prompt)
-        value_output = self.model.single_action(verbalized_value_prompt)
+        return prob_prompt, verbalized_value_prompt
 
-        # Parse the output
+    def parse_outputs(self, prob_output, value_output):
+        '''
+        Returns the value parsed from the outputs of the model
+        '''
         prob_value = parse_prob_value(prob_output)
         value = parse_int_value(value_output)
 
         if not isinstance(value, int):
             value = 5
 
-        # print(f"State: {state} Value: {value}")
+        return value
+
+    def evaluate(self, state: GOPSState) -> Dict:
+        '''
+        Predicts the value of the state
+
+        Args:
+            state: current state
 
-        return value
\ No newline at end of file
+        Returns:
+            value: value of the state
+        '''
+        # both prompts are sent to the model at the same time
+        return self.evaluate_many([state])[0]
+
+    def evaluate_many(self, states):
+        '''
+        Predicts the values of the states, sending the prompts of all states to the model concurrently
+
+        Args:
+            states: list of states
+
+        Returns:
+            values: list of values of the states
+        '''
+        prompts = [prompt for state in states for prompt in self.get_prompts(state)]
+        outputs = batch_single_action(self.model, prompts, self.max_concurrency)
+        return [self.parse_outputs(outputs[2*i], outputs[2*i+1]) for i in range(len(states))]
\ No newline at end of file
@@ -4,7 +4,10 @@ import networkx as nx
 from networkx.drawing.nx_agraph import to_agraph
 import matplotlib.pyplot as plt
 import time 
+import itertools
+from collections import deque, OrderedDict
 from Search.headers import State
+from Search.matrix_game import solve_matrix_game
 import matplotlib.colors as mcolors
 
 
@@ -13,16 +16,146 @@ import matplotlib.colors as mcolors
 # TODO: create tree visualization 
 # TODO: refactor the code so that all randomness is determined in random nodes
 
+def lazy_container(name, factory):
+    '''
+    Returns a property for a container attribute of a node that is only allocated when it is first accessed.
+    The container is stored in the slot named '_' + name, which should be initialized to None
+    '''
+    private_name = '_' + name
+
+    def getter(self):
+        container = getattr(self, private_name)
+        if container is None:
+            container = factory()
+            setattr(self, private_name, container)
+        return container
+
+    def setter(self, container):
+        setattr(self, private_name, container)
+
+    return property(getter, setter)
+
+class JointActionSpace:
+    '''
+    Cartesian product of the actions of several players that is not materialized
+
+    Joint actions are tuples with one action per player, in the same order as itertools.product.
+    The space can be iterated any number of times, indexed and searched, and gives the joint
+    probabilities of independent players as a tensor with one dimension per player
+    '''
+    __slots__ = ('action_lists', 'shape', '_size', '_action_to_indices')
+
+    def __init__(self, *action_lists):
+        '''
+        Args:
+            action_lists: actions of each player, as any iterable (eg. lists or sets)
+        '''
+        self.action_lists = tuple(tuple(actions) for actions in action_lists) # actions of each player, in a fixed order
+        self.shape = tuple(len(actions) for actions in self.action_lists) # number of actions of each player
+        self._size = int(np.prod(self.shape, dtype=np.int64))
+        self._action_to_indices = None
+
+    def __len__(self):
+        return self._size
+
+    def __iter__(self):
+        return itertools.product(*self.action_lists)
+
+    def __getitem__(self, index):
+        '''
+        Returns the joint action at the flat index, in the same order as iteration
+        '''
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError(f"joint action index {index} out of range for {self._size} joint actions")
+        joint_action = []
+        for actions, size in zip(reversed(self.action_lists), reversed(self.shape)):
+            index, action_index = divmod(index, size)
+            joint_action.append(actions[action_index])
+        return tuple(reversed(joint_action))
+
+    def __contains__(self, joint_action):
+        return self.get_indices(joint_action) is not None
+
+    def __repr__(self):
+        return f"JointActionSpace({self.shape})"
+
+    def get_indices(self, joint_action):
+        '''
+        Returns the tuple of indices of the actions of each player in the joint action, or None if it is not in the space
+        '''
+        if self._action_to_indices is None:
+            self._action_to_indices = [{action: i for i, action in enumerate(actions)} for actions in self.action_lists]
+        if len(joint_action) != len(self.action_lists):
+            return None
+        indices = []
+        for action, action_to_index in zip(joint_action, self._action_to_indices):
+            if action not in action_to_index:
+                return None
+            indices.append(action_to_index[action])
+        return tuple(indices)
+
+    def index(self, joint_action):
+        '''
+        Returns the flat index of the joint action
+        '''
+        indices = self.get_indices(joint_action)
+        if indices is None:
+            raise ValueError(f"{joint_action} is not in the joint action space")
+        return int(np.ravel_multi_index(indices, self.shape))
+
+    def get_prob_tensor(self, probs_over_actions):
+        '''
+        Returns the joint probabilities of players that choose their actions independently
+
+        Args:
+            probs_over_actions: list with a dictionary of probabilities over actions for each player
+
+        Returns:
+            probs: array of shape self.shape, the outer product of the players' probability vectors
+        '''
+        probs = np.ones(())
+        for actions, action_to_prob in zip(self.action_lists, probs_over_actions):
+            probs = np.multiply.outer(probs, np.array([action_to_prob[action] for action in actions], dtype=float))
+        return probs
+
+    def get_value_tensor(self, get_value):
+        '''
+        Returns the values of all joint actions as an array of shape self.shape
+
+        Args:
+            get_value: function that returns the value of a joint action
+        '''
+        return np.fromiter((get_value(joint_action) for joint_action in self), dtype=float, count=self._size).reshape(self.shape)
+
+    def get_joint_action_to_prob(self, probs_over_actions):
+        '''
+        Returns the joint probabilities of players that choose their actions independently, as a dictionary
+
+        Args:
+            probs_over_actions: list with a dictionary of probabilities over actions for each player
+
+        Returns:
+            joint_action_to_prob: dictionary of joint actions to probabilities
+        '''
+        return dict(zip(self, self.get_prob_tensor(probs_over_actions).ravel().tolist()))
+
 class Node:
     '''
     Abstract node class for the search algorithms
     '''
+    __slots__ = ('id', '_parents', '_children', 'virtual')
+
     def __init__(self, id, parents=None, children=None, virtual=False):
         self.id = id # state of the game that this node represents
-        self.parents = parents # parent nodes
-        self.children = children # child nodes
+        self._parents = parents or None
+        self._children = children or None
         self.virtual = virtual # whether the node is virtual or not
 
+    parents = lazy_container('parents', set) # parent nodes
+    children = lazy_container('children', set) # child nodes, which leaves never allocate
+
     def __repr__(self):
         return f"Node({self.id})"
 
@@ -42,87 +175,121 @@ class Node:
         return self.id > other.id
 
 class ValueNode(Node):
+    '''
+    Node with value estimates. Only the number, running mean and last value of the estimates are kept
+
+    Per-action values are kept in lazily allocated dictionaries rather than arrays: actions are arbitrary hashables
+    that searches add one at a time (eg. UCTSearch and pruned SMMinimax), and in GOPS searches these dictionaries
+    take about 1% of the memory of a node, so arrays would save little
+    '''
+    __slots__ = ('state', 'num_estimates', 'mean_value', 'last_value', 'root_epoch', '_action_to_next_state')
 
     def __init__(self, state, parents=None, children=None, virtual=False):
         super().__init__(state, parents, children, virtual)
         self.state = state # state of the game that this node represents
-        self.values_estimates = [] # values from the rollout policy, in temporal order
-        self.action_to_next_state = dict() # maps action to next state
+        self.num_estimates = 0 # number of values from the rollout policy
+        self.mean_value = 0.0 # running mean of the values from the rollout policy
+        self.last_value = 0.0 # most recent value from the rollout policy
+        self.root_epoch = 0 # root epoch of the graph when the node was last accessed, see ValueGraph.set_root
+        self._action_to_next_state = None
+
+    action_to_next_state = lazy_container('action_to_next_state', dict) # maps action to next state
+
+    def add_value_estimate(self, value):
+        '''
+        Adds a value from the rollout policy to the node
+        '''
+        self.num_estimates += 1
+        self.mean_value += (value - self.mean_value) / self.num_estimates
+        self.last_value = value
 
     def get_mean_value(self):
         '''
         Returns the mean value of the node
         '''
-        if len(self.values_estimates) == 0:
-            return 0.0
-        else:
-            return np.mean(self.values_estimates)
+        return self.mean_value
         
     def get_last_value(self):
         '''
         Returns the last value of the node
         '''
-        if len(self.values_estimates) == 0:
-            return 0.0
-        else:
-            return self.values_estimates[-1]
+        return self.last_value
         
     def get_visits(self):
         '''
         Returns the number of visits to the node
         '''
-        return len(self.values_estimates)
-        
-    # def backward(self, value):
-    #     '''
-    #     Updates the node
-    #     '''
-    #     self.visits += 1
-    #     # self.value += value
-    #     self.simulated_values.append(value)
+        return self.num_estimates
 
 class ControlValueNode(ValueNode):
     '''
     State where the protagonist is trying to maximize the value by taking actions
     '''
+    __slots__ = ('actions', '_next_states', '_action_to_value', '_action_to_visits')
 
     def __init__(self, state, parents=None, children=None, actions=None, next_states = None, virtual=False):
         super().__init__(state, parents, children, virtual)
         self.actions = actions # list of actions
-        self.next_states = next_states # set of next states (child nodes)
-        self.action_to_next_state = dict() # maps action to next state
-        self.action_to_value = dict() # maps action to value (ie. Q-value)
+        self._next_states = next_states
+        self._action_to_value = None
+        self._action_to_visits = None
+
+    next_states = lazy_container('next_states', set) # set of next states (child nodes)
+    action_to_value = lazy_container('action_to_value', dict) # maps action to value (ie. Q-value)
+    action_to_visits = lazy_container('action_to_visits', dict) # maps action to number of times it was taken in simulations
 
 class AdversarialValueNode(ValueNode):
     '''
     State where the opponents are trying to minimize the value by taking actions
     '''
+    __slots__ = ('actions', 'opponents', 'best_action', 'joint_adversarial_actions', '_adactions', '_next_states',
+                 'joint_adversarial_probs', '_opponent_to_probs_over_actions',
+                 '_joint_adversarial_actions_to_next_states', '_action_to_value', '_action_to_visits')
 
     def __init__(self, state, parents=None, children=None, actions=None, next_states = None, virtual=False):
         super().__init__(state, parents, children, virtual)
         self.actions = actions # actions that the opponent can take
+        self.opponents = None # list of opponents who take actions at this state
         self.best_action = None # best action to take
-        self.next_states = next_states # set of next states (child nodes)
-        self.joint_adversarial_actions = None # list of joint adversarial actions
-        self.joint_adversarial_actions_to_probs = dict() # dictionary of joint adversarial actions to probabilities over actions
-        self.joint_adversarial_actions_to_next_states = dict() # dictionary of joint adversarial actions to next states
-        self.action_to_value = dict() # maps action to value (ie. Q-value)
+        self.joint_adversarial_actions = None # JointActionSpace of joint adversarial actions
+        self.joint_adversarial_probs = None # predicted probabilities of the joint adversarial actions, array of shape joint_adversarial_actions.shape
+        self._adactions = None
+        self._next_states = next_states
+        self._opponent_to_probs_over_actions = None
+        self._joint_adversarial_actions_to_next_states = None
+        self._action_to_value = None
+        self._action_to_visits = None
+
+    adactions = lazy_container('adactions', dict) # actions that the opponents can take, or dictionary of opponents to actions
+    next_states = lazy_container('next_states', set) # set of next states (child nodes)
+    opponent_to_probs_over_actions = lazy_container('opponent_to_probs_over_actions', dict) # dictionary of dictionaries of probabilities over actions for each opponent
+    joint_adversarial_actions_to_next_states = lazy_container('joint_adversarial_actions_to_next_states', dict) # dictionary of joint adversarial actions to next states
+    action_to_value = lazy_container('action_to_value', dict) # maps action to value (ie. Q-value)
+    action_to_visits = lazy_container('action_to_visits', dict) # maps action to number of times it was taken in simulations
 
 class StochasticValueNode(ValueNode):
     '''
     State where the environment progresses to random states
     '''
+    __slots__ = ('actions', '_next_states', '_probs_over_actions')
 
     def __init__(self, state, parents=None, children=None, next_states = None, virtual=False):
         super().__init__(state, parents, children, virtual)
-        self.next_states = next_states # set of next states
         self.actions = None # actions that the environment can take
-        self.probs_over_actions = dict() # maps action to probability
+        self._next_states = next_states
+        self._probs_over_actions = None
+
+    next_states = lazy_container('next_states', set) # set of next states
+    probs_over_actions = lazy_container('probs_over_actions', dict) # maps action to probability
 
 class SimultaneousValueNode(ValueNode):
     '''
     State where the protagonist and opponents are trying to maximize the value by taking actions simultaneously
     '''
+    __slots__ = ('proactions', 'opponents', 'joint_adversarial_actions', 'joint_actions', 'joint_adversarial_probs',
+                 '_adactions', '_next_states', '_opponent_to_probs_over_actions', '_action_to_value',
+                 '_joint_actions_to_next_states', '_proaction_to_visits', '_adaction_to_value', '_adaction_to_visits',
+                 '_proaction_to_prob', '_adaction_to_prob')
 
     def __init__(self, state, parents=None, children=None, proactions=None, adactions = None, next_states = None, opponents = None, virtual=False):
         '''
@@ -136,19 +303,159 @@ class SimultaneousValueNode(ValueNode):
         '''
         super().__init__(state, parents, children, virtual)
         self.proactions = proactions # actions that the protagonist can take
-        self.adactions = adactions # dictionary of actions that the opponents can take
-        if self.adactions is None:
-            self.adactions = dict()
-        self.next_states = next_states # set of next states (child nodes)
-        if self.next_states is None:
-            self.next_states = set()
-        self.opponent_to_probs_over_actions = dict() # dictionary of dictionaries of probabilities over actions for each opponent
         self.opponents = opponents # list of opponents who take actions at this state
-        self.joint_adversarial_actions = None # list of joint adversarial actions
-        self.joint_adversarial_actions_to_probs = dict() # dictionary of joint adversarial actions to probabilities over actions
-        self.action_to_value = dict() # maps action to value (ie. Q-value)
-        self.joint_actions = None # list of joint actions
-        self.joint_actions_to_next_states = dict() # dictionary of joint actions to next states
+        self.joint_adversarial_actions = None # JointActionSpace of joint adversarial actions
+        self.joint_actions = None # JointActionSpace of joint actions, first dimension is the protagonist
+        self.joint_adversarial_probs = None # predicted probabilities of the joint adversarial actions, array of shape joint_adversarial_actions.shape
+        self._adactions = adactions
+        self._next_states = next_states
+        self._opponent_to_probs_over_actions = None
+        self._action_to_value = None
+        self._joint_actions_to_next_states = None
+        self._proaction_to_visits = None
+        self._adaction_to_value = None
+        self._adaction_to_visits = None
+        self._proaction_to_prob = None
+        self._adaction_to_prob = None
+
+    adactions = lazy_container('adactions', dict) # dictionary of actions that the opponents can take
+    next_states = lazy_container('next_states', set) # set of next states (child nodes)
+    opponent_to_probs_over_actions = lazy_container('opponent_to_probs_over_actions', dict) # dictionary of dictionaries of probabilities over actions for each opponent
+    action_to_value = lazy_container('action_to_value', dict) # maps action to value (ie. Q-value)
+    joint_actions_to_next_states = lazy_container('joint_actions_to_next_states', dict) # dictionary of joint actions to next states
+    proaction_to_visits = lazy_container('proaction_to_visits', dict) # maps protagonist action to number of times it was taken in simulations
+    adaction_to_value = lazy_container('adaction_to_value', dict) # maps opponent action to value, from the protagonist's perspective
+    adaction_to_visits = lazy_container('adaction_to_visits', dict) # maps opponent action to number of times it was taken in simulations
+    proaction_to_prob = lazy_container('proaction_to_prob', dict) # maps protagonist action to its probability in the Nash equilibrium
+    adaction_to_prob = lazy_container('adaction_to_prob', dict) # maps opponent action to its probability in the Nash equilibrium
+
+class MinMaxStats:
+    '''
+    Running minimum and maximum of the values seen so far, used to normalize values to [0, 1]
+    '''
+    def __init__(self, minimum=np.inf, maximum=-np.inf):
+        self.minimum = minimum # smallest value seen so far
+        self.maximum = maximum # largest value seen so far
+
+    def update(self, value):
+        '''
+        Updates the running minimum and maximum with a new value
+        '''
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+
+    def normalize(self, value):
+        '''
+        Returns value scaled so that the values seen so far lie in [0, 1], or value unchanged if
+        fewer than two distinct values were seen
+        '''
+        if self.maximum > self.minimum:
+            return (value - self.minimum) / (self.maximum - self.minimum)
+        return value
+
+class TranspositionEntry:
+    '''
+    Result of searching a state to some depth
+    '''
+    __slots__ = ('depth', 'value', 'best_action', 'mode')
+
+    def __init__(self, depth, value, best_action=None, mode=None):
+        self.depth = depth # depth that the state was searched to
+        self.value = value # value (utility) found by the search
+        self.best_action = best_action # best action found by the search, None if the state has no choices
+        self.mode = mode # mode of the search that found the value, see Search.get_transposition_mode
+
+    def __repr__(self):
+        return f"TranspositionEntry({self.depth}, {self.value}, {self.best_action}, {self.mode})"
+
+class TranspositionTable:
+    '''
+    Maps state ids to the deepest search result found for that state. Values of searches in different modes
+    (eg. SMMinimax with and without oracle) differ, so entries are only returned to searches in the same mode
+    '''
+    def __init__(self):
+        self.id_to_entry = dict() # maps state id to TranspositionEntry
+        self.hits = 0 # number of lookups that found a deep enough entry
+        self.misses = 0 # number of lookups that did not
+
+    def __len__(self):
+        return len(self.id_to_entry)
+
+    def __contains__(self, state):
+        return state.id in self.id_to_entry
+
+    def get_entry(self, state, mode=None)-> TranspositionEntry:
+        '''
+        Returns the entry of the state in the mode regardless of its depth, or None if it does not exist
+        '''
+        entry = self.id_to_entry.get(state.id)
+        if entry is not None and entry.mode == mode:
+            return entry
+        return None
+
+    def lookup(self, state, depth, mode=None)-> TranspositionEntry:
+        '''
+        Returns the entry of the state if it was searched at least as deep as depth in the same mode
+
+        Args:
+            state: state to look up
+            depth: depth that the caller wants to search the state to
+            mode: mode of the caller's search
+
+        Returns:
+            entry: entry of the state, or None if there is no entry that is deep enough
+        '''
+        entry = self.id_to_entry.get(state.id)
+        if entry is not None and entry.depth >= depth and entry.mode == mode:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    def store(self, state, depth, value, best_action=None, mode=None):
+        '''
+        Stores the result of searching the state, unless a deeper result of the same mode is already stored.
+        Entries of another mode are replaced
+
+        Args:
+            state: state that was searched
+            depth: depth that the state was searched to
+            value: value found by the search
+            best_action: best action found by the search
+            mode: mode of the search
+        '''
+        entry = self.id_to_entry.get(state.id)
+        if entry is None or entry.depth <= depth or entry.mode != mode:
+            self.id_to_entry[state.id] = TranspositionEntry(depth, value, best_action, mode)
+
+    def remove(self, state):
+        '''
+        Removes the entry of the state if there is one
+
+        Returns:
+            removed: whether an entry was removed
+        '''
+        return self.id_to_entry.pop(state.id, None) is not None
+
+    def retain(self, states):
+        '''
+        Removes the entries of all states that are not in states
+
+        Returns:
+            num_removed: number of entries removed
+        '''
+        keep_ids = {state.id for state in states}
+        num_entries = len(self.id_to_entry)
+        self.id_to_entry = {id: entry for id, entry in self.id_to_entry.items() if id in keep_ids}
+        return num_entries - len(self.id_to_entry)
+
+    def clear(self):
+        '''
+        Removes all entries and resets the counters
+        '''
+        self.id_to_entry = dict()
+        self.hits = 0
+        self.misses = 0
 
 class Graph:
     '''
@@ -173,13 +480,104 @@ class Graph:
             return self.id_to_node[id]
 
 
+def draw_value_graph(G: nx.DiGraph, pos = None, ax = None, title = None):
+    '''
+    Draws a networkx graph from ValueGraph.to_networkx, with node colors by visits and node labels by value
+
+    Args:
+        G: graph to draw, whose nodes have 'value' and 'visits' attributes
+        pos: positions of the nodes, computed with a spring layout if None
+        ax: axes to draw on, a new figure is created if None
+        title: title of the plot
+
+    Returns:
+        pos: positions of the nodes
+    '''
+    if ax is None:
+        fig, ax = plt.subplots()
+
+    # Extract 'node.visits' values and normalize them
+    visits = [G.nodes[node]['visits'] for node in G.nodes()]
+    max_visits = max(visits, default=1)
+    min_visits = min(visits, default=0)
+    visits_range = max(max_visits - min_visits, 1)
+    norm_visits = [(visit - min_visits) / visits_range for visit in visits]
+
+    # Choose a colormap
+    cmap = plt.cm.viridis
+
+    # Map normalized visits to colors
+    node_colors = [cmap(norm) for norm in norm_visits]
+
+    # Draw the graph
+    if pos is None:
+        pos = nx.spring_layout(G)
+    nx.draw_networkx_edges(G, pos, ax=ax)
+    nx.draw_networkx_nodes(G, pos, node_color=node_colors, ax=ax)
+
+    node_labels = nx.get_node_attributes(G, 'value')
+    nx.draw_networkx_labels(G, pos, labels = node_labels, ax=ax)
+
+    # Create an Axes for the color bar
+    sm = plt.cm.ScalarMappable(cmap=cmap, norm=plt.Normalize(vmin=min_visits, vmax=max_visits))
+    sm.set_array([])
+    plt.colorbar(sm, ax=ax, label='Node Visits')
+
+    if title is not None:
+        ax.set_title(title)
+    ax.axis('off')
+    return pos
+
+
 class ValueGraph(Graph):
     '''
     A DAG where each node represents a state and each edge represents an action
     '''
 
-    def __init__(self):
+    EVICTION_POLICIES = ('lru', 'visits')
+
+    def __init__(self, capacity=None, eviction_policy='lru'):
+        '''
+        Args:
+            capacity: maximum number of nodes, or None to keep every node. Adding a node beyond it evicts nodes that
+                have not been accessed since the root was last set, so the search in progress never loses its
+                nodes. If every node has been accessed since, the graph grows until the next set_root or reroot
+            eviction_policy: 'lru' to evict the least recently accessed nodes first, 'visits' to evict the least visited nodes first
+        '''
         super().__init__()
+        if eviction_policy not in self.EVICTION_POLICIES:
+            raise ValueError(f"eviction policy should be one of {self.EVICTION_POLICIES}, got {eviction_policy}")
+        self.transposition_table = TranspositionTable() # results of previous searches, see SMMinimax.iterative_deepening
+        self.min_max_stats = MinMaxStats() # range of the values backed up so far
+        self.capacity = capacity
+        self.eviction_policy = eviction_policy
+        if capacity is not None:
+            self.id_to_node = OrderedDict() # ordered from least to most recently accessed
+        self.root = None # state that the next search starts from, see set_root
+        self.pinned_nodes = set() # root and its ancestors, which are never evicted
+        self.root_epoch = 0 # incremented by set_root and reroot, nodes accessed since have node.root_epoch equal to it
+        self._eviction_queue = None # states of the nodes to evict while adding nodes, built when first needed
+        self.num_evicted = 0 # number of nodes evicted so far
+        self.num_eviction_rounds = 0 # number of times nodes were evicted, by enforce_capacity or while adding nodes
+        self.num_purged_entries = 0 # number of transposition table entries removed with evicted or collected nodes
+        self.num_collected = 0 # number of nodes removed by reroot because they could not be reached from the root
+        self.peak_num_nodes = 0 # largest number of nodes in the graph so far
+
+    def get_node(self, id)-> Node:
+        '''
+        Returns the node corresponding to the id, marking it as recently accessed if the graph has a capacity
+
+        Args:
+            id: id to get node of
+
+        Returns:
+            node: node corresponding to the id, or None if it does not exist
+        '''
+        node = self.id_to_node.get(id)
+        if node is not None and self.capacity is not None:
+            self.id_to_node.move_to_end(id)
+            node.root_epoch = self.root_epoch
+        return node
 
     def get_value(self, state):
         '''
@@ -224,23 +622,389 @@ class ValueGraph(Graph):
             else:
                 raise NotImplementedError
             self.id_to_node[state] = node
-            
-            
+            if self.capacity is not None:
+                node.root_epoch = self.root_epoch
+                if len(self.id_to_node) > self.capacity:
+                    self._evict_cold_nodes()
+            self.peak_num_nodes = max(self.peak_num_nodes, len(self.id_to_node))
             return node
         else:
             raise ValueError(f"state {state} already exists in the graph")
 
-    
-    def backward(self, state, value):
+
+    def set_root(self, state):
+        '''
+        Sets the state that the next search starts from. The root and its ancestors are pinned so that
+        they are never evicted, then the graph is shrunk to its capacity
+
+        Args:
+            state: state to set as root
+
+        Returns:
+            node: node corresponding to the root
+        '''
+        self._start_root_epoch()
+        node = self.get_node(state)
+        if node is None:
+            node = self.add_state(state)
+        self.root = state
+
+        # pin the root and all of its ancestors
+        pinned_nodes = {node}
+        stack = [node]
+        while stack:
+            for parent in stack.pop().parents:
+                if parent not in pinned_nodes:
+                    pinned_nodes.add(parent)
+                    stack.append(parent)
+        self.pinned_nodes = pinned_nodes
+
+        self.enforce_capacity()
+        return node
+
+    def reroot(self, state):
+        '''
+        Promotes a state reached from the previous root to be the new root. Nodes that cannot be reached
+        from the new root (the previous root, its other children and their subtrees) are removed together
+        with their transposition table entries, while the subtree below the new root keeps its values,
+        action values and transposition table entries, so the next search can continue from them.
+        If the state is not in the graph, the whole graph is cleared
+
+        Args:
+            state: state to set as root
+
+        Returns:
+            node: node corresponding to the root
+        '''
+        self._start_root_epoch()
+        node = self.get_node(state)
+        if node is None:
+            node = self.add_state(state)
+
+        # find the nodes that can be reached from the new root
+        reachable = {node}
+        stack = [node]
+        while stack:
+            for child in stack.pop().children:
+                if child not in reachable:
+                    reachable.add(child)
+                    stack.append(child)
+
+        # remove the others, keeping the order of the remaining nodes for lru eviction
+        num_collected = 0
+        for id, other in list(self.id_to_node.items()):
+            if other not in reachable:
+                del self.id_to_node[id]
+                other.parents.clear()
+                other.children.clear()
+                num_collected += 1
+        for other in reachable:
+            other.parents.intersection_update(reachable)
+        node.parents.clear()
+        self.num_collected += num_collected
+        self.num_purged_entries += self.transposition_table.retain(other.state for other in reachable)
+
+        self.root = state
+        self.pinned_nodes = {node}
+        self.enforce_capacity()
+        return node
+
+    def _start_root_epoch(self):
+        '''
+        Starts a new root epoch, after which every node counts as not accessed by the search from the new root
+        '''
+        self.root_epoch += 1
+        self._eviction_queue = None
+
+    def _evict_cold_nodes(self):
+        '''
+        Evicts subtrees of nodes that have not been accessed since the root was set, coldest first, until the
+        graph has at most capacity nodes. Called when adding a node during a search, which holds references to
+        the nodes it accessed but not to the others. The eviction order is computed once per root epoch, since
+        nodes that are not accessed keep their visits and their place in the lru order
+
+        Returns:
+            num_evicted: number of nodes evicted
+        '''
+        if self._eviction_queue is None:
+            candidates = [node for node in self.id_to_node.values()
+                          if node.root_epoch != self.root_epoch and node not in self.pinned_nodes]
+            if self.eviction_policy == 'visits':
+                candidates.sort(key=lambda node: node.get_visits())
+            # states rather than nodes, so that the queue does not keep evicted nodes alive
+            self._eviction_queue = deque(node.state for node in candidates)
+
+        num_evicted = 0
+        while len(self.id_to_node) > self.capacity and self._eviction_queue:
+            node = self.id_to_node.get(self._eviction_queue.popleft())
+            if node is not None and node.root_epoch != self.root_epoch:
+                num_evicted += self._evict_subtree(node, keep_accessed=True)
+        if num_evicted > 0:
+            self.num_eviction_rounds += 1
+        return num_evicted
+
+    def enforce_capacity(self):
+        '''
+        Evicts cold subtrees until the graph has at most capacity nodes, or only pinned nodes are left.
+        Should only be called between searches, since nodes that a search is expanding are not pinned
+
+        Returns:
+            num_evicted: number of nodes evicted
+        '''
+        if self.capacity is None or len(self.id_to_node) <= self.capacity:
+            return 0
+
+        # coldest nodes first. the sort is stable, so ties in visits are broken by least recent access
+        candidates = [node for node in self.id_to_node.values() if node not in self.pinned_nodes]
+        if self.eviction_policy == 'visits':
+            candidates.sort(key=lambda node: node.get_visits())
+
+        num_evicted = 0
+        for node in candidates:
+            if len(self.id_to_node) <= self.capacity:
+                break
+            num_evicted += self._evict_subtree(node)
+
+        if num_evicted > 0:
+            self.num_eviction_rounds += 1
+        return num_evicted
+
+    def _evict_subtree(self, node, keep_accessed=False):
+        '''
+        Removes the node from the graph, together with the descendants that are left without parents.
+        Parents of evicted nodes keep their action values, and evicted nodes are recreated if they are searched again
+
+        Args:
+            node: root of the subtree to evict
+            keep_accessed: whether to keep the descendants accessed since the root was set
+
+        Returns:
+            num_evicted: number of nodes evicted
+        '''
+        num_evicted = 0
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.id not in self.id_to_node or node in self.pinned_nodes:
+                continue
+            if keep_accessed and node.root_epoch == self.root_epoch:
+                continue
+            del self.id_to_node[node.id]
+            if self.transposition_table.remove(node.state):
+                self.num_purged_entries += 1
+            for parent in node.parents:
+                parent.children.discard(node)
+            for child in node.children:
+                child.parents.discard(node)
+                if not child.parents:
+                    stack.append(child)
+            node.parents.clear()
+            node.children.clear()
+            num_evicted += 1
+        self.num_evicted += num_evicted
+        return num_evicted
+
+    def get_eviction_stats(self):
+        '''
+        Returns:
+            stats: dictionary with the capacity, eviction policy, number of nodes, number of pinned nodes,
+                peak number of nodes, number of evicted nodes, number of eviction rounds, number of
+                transposition table entries purged with evicted or collected nodes and number of nodes
+                collected by reroot
+        '''
+        return {
+            'capacity': self.capacity,
+            'eviction_policy': self.eviction_policy,
+            'num_nodes': len(self.id_to_node),
+            'num_pinned': len(self.pinned_nodes),
+            'peak_num_nodes': self.peak_num_nodes,
+            'num_evicted': self.num_evicted,
+            'num_eviction_rounds': self.num_eviction_rounds,
+            'num_purged_entries': self.num_purged_entries,
+            'num_collected': self.num_collected,
+        }
+
+    def backward(self, state, value, utility_estimator = None):
         '''
         Backward updates the values of parent nodes of the state
         Does not work if there are cycles in the graph
 
+        Each ancestor is recomputed at most once, after all of its children that are ancestors of the state,
+        and only if the value of at least one of its children changed.
+
         Args:
             state: state to backward
             value: value to backward
+            utility_estimator: estimator used to get the value of a node, defaults to the last value of the node
+
+        Returns:
+            num_updated: number of ancestors whose values were recomputed
         '''
+        if utility_estimator is None:
+            estimate = lambda node: node.get_last_value()
+        else:
+            estimate = utility_estimator.estimate
+
         node = self.id_to_node[state]
+        node.add_value_estimate(value)
+        self.min_max_stats.update(value)
+
+        # find all ancestors of the node
+        ancestors = set()
+        stack = [node]
+        while stack:
+            for parent in stack.pop().parents:
+                if parent not in ancestors:
+                    ancestors.add(parent)
+                    stack.append(parent)
+
+        # an ancestor is ready once all of its children that are ancestors have been processed
+        num_pending = {ancestor: sum(1 for child in ancestor.children if child in ancestors) for ancestor in ancestors}
+        ready = deque(ancestor for ancestor in node.parents if num_pending[ancestor] == 0)
+        changed = {node}
+        num_processed = 0
+        num_updated = 0
+        while ready:
+            ancestor = ready.popleft()
+            num_processed += 1
+            if any(child in changed for child in ancestor.children):
+                old_value = estimate(ancestor)
+                new_value = self.compute_value(ancestor, estimate)
+                if new_value is not None:
+                    ancestor.add_value_estimate(new_value)
+                    self.min_max_stats.update(new_value)
+                    num_updated += 1
+                    if estimate(ancestor) != old_value:
+                        changed.add(ancestor)
+            for parent in ancestor.parents:
+                num_pending[parent] -= 1
+                if num_pending[parent] == 0:
+                    ready.append(parent)
+
+        if num_processed < len(ancestors):
+            raise ValueError(f"cannot backward from state {state} because the graph has a cycle")
+        return num_updated
+
+    def compute_value(self, node: ValueNode, estimate):
+        '''
+        Recomputes the value of a node from the values of its children, updating node.action_to_value
+
+        Args:
+            node: node to compute the value of
+            estimate: function that returns the value of a child node
+
+        Returns:
+            value: value of the node, or None if it cannot be computed from its children
+        '''
+        def child_value(next_state):
+            child = self.id_to_node.get(next_state)
+            if child is None or child.get_visits() == 0:
+                return None
+            return estimate(child)
+
+        def child_value_or_nan(next_state):
+            value = child_value(next_state)
+            return np.nan if value is None else value
+
+        state_type = node.state.state_type
+        # nodes expanded by ValueBFS weight the actions of the opponents by their predicted probabilities
+        predicted = state_type in ('adversarial', 'simultaneous') and node.joint_adversarial_probs is not None
+
+        if state_type == 'control' or (state_type == 'adversarial' and not predicted):
+            for action, next_state in node.action_to_next_state.items():
+                value = child_value(next_state)
+                if value is not None:
+                    node.action_to_value[action] = value
+            if not node.action_to_value:
+                return None
+            if state_type == 'control':
+                return max(node.action_to_value.values())
+            return min(node.action_to_value.values())
+
+        elif state_type == 'adversarial': # expectation over the predicted joint actions of the opponents
+            values = node.joint_adversarial_actions.get_value_tensor(
+                lambda joint_adversarial_action: child_value_or_nan(node.joint_adversarial_actions_to_next_states[joint_adversarial_action]))
+            if np.isnan(values).any(): # some children have no value yet
+                return None
+            return float(np.tensordot(node.joint_adversarial_probs, values, axes=values.ndim))
+
+        elif state_type == 'stochastic':
+            value = 0.0
+            for action, next_state in node.action_to_next_state.items():
+                next_value = child_value(next_state)
+                if next_value is None:
+                    return None
+                value += node.probs_over_actions[action]*next_value
+            return value
+
+        elif state_type == 'simultaneous':
+            if node.proaction_to_prob: # nodes expanded with oracle=False are solved as matrix games
+                proactions = list(node.proaction_to_prob)
+                adactions = list(node.adaction_to_prob)
+                payoffs = np.empty((len(proactions), len(adactions)))
+                for i, proaction in enumerate(proactions):
+                    for j, adaction in enumerate(adactions):
+                        next_value = child_value(node.joint_actions_to_next_states[(proaction, adaction)])
+                        if next_value is None:
+                            return None
+                        payoffs[i, j] = next_value
+                return self.set_nash_equilibrium(node, proactions, adactions, payoffs)
+            elif predicted: # expectation over the predicted joint actions of the opponents
+                values = node.joint_actions.get_value_tensor(
+                    lambda joint_action: child_value_or_nan(node.joint_actions_to_next_states[joint_action]))
+                if np.isnan(values).any(): # some children have no value yet
+                    return None
+                proaction_values = np.tensordot(values, node.joint_adversarial_probs, axes=node.joint_adversarial_probs.ndim)
+                action_to_value = dict(zip(node.joint_actions.action_lists[0], proaction_values.tolist()))
+            else: # opponent plays the best response to each protagonist action
+                action_to_value = dict()
+                for joint_action, next_state in node.joint_actions_to_next_states.items():
+                    next_value = child_value(next_state)
+                    if next_value is not None and next_value < action_to_value.get(joint_action[0], np.inf):
+                        action_to_value[joint_action[0]] = next_value
+            if not action_to_value:
+                return None
+            node.action_to_value.update(action_to_value)
+            return max(node.action_to_value.values())
+
+        return None
+
+    def set_nash_equilibrium(self, node: SimultaneousValueNode, proactions, adactions, payoffs):
+        '''
+        Solves the payoff matrix of a simultaneous node as a zero-sum matrix game and stores the mixed
+        strategies in node.proaction_to_prob and node.adaction_to_prob. The value of each protagonist
+        action in node.action_to_value is its value against the opponent's equilibrium strategy
+
+        Args:
+            node: simultaneous node
+            proactions: list of protagonist actions, the rows of payoffs
+            adactions: list of opponent actions, the columns of payoffs
+            payoffs: (len(proactions), len(adactions)) array of values of the joint actions to the protagonist
+
+        Returns:
+            value: value of the matrix game
+        '''
+        value, proaction_probs, adaction_probs = solve_matrix_game(payoffs)
+        node.proaction_to_prob = dict(zip(proactions, proaction_probs))
+        node.adaction_to_prob = dict(zip(adactions, adaction_probs))
+        node.action_to_value.update(zip(proactions, payoffs @ adaction_probs))
+        return value
+
+    def get_policy(self, state):
+        '''
+        Returns the protagonist's policy at the state, which is the Nash equilibrium strategy if the state was
+        solved as a matrix game and the best action otherwise
+
+        Args:
+            state: state to get the policy of
+
+        Returns:
+            action_to_prob: dictionary of actions to probabilities
+        '''
+        node = self.get_node(state)
+        if isinstance(node, SimultaneousValueNode) and node.proaction_to_prob:
+            return dict(node.proaction_to_prob)
+        return {self.get_best_action(state): 1.0}
 
     def compute_qvalue(self, state, action):
         '''
@@ -306,41 +1070,5 @@ class ValueGraph(Graph):
         '''
         Returns the graph as a matplotlib graph, with values as node.values
         '''
-
-        # create graph
-        G = self.to_networkx()
-
-        # Extract 'node.visits' values and normalize them
-        visits = [G.nodes[node]['visits'] for node in G.nodes()]
-        max_visits = max(visits)
-        min_visits = min(visits)
-        norm_visits = [(visit - min_visits) / (max_visits - min_visits) for visit in visits]
-
-        # Choose a colormap
-        cmap = plt.cm.viridis
-
-        # Map normalized visits to colors
-        node_colors = [cmap(norm) for norm in norm_visits]
-        
-        # Draw the graph
-        pos = nx.spring_layout(G)
-        fig, ax = plt.subplots()
-        nx.draw_networkx_edges(G, pos)
-        nx.draw_networkx_nodes(G, pos, node_color=node_colors)
-        
-        node_labels = nx.get_node_attributes(G, 'value')
-        nx.draw_networkx_labels(G, pos, labels = node_labels)
-        # edge_labels = nx.get_edge_attributes(G, 'action')
-        # nx.draw_networkx_edge_labels(G, pos, edge_labels = edge_labels)
-        
-
-        # Create an Axes for the color bar
-        sm = plt.cm.ScalarMappable(cmap=cmap, norm=plt.Normalize(vmin=min_visits, vmax=max_visits))
-        sm.set_array([])
-        cbar = plt.colorbar(sm, ax=ax, label='Node Visits')
-
-        # title should be value graph at time 
-        title = "Value Graph at time " + str(time.time())
-        plt.title(title)
-        plt.axis('off')
-        return plt
\ No newline at end of file
+        draw_value_graph(self.to_networkx(), title = "Value Graph at time " + str(time.time()))
+        return plt
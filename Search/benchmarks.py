@@ -0,0 +1,239 @@
+import argparse
+import time
+import tracemalloc
+import numpy as np
+from Search.beliefs import ValueGraph
+from Search.search import *
+from Search.baseline_models_GOPS import *
+from Search.estimators import *
+from Search.classic_models import *
+from Search.parallel import ParallelRootSearch
+from Search.instrumentation import SearchProfiler
+
+# run with python -m Search.benchmarks <benchmark>
+
+
+def build_gops_smminimax(num_rollouts=10, prune=False, rng=None):
+    '''
+    Returns an SMMinimax search over GOPS with random rollouts as the value heuristic
+    '''
+    action_enumerator = GOPSActionEnumerator()
+    opponent_action_enumerator = GOPSOpponentActionEnumerator()
+    hidden_state_enumerator = GOPSRandomStateEnumerator()
+    hidden_state_predictor = GOPSRandomStatePredictor()
+    forward_transitor = GOPSForwardTransitor()
+    utility_estimator = UtilityEstimatorLast()
+    value_heuristic = GOPSRandomRolloutValueHeuristic(num_rollouts=num_rollouts, rng=rng)
+    return SMMinimax(forward_transitor, value_heuristic, action_enumerator,
+                     hidden_state_enumerator, hidden_state_predictor,
+                     opponent_action_enumerator, utility_estimator, prune=prune)
+
+def benchmark_pruning(num_cards_list=(6, 8, 10, 13), depth=2, num_rollouts=10, seed=0):
+    '''
+    Compares the number of nodes visited and the time taken by SMMinimax with and without pruning,
+    searching from the first move of GOPS games with different numbers of cards
+
+    Returns:
+        results: list of dictionaries with the measurements for each number of cards
+    '''
+    results = []
+    for num_cards in num_cards_list:
+        state = GOPSState('simultaneous', (num_cards,), (), (), num_cards)
+        result = {'num_cards': num_cards}
+        for prune in (False, True):
+            search = build_gops_smminimax(num_rollouts, prune, np.random.RandomState(seed))
+            graph = ValueGraph()
+            start = time.time()
+            search.expand(graph, state, depth=depth)
+            name = 'pruned' if prune else 'full'
+            result[f'{name}_nodes'] = search.nodes_expanded
+            result[f'{name}_time'] = time.time() - start
+            result[f'{name}_action'] = graph.get_best_action(state)
+        results.append(result)
+        print(f"{num_cards} cards: {result['full_nodes']} nodes ({result['full_time']:.2f}s) without pruning, "
+              f"{result['pruned_nodes']} nodes ({result['pruned_time']:.2f}s) with pruning")
+    return results
+
+def benchmark_rollouts(num_cards_list=(6, 8, 10, 13), num_rollouts=1000, seed=0):
+    '''
+    Compares the time taken by RandomRolloutValueHeuristic and GOPSRandomRolloutValueHeuristic
+    to evaluate the first move of GOPS games with different numbers of cards
+
+    Returns:
+        results: list of dictionaries with the measurements for each number of cards
+    '''
+    results = []
+    for num_cards in num_cards_list:
+        state = GOPSState('simultaneous', (num_cards,), (), (), num_cards)
+        heuristics = {
+            'python': RandomRolloutValueHeuristic(GOPSActionEnumerator(), GOPSOpponentActionEnumerator(),
+                                                  GOPSForwardTransitor(), GOPSRandomStateEnumerator(),
+                                                  num_rollouts=num_rollouts),
+            'numpy': GOPSRandomRolloutValueHeuristic(num_rollouts=num_rollouts, rng=np.random.RandomState(seed)),
+        }
+        result = {'num_cards': num_cards}
+        for name, heuristic in heuristics.items():
+            np.random.seed(seed)
+            start = time.time()
+            result[f'{name}_value'] = heuristic.evaluate(state)
+            result[f'{name}_time'] = time.time() - start
+        results.append(result)
+        print(f"{num_cards} cards: {result['python_time']:.4f}s with python, {result['numpy_time']:.4f}s with numpy "
+              f"({result['python_time']/result['numpy_time']:.0f}x), values {result['python_value']:.3f} and {result['numpy_value']:.3f}")
+    return results
+
+def benchmark_memory(num_cards_list=(6, 8), depth=3, num_searches=5, num_rollouts=10, seed=0):
+    '''
+    Measures the memory used by a ValueGraph after SMMinimax searches from the first move of GOPS games
+    with different numbers of cards. Searching the same state several times adds value estimates to
+    existing nodes, like the persistent graph in Search/experiment.py
+
+    Returns:
+        results: list of dictionaries with the measurements for each number of cards
+    '''
+    results = []
+    for num_cards in num_cards_list:
+        state = GOPSState('simultaneous', (num_cards,), (), (), num_cards)
+        search = build_gops_smminimax(num_rollouts, rng=np.random.RandomState(seed))
+        tracemalloc.start()
+        graph = ValueGraph()
+        for _ in range(num_searches):
+            search.expand(graph, state, depth=depth)
+        memory, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        num_nodes = len(graph.id_to_node)
+        result = {'num_cards': num_cards, 'num_nodes': num_nodes, 'memory': memory, 'memory_per_node': memory / num_nodes}
+        results.append(result)
+        print(f"{num_cards} cards: {num_nodes} nodes use {memory / 2**20:.1f} MiB ({memory / num_nodes:.0f} bytes per node)")
+    return results
+
+def benchmark_canonical(num_cards_list=(6, 8), depth=4, num_rollouts=10, seed=0):
+    '''
+    Compares the number of nodes in the ValueGraph and the time taken by SMMinimax with history states
+    and canonical states, searching from the first move of GOPS games with different numbers of cards
+
+    Returns:
+        results: list of dictionaries with the measurements for each number of cards
+    '''
+    results = []
+    for num_cards in num_cards_list:
+        result = {'num_cards': num_cards}
+        for canonical in (False, True):
+            state = GOPSState('simultaneous', (num_cards,), (), (), num_cards, canonical=canonical)
+            search = build_gops_smminimax(num_rollouts, rng=np.random.RandomState(seed))
+            graph = ValueGraph()
+            start = time.time()
+            search.expand(graph, state, depth=depth, use_transposition=True)
+            name = 'canonical' if canonical else 'history'
+            result[f'{name}_nodes'] = len(graph.id_to_node)
+            result[f'{name}_time'] = time.time() - start
+            result[f'{name}_action'] = graph.get_best_action(state)
+        results.append(result)
+        print(f"{num_cards} cards: {result['history_nodes']} nodes ({result['history_time']:.2f}s) with history states, "
+              f"{result['canonical_nodes']} nodes ({result['canonical_time']:.2f}s) with canonical states")
+    return results
+
+def benchmark_transitor(num_cards_list=(6, 8, 10, 13), num_games=200, seed=0):
+    '''
+    Compares the time taken by GOPSForwardTransitor and GOPSBitmaskForwardTransitor to play
+    random GOPS games with different numbers of cards
+
+    Returns:
+        results: list of dictionaries with the measurements for each number of cards
+    '''
+    results = []
+    for num_cards in num_cards_list:
+        rng = np.random.RandomState(seed)
+        games = [(rng.permutation(num_cards) + 1, rng.permutation(num_cards) + 1, rng.permutation(num_cards) + 1)
+                 for _ in range(num_games)]
+        result = {'num_cards': num_cards}
+        for name, transitor, make_state in (
+                ('tuple', GOPSForwardTransitor(), lambda: GOPSState('stochastic', (), (), (), num_cards)),
+                ('bitmask', GOPSBitmaskForwardTransitor(), lambda: GOPSBitmaskState('stochastic', num_cards))):
+            start = time.time()
+            for prizes, player_plays, opponent_plays in games:
+                state = make_state()
+                for prize, player_card, opponent_card in zip(prizes, player_plays, opponent_plays):
+                    state = transitor.transition(state, int(prize))
+                    state = transitor.transition(state, (int(player_card), int(opponent_card)))
+            result[f'{name}_time'] = time.time() - start
+        results.append(result)
+        num_transitions = 2 * num_cards * num_games
+        print(f"{num_cards} cards: {1e6 * result['tuple_time'] / num_transitions:.2f}us per transition with tuples, "
+              f"{1e6 * result['bitmask_time'] / num_transitions:.2f}us with bitmasks")
+    return results
+
+def benchmark_parallel(num_cards_list=(6, 8), depth=3, num_rollouts=10, num_workers=None, seed=0):
+    '''
+    Compares the time taken by SMMinimax and by ParallelRootSearch over the same SMMinimax, searching
+    from the first move of GOPS games with different numbers of cards
+
+    Returns:
+        results: list of dictionaries with the measurements for each number of cards
+    '''
+    results = []
+    for num_cards in num_cards_list:
+        state = GOPSState('simultaneous', (num_cards,), (), (), num_cards)
+        result = {'num_cards': num_cards}
+
+        search = build_gops_smminimax(num_rollouts, rng=np.random.RandomState(seed))
+        graph = ValueGraph()
+        start = time.time()
+        result['serial_value'] = search.expand(graph, state, depth=depth)
+        result['serial_time'] = time.time() - start
+
+        parallel_search = ParallelRootSearch(build_gops_smminimax(num_rollouts), num_workers=num_workers, seed=seed)
+        graph = ValueGraph()
+        result['parallel_value'] = parallel_search.expand(graph, state, depth=depth)
+        result['parallel_time'] = parallel_search.last_search_time
+        result['speedup'] = result['serial_time'] / result['parallel_time']
+        results.append(result)
+        print(f"{num_cards} cards: {result['serial_time']:.2f}s serial, {result['parallel_time']:.2f}s with "
+              f"{parallel_search.num_workers} workers ({result['speedup']:.1f}x), "
+              f"values {result['serial_value']:.3f} and {result['parallel_value']:.3f}")
+    return results
+
+def benchmark_profile(num_cards_list=(6, 8), depth=2, num_rollouts=10, seed=0):
+    '''
+    Profiles SMMinimax on the first move of GOPS games with different numbers of cards, showing the time
+    spent in each component of the search and the number of nodes created and reused
+
+    Returns:
+        results: list of dictionaries with the totals of the profiler for each number of cards
+    '''
+    results = []
+    for num_cards in num_cards_list:
+        state = GOPSState('simultaneous', (num_cards,), (), (), num_cards)
+        search = build_gops_smminimax(num_rollouts, rng=np.random.RandomState(seed))
+        with SearchProfiler(search) as profiler:
+            search.expand(ValueGraph(), state, depth=depth)
+        totals = profiler.get_totals()
+        totals['num_cards'] = num_cards
+        results.append(totals)
+        print(f"{num_cards} cards: {profiler.format_summary(totals)}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('benchmark', choices=['pruning', 'rollouts', 'memory', 'canonical', 'transitor', 'parallel', 'profile'])
+    parser.add_argument('--num-cards', type=int, nargs='+', default=[6, 8, 10, 13])
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--num-rollouts', type=int, default=10)
+    parser.add_argument('--num-workers', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.benchmark == 'pruning':
+        benchmark_pruning(args.num_cards, args.depth, args.num_rollouts)
+    elif args.benchmark == 'rollouts':
+        benchmark_rollouts(args.num_cards, args.num_rollouts)
+    elif args.benchmark == 'memory':
+        benchmark_memory(args.num_cards, args.depth, num_rollouts=args.num_rollouts)
+    elif args.benchmark == 'canonical':
+        benchmark_canonical(args.num_cards, args.depth, args.num_rollouts)
+    elif args.benchmark == 'transitor':
+        benchmark_transitor(args.num_cards)
+    elif args.benchmark == 'parallel':
+        benchmark_parallel(args.num_cards, args.depth, args.num_rollouts, args.num_workers)
+    elif args.benchmark == 'profile':
+        benchmark_profile(args.num_cards, args.depth, args.num_rollouts)
@@ -0,0 +1,391 @@
+import time
+import argparse
+import numpy as np
+from Search.baseline_models_GOPS import GOPSState
+
+# CFR+ solver for GOPS
+#
+# apart from the cards chosen in the current round, both players in GOPS know everything, and the rest of the
+# game only depends on the cards left in both hands and in the prize deck and on the contested points (the
+# stake). the solver therefore runs CFR+ on the DAG of these positions instead of the game tree: histories that
+# reach the same position share one row of the regret and strategy tables, and their reach probabilities are
+# summed. each iteration is a forward pass that propagates reach probabilities from the root and a backward
+# pass that computes values and updates regrets, both vectorized over all positions with the same number of cards left
+#
+# positions with k cards left in each hand are stored in levels:
+#   simultaneous level k: k cards in each hand and k-1 in the prize deck, the stake includes the revealed prize
+#   stochastic level k: k cards in each hand and in the prize deck, a prize card is revealed next
+
+def get_key(player_hand, opponent_hand, deck, stake):
+    '''
+    Returns the key of a position in the tables, with the hands and the prize deck as masks of cards
+    '''
+    return (player_hand, opponent_hand, deck, stake)
+
+def get_cards(mask):
+    '''
+    Returns the cards (from 1) in a mask, in increasing order
+    '''
+    return [card + 1 for card in range(mask.bit_length()) if mask >> card & 1]
+
+def state_to_key(state: GOPSState):
+    '''
+    Returns the level and key of the position of a simultaneous or stochastic GOPS state
+
+    Returns:
+        remaining: number of cards left in each hand
+        key: key of the position
+    '''
+    full_mask = (1 << state.num_cards) - 1
+    if hasattr(state, 'get_masks'):
+        player_mask, opponent_mask, prize_mask = state.get_masks()
+    else:
+        player_mask = sum(1 << (card-1) for card in state.player_cards)
+        opponent_mask = sum(1 << (card-1) for card in state.opponent_cards)
+        prize_mask = sum(1 << (card-1) for card in state.prize_cards)
+    _, _, contested_points = state.score_summary()
+    player_hand = full_mask ^ player_mask
+    return bin(player_hand).count('1'), get_key(player_hand, full_mask ^ opponent_mask, full_mask ^ prize_mask, contested_points)
+
+class SimultaneousLevel:
+    '''
+    Simultaneous positions with the same number of cards left, and their regret and strategy tables.
+    Row i of every array belongs to the position with index i in key_to_index
+    '''
+
+    def __init__(self, remaining):
+        self.remaining = remaining
+        self.key_to_index = dict()
+        self.keys = []
+
+    def build(self, next_level):
+        '''
+        Creates the arrays of the level once all of its positions are added
+
+        Args:
+            next_level: stochastic level with one card less, whose positions are added here
+        '''
+        num_positions = len(self.keys)
+        k = self.remaining
+        self.player_cards = np.zeros((num_positions, k), dtype=np.int64)
+        self.opponent_cards = np.zeros((num_positions, k), dtype=np.int64)
+        self.children = np.zeros((num_positions, k, k), dtype=np.int64) # index in next_level after each pair of cards
+        self.rewards = np.zeros((num_positions, k, k)) # points won by the player in the round
+        for i, (player_hand, opponent_hand, deck, stake) in enumerate(self.keys):
+            player_cards = get_cards(player_hand)
+            opponent_cards = get_cards(opponent_hand)
+            self.player_cards[i] = player_cards
+            self.opponent_cards[i] = opponent_cards
+            for x, player_card in enumerate(player_cards):
+                for y, opponent_card in enumerate(opponent_cards):
+                    # the stake stays contested after a tie, and is lost if the game ends
+                    next_stake = stake if player_card == opponent_card else 0
+                    next_key = get_key(player_hand ^ 1 << (player_card-1), opponent_hand ^ 1 << (opponent_card-1), deck, next_stake)
+                    self.children[i, x, y] = next_level.add(next_key)
+                    self.rewards[i, x, y] = np.sign(player_card - opponent_card) * stake
+
+        self.player_regrets = np.zeros((num_positions, k))
+        self.opponent_regrets = np.zeros((num_positions, k))
+        self.player_strategy_sums = np.zeros((num_positions, k))
+        self.opponent_strategy_sums = np.zeros((num_positions, k))
+
+    def add(self, key):
+        '''
+        Returns the index of a position, adding it if it is new
+        '''
+        index = self.key_to_index.get(key)
+        if index is None:
+            index = len(self.keys)
+            self.key_to_index[key] = index
+            self.keys.append(key)
+        return index
+
+class StochasticLevel(SimultaneousLevel):
+    '''
+    Stochastic positions with the same number of cards left, where a prize card from the deck is revealed uniformly at random
+    '''
+
+    def build(self, next_level):
+        '''
+        Creates the arrays of the level once all of its positions are added
+
+        Args:
+            next_level: simultaneous level with the same number of cards, whose positions are added here
+        '''
+        k = self.remaining
+        self.children = np.zeros((len(self.keys), k), dtype=np.int64) # index in next_level after each prize card
+        for i, (player_hand, opponent_hand, deck, stake) in enumerate(self.keys):
+            for x, prize in enumerate(get_cards(deck)):
+                self.children[i, x] = next_level.add(get_key(player_hand, opponent_hand, deck ^ 1 << (prize-1), stake + prize))
+
+def regret_matching(regrets):
+    '''
+    Returns the strategies proportional to the positive regrets of each row, uniform for rows without positive regrets
+    '''
+    positive = np.maximum(regrets, 0.0)
+    totals = positive.sum(axis=1, keepdims=True)
+    uniform = np.full_like(regrets, 1.0 / regrets.shape[1])
+    return np.where(totals > 0, positive / np.where(totals > 0, totals, 1.0), uniform)
+
+def scatter_add(indices, values, size):
+    '''
+    Sums values into the positions given by indices, separately for each row of values
+
+    Args:
+        indices: array of indices in [0, size)
+        values: (rows,) + indices.shape array of values
+
+    Returns:
+        sums: (rows, size) array of sums
+    '''
+    return np.stack([np.bincount(indices.ravel(), weights=row.ravel(), minlength=size) for row in values])
+
+class GOPSCFRSolver:
+    '''
+    Solves GOPS from a root state with CFR+ (regret matching+ with linearly weighted average strategies)
+
+    The average strategies are in arrays indexed by position, so get_average_strategy is a dictionary lookup
+    and a row of an array. The number of positions grows quickly with the number of cards left at the root:
+    complete games are practical up to about 7 cards, while later endgames of larger games can be solved
+    from the current state
+    '''
+
+    def __init__(self, root: GOPSState):
+        '''
+        Args:
+            root: simultaneous or stochastic state to solve the game from
+        '''
+        if root.state_type not in ('simultaneous', 'stochastic'):
+            raise ValueError(f"cannot solve from a {root.state_type} state")
+        self.num_cards = root.num_cards
+        self.num_iterations = 0
+        self.root_remaining, root_key = state_to_key(root)
+        self.root_type = root.state_type
+
+        # create the positions level by level, from the root to the end of the game
+        self.simultaneous_levels = {k: SimultaneousLevel(k) for k in range(1, self.root_remaining + 1)}
+        self.stochastic_levels = {k: StochasticLevel(k) for k in range(0, self.root_remaining + 1)}
+        root_level = self.simultaneous_levels if self.root_type == 'simultaneous' else self.stochastic_levels
+        root_level[self.root_remaining].add(root_key)
+        for k in range(self.root_remaining, 0, -1):
+            self.stochastic_levels[k].build(self.simultaneous_levels[k])
+            self.simultaneous_levels[k].build(self.stochastic_levels[k-1])
+
+    def get_num_positions(self):
+        '''
+        Returns the number of simultaneous positions, which are the rows of the regret and strategy tables
+        '''
+        return sum(len(level.keys) for level in self.simultaneous_levels.values())
+
+    def _forward(self, player_strategies, opponent_strategies):
+        '''
+        Propagates reach probabilities from the root
+
+        Returns:
+            reaches: maps each simultaneous level to the (opponent and chance reach, player and chance reach,
+                player reach, opponent reach) of its positions, summed over the histories that reach them
+        '''
+        k = self.root_remaining
+        size = len(self.stochastic_levels[k].keys) if self.root_type == 'stochastic' else len(self.simultaneous_levels[k].keys)
+        reach = np.zeros((4, size))
+        reach[:, 0] = 1.0
+        reaches = dict()
+        for k in range(self.root_remaining, 0, -1):
+            if self.root_type == 'simultaneous' and k == self.root_remaining:
+                simultaneous_reach = reach
+            else:
+                # prize cards are revealed uniformly at random, which only changes the reaches that include chance
+                level = self.stochastic_levels[k]
+                chance = np.array([1.0 / k, 1.0 / k, 1.0, 1.0])[:, None, None]
+                child_reach = np.broadcast_to(reach[:, :, None] * chance, (4,) + level.children.shape)
+                simultaneous_reach = scatter_add(level.children, child_reach, len(self.simultaneous_levels[k].keys))
+            reaches[k] = simultaneous_reach
+
+            level = self.simultaneous_levels[k]
+            player_strategy = player_strategies[k][:, :, None]
+            opponent_strategy = opponent_strategies[k][:, None, :]
+            child_reach = np.empty((4,) + level.children.shape)
+            child_reach[0] = simultaneous_reach[0][:, None, None] * opponent_strategy
+            child_reach[1] = simultaneous_reach[1][:, None, None] * player_strategy
+            child_reach[2] = simultaneous_reach[2][:, None, None] * player_strategy
+            child_reach[3] = simultaneous_reach[3][:, None, None] * opponent_strategy
+            reach = scatter_add(level.children, child_reach, len(self.stochastic_levels[k-1].keys))
+        return reaches
+
+    def _get_payoffs(self, k, stochastic_values):
+        '''
+        Returns the (positions, player cards, opponent cards) payoffs of simultaneous level k, given the values of stochastic level k-1
+        '''
+        level = self.simultaneous_levels[k]
+        return level.rewards + stochastic_values[level.children]
+
+    def _stochastic_values(self, k, simultaneous_values):
+        '''
+        Returns the values of stochastic level k, given the values of simultaneous level k
+        '''
+        return simultaneous_values[self.stochastic_levels[k].children].mean(axis=1)
+
+    def iterate(self, num_iterations=1):
+        '''
+        Runs iterations of CFR+. The players update their regrets in turn, each against the other's latest strategies
+        '''
+        for _ in range(num_iterations):
+            self.num_iterations += 1
+            for updating_player in (0, 1):
+                self._update(updating_player)
+
+    def _update(self, updating_player):
+        '''
+        Updates the regrets and average strategies of one player with a forward and a backward pass
+
+        Args:
+            updating_player: 0 for the player, 1 for the opponent
+        '''
+        player_strategies = {k: regret_matching(level.player_regrets) for k, level in self.simultaneous_levels.items()}
+        opponent_strategies = {k: regret_matching(level.opponent_regrets) for k, level in self.simultaneous_levels.items()}
+        reaches = self._forward(player_strategies, opponent_strategies)
+
+        # backward pass from the end of the game
+        stochastic_values = np.zeros(len(self.stochastic_levels[0].keys))
+        for k in range(1, self.root_remaining + 1):
+            level = self.simultaneous_levels[k]
+            payoffs = self._get_payoffs(k, stochastic_values)
+            player_strategy = player_strategies[k]
+            opponent_strategy = opponent_strategies[k]
+            player_action_values = np.einsum('nxy,ny->nx', payoffs, opponent_strategy)
+            values = np.einsum('nx,nx->n', player_action_values, player_strategy)
+
+            # regret matching+ clips the cumulative regrets at 0, the opponent minimizes the player's value
+            opponent_reach, player_reach, player_own_reach, opponent_own_reach = reaches[k]
+            if updating_player == 0:
+                level.player_regrets = np.maximum(level.player_regrets + opponent_reach[:, None] * (player_action_values - values[:, None]), 0.0)
+                level.player_strategy_sums += self.num_iterations * player_own_reach[:, None] * player_strategy
+            else:
+                opponent_action_values = np.einsum('nxy,nx->ny', payoffs, player_strategy)
+                level.opponent_regrets = np.maximum(level.opponent_regrets + player_reach[:, None] * (values[:, None] - opponent_action_values), 0.0)
+                level.opponent_strategy_sums += self.num_iterations * opponent_own_reach[:, None] * opponent_strategy
+
+            stochastic_values = self._stochastic_values(k, values)
+
+    def solve(self, num_iterations=1000, time_limit=None):
+        '''
+        Runs iterations of CFR+ until num_iterations are run or time_limit runs out
+
+        Returns:
+            exploitability: exploitability of the average strategies
+        '''
+        deadline = None if time_limit is None else time.time() + time_limit
+        for _ in range(num_iterations):
+            if deadline is not None and time.time() > deadline:
+                break
+            self.iterate()
+        return self.get_exploitability()
+
+    def _average_strategies(self, k):
+        '''
+        Returns the average strategies of both players at simultaneous level k
+        '''
+        level = self.simultaneous_levels[k]
+        return regret_matching(level.player_strategy_sums), regret_matching(level.opponent_strategy_sums)
+
+    def get_average_strategy(self, state: GOPSState, player=0):
+        '''
+        Returns the average strategy of a player at a simultaneous state
+
+        Args:
+            state: simultaneous state, from the point of view of player 0
+            player: 0 for the player of the state, 1 for the opponent
+
+        Returns:
+            card_to_prob: maps each card in the player's hand to its probability, or None if the state was not solved
+        '''
+        remaining, key = state_to_key(state)
+        level = self.simultaneous_levels.get(remaining)
+        index = None if level is None else level.key_to_index.get(key)
+        if index is None:
+            return None
+        if player == 0:
+            cards, strategy_sums = level.player_cards[index], level.player_strategy_sums[index]
+        else:
+            cards, strategy_sums = level.opponent_cards[index], level.opponent_strategy_sums[index]
+        total = strategy_sums.sum()
+        probs = strategy_sums / total if total > 0 else np.full(len(cards), 1.0 / len(cards))
+        return dict(zip(cards.tolist(), probs.tolist()))
+
+    def get_values(self, player_response=False, opponent_response=False):
+        '''
+        Returns the value of the root when the players play their average strategies, or best respond to the other's
+
+        Args:
+            player_response: whether the player best responds
+            opponent_response: whether the opponent best responds
+
+        Returns:
+            value: value of the root to the player, not counting the points scored before the root
+        '''
+        stochastic_values = np.zeros(len(self.stochastic_levels[0].keys))
+        for k in range(1, self.root_remaining + 1):
+            payoffs = self._get_payoffs(k, stochastic_values)
+            player_strategy, opponent_strategy = self._average_strategies(k)
+            if player_response:
+                player_action_values = np.einsum('nxy,ny->nx', payoffs, opponent_strategy)
+                values = player_action_values.max(axis=1)
+            elif opponent_response:
+                opponent_action_values = np.einsum('nxy,nx->ny', payoffs, player_strategy)
+                values = opponent_action_values.min(axis=1)
+            else:
+                values = np.einsum('nxy,nx,ny->n', payoffs, player_strategy, opponent_strategy)
+            if k == self.root_remaining and self.root_type == 'simultaneous':
+                return values[0]
+            stochastic_values = self._stochastic_values(k, values)
+        return stochastic_values[0]
+
+    def get_exploitability(self):
+        '''
+        Returns how much the players can gain in total by best responding to each other's average strategies,
+        which is 0 at a Nash equilibrium
+        '''
+        return self.get_values(player_response=True) - self.get_values(opponent_response=True)
+
+    def save(self, filename):
+        '''
+        Saves the average strategies to a .npz file
+        '''
+        arrays = {'num_cards': self.num_cards, 'num_iterations': self.num_iterations}
+        for k, level in self.simultaneous_levels.items():
+            arrays[f'keys_{k}'] = np.array(level.keys, dtype=np.int64).reshape(-1, 4)
+            arrays[f'player_strategy_sums_{k}'] = level.player_strategy_sums
+            arrays[f'opponent_strategy_sums_{k}'] = level.opponent_strategy_sums
+        np.savez_compressed(filename, **arrays)
+
+    def load(self, filename):
+        '''
+        Loads average strategies saved by a solver with the same root
+        '''
+        arrays = np.load(filename)
+        if int(arrays['num_cards']) != self.num_cards:
+            raise ValueError(f"{filename} was solved for {int(arrays['num_cards'])} cards, not {self.num_cards}")
+        self.num_iterations = int(arrays['num_iterations'])
+        for k, level in self.simultaneous_levels.items():
+            keys = [tuple(key) for key in arrays[f'keys_{k}'].tolist()]
+            if keys != level.keys:
+                raise ValueError(f"{filename} was solved from a different root")
+            level.player_strategy_sums = arrays[f'player_strategy_sums_{k}']
+            level.opponent_strategy_sums = arrays[f'opponent_strategy_sums_{k}']
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--num-cards', type=int, default=5)
+    parser.add_argument('--num-iterations', type=int, default=1000)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    start = time.time()
+    solver = GOPSCFRSolver(GOPSState('stochastic', (), (), (), args.num_cards))
+    print(f"{solver.get_num_positions()} positions created in {time.time() - start:.2f}s")
+    for _ in range(10):
+        exploitability = solver.solve(args.num_iterations // 10)
+        print(f"{solver.num_iterations} iterations, {time.time() - start:.2f}s, value {solver.get_values():.4f}, exploitability {exploitability:.4f}")
+    if args.output is not None:
+        solver.save(args.output)
@@ -31,37 +31,99 @@ class RandomRolloutValueHeuristic(ValueHeuristic):
         values_estimates = np.zeros(self.num_rollouts)
         for i in range(self.num_rollouts):
             # copy state
-            state = state.copy()
+            rollout_state = state.copy()
             # rollout
-            while not state.is_done():
-                if state.state_type == 'simultaneous': # only works or 1 oppoenent atm
+            while not rollout_state.is_done():
+                if rollout_state.state_type == 'simultaneous': # only works or 1 oppoenent atm
                     # get actions
-                    actions = self.action_enumerator.enumerate(state)
-                    opponent_actions = self.opponent_action_enumerator.enumerate(state)
+                    actions = self.action_enumerator.enumerate(rollout_state)
+                    opponent_actions = self.opponent_action_enumerator.enumerate(rollout_state)
                     # choose random action
                     action = np.random.choice(list(actions))
                     opponent_action = np.random.choice(list(opponent_actions))
                     joint_action = (action, opponent_action)
                     # step
-                    state = self.forward_transitor.transition(state, joint_action)
-                elif state.state_type == 'stochastic':
+                    rollout_state = self.forward_transitor.transition(rollout_state, joint_action)
+                elif rollout_state.state_type == 'stochastic':
                     # get actions
-                    actions = self.rs_enumerator.enumerate(state)
+                    actions = self.rs_enumerator.enumerate(rollout_state)
                     # print('state', state)
                     # print('actions', actions)
                     # print('state type', state_copy.state_type)
                     # choose random action
                     action = np.random.choice(actions)
                     # step
-                    state = self.forward_transitor.transition(state, action)
+                    rollout_state = self.forward_transitor.transition(rollout_state, action)
                 else:
                     raise NotImplementedError
             # get reward. TODO: only implemented for end states
-            values_estimates[i] = state.get_reward()
+            values_estimates[i] = rollout_state.get_reward()
 
         utility = np.mean(values_estimates)
         # print('rollout utility', utility)
         return utility
             
 
+class GOPSRandomRolloutValueHeuristic(ValueHeuristic):
+    '''
+    Random rollout value heuristic for GOPS that simulates all rollouts at once with NumPy
 
+    Both players play uniformly random cards and prize cards are drawn uniformly at random, as in
+    RandomRolloutValueHeuristic with the GOPS models, so each rollout is a random shuffle of the remaining
+    hands and prize cards.
+    '''
+
+    def __init__(self, num_rollouts=100, rng=None):
+        '''
+        Args:
+            num_rollouts: number of rollouts to perform
+            rng: random number generator
+        '''
+        super().__init__()
+        self.num_rollouts = num_rollouts
+        if rng is None:
+            rng = np.random.RandomState()
+        self.rng = rng
+
+    def _shuffle(self, cards):
+        '''
+        Returns a (num_rollouts, len(cards)) array where each row is a random permutation of cards
+        '''
+        keys = self.rng.random_sample((self.num_rollouts, len(cards)))
+        return np.asarray(cards)[np.argsort(keys, axis=1)]
+
+    def evaluate(self, state):
+        '''
+        Predicts the value of the state
+
+        Args:
+            state: current GOPS state
+
+        Returns:
+            value: mean final score difference over the rollouts
+        '''
+        if state.is_done():
+            return state.get_reward()
+
+        player_score, opponent_score, contested_points = state.score_summary()
+        deck = set(range(1, state.num_cards+1))
+        player_hand = sorted(deck - set(state.player_cards))
+        opponent_hand = sorted(deck - set(state.opponent_cards))
+        prize_deck = sorted(deck - set(state.prize_cards))
+
+        player_plays = self._shuffle(player_hand)
+        opponent_plays = self._shuffle(opponent_hand)
+        prizes = self._shuffle(prize_deck)
+        # in simultaneous states the prize card of the first round is already in contested_points
+        if len(prize_deck) < len(player_hand):
+            prizes = np.concatenate([np.zeros((self.num_rollouts, 1), dtype=prizes.dtype), prizes], axis=1)
+
+        score_differences = np.full(self.num_rollouts, player_score - opponent_score, dtype=float)
+        contested = np.full(self.num_rollouts, contested_points, dtype=float)
+        for idx in range(len(player_hand)):
+            contested += prizes[:, idx]
+            winners = np.sign(player_plays[:, idx] - opponent_plays[:, idx])
+            score_differences += winners * contested
+            contested[winners != 0] = 0.0
+
+        return np.mean(score_differences)
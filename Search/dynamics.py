@@ -1,5 +1,6 @@
 from headers import *
 from prompts import *
+from llm_batching import batch_single_action
 import re
 from langchain.chat_models import ChatOpenAI
 from langchain.schema import HumanMessage, SystemMessage
@@ -262,12 +263,32 @@ class GPT35ValueHeuristic(ValueHeuristic):
     Value heuristic for GPT-3.5
     '''
 
-    def __init__(self, model):
+    def __init__(self, model, max_concurrency=8):
         '''
         Args:
             model: GPT-3.5 model
+            max_concurrency: maximum number of model calls in flight in evaluate_many
         '''
         self.model = model
+        self.max_concurrency = max_concurrency
+
+    def get_prompts(self, state: State):
+        '''
+        Returns the probability prompt and the value prompt for the state
+        '''
+        prob_prompt = "Current State: {state}\n".format(state=state.notes)
+        prob_prompt += VALUE_PREDICTOR_PROMPTS[0]
+        value_prompt = "Current State: {state}\n".format(state=state.notes)
+        value_prompt += VALUE_PREDICTOR_PROMPTS[1]
+        return prob_prompt, value_prompt
+
+    def parse_outputs(self, prob_output, value_output):
+        '''
+        Returns the value parsed from the outputs of the model
+        '''
+        prob_value = parse_prob_value(prob_output)
+        value = parse_int_value(value_output)
+        return value
 
     def evaluate(self, state: State) -> Dict:
         '''
@@ -279,21 +300,21 @@ class GPT35ValueHeuristic(ValueHeuristic):
         Returns:
             value: value of the state
         '''
-        # Prepare input
-        prob_prompt = "Current State: {state}\n".format(state=state.notes)
-        prob_prompt += VALUE_PREDICTOR_PROMPTS[0]
-        value_prompt = "Current State: {state}\n".format(state=state.notes)
-        value_prompt += VALUE_PREDICTOR_PROMPTS[1]
+        return self.evaluate_many([state])[0]
 
-        # Call the model
-        prob_output = self.model.single_action(prob_prompt)
-        value_output = self.model.single_action(value_prompt)
+    def evaluate_many(self, states):
+        '''
+        Predicts the values of the states, sending the prompts of all states to the model concurrently
 
-        # Parse the output
-        prob_value = parse_prob_value(prob_output)
-        value = parse_int_value(value_output)
+        Args:
+            states: list of states
 
-        return value
+        Returns:
+            values: list of values of the states
+        '''
+        prompts = [prompt for state in states for prompt in self.get_prompts(state)]
+        outputs = batch_single_action(self.model, prompts, self.max_concurrency)
+        return [self.parse_outputs(outputs[2*i], outputs[2*i+1]) for i in range(len(states))]
     
 class GPT35ActionEnumerator(ActionEnumerator):
     '''
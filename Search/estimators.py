@@ -37,10 +37,10 @@ class UtilityEstimatorMean(UtilityEstimator):
         Returns:
             utility: estimated utility of the node
         '''
-        if len(node.values_estimates) == 0:
+        if node.get_visits() == 0:
             return 0.0
         else:
-            return np.mean(node.values_estimates)
+            return node.get_mean_value()
         
 class UtilityEstimatorLast(UtilityEstimator):
     '''
@@ -59,7 +59,7 @@ class UtilityEstimatorLast(UtilityEstimator):
         Returns:
             utility: estimated utility of the node
         '''
-        if len(node.values_estimates) == 0:
+        if node.get_visits() == 0:
             return 0.0
         else:
-            return node.values_estimates[-1]
\ No newline at end of file
+            return node.get_last_value()
\ No newline at end of file
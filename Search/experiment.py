@@ -13,6 +13,7 @@ import logging
 from datetime import datetime
 from tqdm import tqdm
 from Search.classic_models import *
+from Search.llm_cache import CachedModel
 
 SYS_PROMPT = """You are a player in a GOPS (Game of pure strategy) game. The game has two players, and is played with a deck of cards. Each player is dealt a hand of cards. \
 The goal of the game is to get the highest total scores. In each round, a player is asked to play a card from the hand to win the current score. The player who plays the highest card wins the round. \
@@ -36,8 +37,10 @@ if __name__ == "__main__":
             key = os.environ.get("OPENAI_API_KEY")
             
             self.model = ChatOpenAI(temperature=0.1, openai_api_key=key)
+        def get_messages(self, input_prompt: str):
+            return [HumanMessage(content=SYS_PROMPT), HumanMessage(content=input_prompt)]
         def single_action(self, input_prompt: str):
-            input_prompt = [HumanMessage(content=SYS_PROMPT), HumanMessage(content=input_prompt)]
+            input_prompt = self.get_messages(input_prompt)
             output = self.model(input_prompt).content
             # print(input_prompt)
             # print(output)
@@ -50,8 +53,10 @@ if __name__ == "__main__":
             key = os.environ.get("CLAUDE_API_KEY")
 
             self.model = ChatAnthropic(model="claude-2", temperature=0.1, anthropic_api_key=key)
+        def get_messages(self, input_prompt: str):
+            return [HumanMessage(content=SYS_PROMPT), HumanMessage(content=input_prompt)]
         def single_action(self, input_prompt: str):
-            input_prompt = [HumanMessage(content=SYS_PROMPT), HumanMessage(content=input_prompt)]
+            input_prompt = self.get_messages(input_prompt)
             output = self.model(input_prompt).content
             # print(input_prompt)
             logger.info(output)
@@ -75,7 +80,8 @@ if __name__ == "__main__":
             self.hand.remove(card)
             return card
 
-    model = GPT35()
+    # outputs are cached in Search/cache, so repeated runs over the same positions do not call the model again
+    model = CachedModel(GPT35(), model_id='gpt-3.5-turbo', temperature=0.1)
     # model = RandomModel()
 
     # Instantiate the dynamics
@@ -166,6 +172,7 @@ if __name__ == "__main__":
 
     # print winrate of the player across all games
     print("Winrate: {}".format(player_wins/iter_num))
+    print("Model cache: {}".format(model.get_stats()))
 
 
 # run with python -m Search.test_search
\ No newline at end of file
@@ -331,7 +331,32 @@ class ValueHeuristic():
             value: value of the state
         '''
         raise NotImplementedError
-    
+
+    def evaluate_many(self, states):
+        '''
+        Evaluates several states. Heuristics that can evaluate states concurrently or in a batch should override this
+
+        Args:
+            states: list of states
+
+        Returns:
+            values: list of values of the states, in the same order
+        '''
+        return [self.evaluate(state) for state in states]
+
+    def is_exact(self, state: State):
+        '''
+        Returns whether evaluate returns the exact value of the state, so that searches can stop at the state
+        instead of searching below it. Heuristics that solve some states exactly (eg. endgame tablebases) should override this
+
+        Args:
+            state: current state
+
+        Returns:
+            exact: whether the value of the state is exact
+        '''
+        return False
+
 class QHeuristic():
     '''
     Abstract class for a heuristic
@@ -0,0 +1,203 @@
+import time
+from collections import defaultdict
+from Search.search import Search
+
+# components of a search that the profiler wraps, and the methods of them that it counts and times
+COMPONENT_NAMES = ['forward_transistor', 'value_heuristic', 'action_enumerator', 'random_state_enumerator',
+                   'random_state_predictor', 'opponent_action_enumerator', 'opponent_enumerator',
+                   'opponent_action_predictor', 'utility_estimator']
+TIMED_METHODS = {'transition', 'evaluate', 'evaluate_many', 'is_exact', 'enumerate', 'predict', 'estimate'}
+
+class ComponentStats:
+    '''
+    Number of calls and total time of calls to one method of a component
+    '''
+    __slots__ = ('calls', 'time')
+
+    def __init__(self):
+        self.calls = 0
+        self.time = 0.0
+
+class ComponentProxy:
+    '''
+    Forwards everything to a component, counting and timing calls to the methods in TIMED_METHODS
+    '''
+
+    def __init__(self, component, name, profiler):
+        object.__setattr__(self, '_component', component)
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_profiler', profiler)
+        object.__setattr__(self, '_wrappers', dict())
+
+    def __getattr__(self, attr):
+        value = getattr(self._component, attr)
+        if attr not in TIMED_METHODS or not callable(value):
+            return value
+        if attr not in self._wrappers:
+            self._wrappers[attr] = self._profiler._wrap(f"{self._name}.{attr}", value)
+        return self._wrappers[attr]
+
+    def __setattr__(self, attr, value):
+        setattr(self._component, attr, value)
+
+class SearchProfiler:
+    '''
+    Optional instrumentation for Search. While attached, it replaces the components of the search with
+    proxies that count and time their calls, counts the nodes that the search creates and reuses, and
+    records a summary for every top-level call to expand (calls that expand makes to itself are included
+    in the summary of the top-level call)
+
+    Usage:
+        with SearchProfiler(search) as profiler:
+            search.expand(graph, state, depth=3)
+        print(profiler.format_summary())
+    '''
+
+    def __init__(self, search: Search):
+        '''
+        Args:
+            search: search to profile
+        '''
+        self.search = search
+        self.summaries = [] # one summary per top-level call to expand
+        self._originals = dict() # attributes of the search replaced while attached
+        self._level = 0 # number of nested calls to expand
+        self._reset_current()
+
+    def _reset_current(self):
+        '''
+        Starts collecting the statistics of the next summary
+        '''
+        self._component_stats = defaultdict(ComponentStats)
+        self._num_expand_calls = 0
+        self._nodes_created = 0
+        self._nodes_reused = 0
+
+    def _wrap(self, name, method):
+        '''
+        Returns a function that calls method and adds the call to the statistics under name
+        '''
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                stats = self._component_stats[name]
+                stats.calls += 1
+                stats.time += time.perf_counter() - start
+        return timed
+
+    def attach(self):
+        '''
+        Starts profiling the search
+        '''
+        if self._originals:
+            return
+        for name in COMPONENT_NAMES:
+            component = getattr(self.search, name, None)
+            if component is not None:
+                self._originals[name] = component
+                setattr(self.search, name, ComponentProxy(component, name, self))
+
+        # instance attributes shadow the methods, so recursive calls also go through the wrappers
+        expand = self.search.expand
+        get_or_create_node = self.search._get_or_create_node
+        self._originals['expand'] = None
+        self._originals['_get_or_create_node'] = None
+
+        def profiled_expand(*args, **kwargs):
+            if self._level == 0:
+                start = time.perf_counter()
+            self._level += 1
+            self._num_expand_calls += 1
+            try:
+                return expand(*args, **kwargs)
+            finally:
+                self._level -= 1
+                if self._level == 0:
+                    self._add_summary(time.perf_counter() - start)
+
+        def profiled_get_or_create_node(graph, state, prev_node = None):
+            start = time.perf_counter()
+            if graph.get_node(state) is None:
+                self._nodes_created += 1
+            else:
+                self._nodes_reused += 1
+            try:
+                return get_or_create_node(graph, state, prev_node)
+            finally:
+                stats = self._component_stats['graph._get_or_create_node']
+                stats.calls += 1
+                stats.time += time.perf_counter() - start
+
+        self.search.expand = profiled_expand
+        self.search._get_or_create_node = profiled_get_or_create_node
+
+    def detach(self):
+        '''
+        Stops profiling the search and restores its components and methods
+        '''
+        for name, original in self._originals.items():
+            if original is None:
+                # remove the instance attribute so that the method of the class is used again
+                self.search.__dict__.pop(name, None)
+            else:
+                setattr(self.search, name, original)
+        self._originals = dict()
+
+    def __enter__(self):
+        self.attach()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.detach()
+        return False
+
+    def _add_summary(self, elapsed):
+        '''
+        Records the statistics collected since the last summary
+        '''
+        components = {name: {'calls': stats.calls, 'time': stats.time} for name, stats in self._component_stats.items()}
+        component_time = sum(stats['time'] for stats in components.values())
+        self.summaries.append({
+            'time': elapsed,
+            'num_expand_calls': self._num_expand_calls,
+            'nodes_created': self._nodes_created,
+            'nodes_reused': self._nodes_reused,
+            'components': components,
+            'other_time': max(0.0, elapsed - component_time), # time spent in the search itself
+        })
+        self._reset_current()
+
+    def get_totals(self):
+        '''
+        Returns:
+            totals: summary with the statistics of all top-level calls to expand added up
+        '''
+        totals = {'time': 0.0, 'num_expand_calls': 0, 'nodes_created': 0, 'nodes_reused': 0, 'components': dict(), 'other_time': 0.0}
+        for summary in self.summaries:
+            for key in ('time', 'num_expand_calls', 'nodes_created', 'nodes_reused', 'other_time'):
+                totals[key] += summary[key]
+            for name, stats in summary['components'].items():
+                total = totals['components'].setdefault(name, {'calls': 0, 'time': 0.0})
+                total['calls'] += stats['calls']
+                total['time'] += stats['time']
+        return totals
+
+    def format_summary(self, summary=None):
+        '''
+        Returns a table of a summary, sorted by the time spent in each component
+
+        Args:
+            summary: summary to format, defaults to the totals of all summaries
+        '''
+        if summary is None:
+            summary = self.get_totals()
+        lines = [f"{summary['num_expand_calls']} expand calls in {summary['time']:.3f}s, "
+                 f"{summary['nodes_created']} nodes created, {summary['nodes_reused']} nodes reused"]
+        components = sorted(summary['components'].items(), key=lambda item: item[1]['time'], reverse=True)
+        for name, stats in components + [('other', {'calls': 0, 'time': summary['other_time']})]:
+            share = stats['time'] / summary['time'] if summary['time'] > 0 else 0.0
+            calls = f"{stats['calls']:>10}" if name != 'other' else f"{'':>10}"
+            lines.append(f"  {name:<45}{calls} calls {stats['time']:>9.3f}s {100*share:>5.1f}%")
+        return '\n'.join(lines)
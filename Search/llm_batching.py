@@ -0,0 +1,51 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+# helpers to send many prompts to a model with a blocking single_action(prompt) method at the same time
+
+async def gather_single_actions(model, prompts, max_concurrency=8):
+    '''
+    Calls model.single_action on each prompt in a worker thread, with at most max_concurrency calls at a time
+
+    Args:
+        model: model with a single_action(prompt) method that returns the output of the model
+        prompts: list of prompts
+        max_concurrency: maximum number of calls in flight
+
+    Returns:
+        outputs: list of outputs in the same order as prompts
+    '''
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def call(prompt):
+        async with semaphore:
+            return await asyncio.to_thread(model.single_action, prompt)
+
+    return await asyncio.gather(*(call(prompt) for prompt in prompts))
+
+def batch_single_action(model, prompts, max_concurrency=8):
+    '''
+    Blocking version of gather_single_actions that can be called from synchronous search code
+
+    Prompts are sent one at a time if there is only one prompt or max_concurrency is 1.
+    If an event loop is already running in this thread, the calls are made from a new event loop in another thread
+
+    Args:
+        model: model with a single_action(prompt) method that returns the output of the model
+        prompts: list of prompts
+        max_concurrency: maximum number of calls in flight
+
+    Returns:
+        outputs: list of outputs in the same order as prompts
+    '''
+    prompts = list(prompts)
+    if len(prompts) <= 1 or max_concurrency <= 1:
+        return [model.single_action(prompt) for prompt in prompts]
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(gather_single_actions(model, prompts, max_concurrency))
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, gather_single_actions(model, prompts, max_concurrency)).result()
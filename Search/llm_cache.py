@@ -0,0 +1,164 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+
+class CachedModel:
+    '''
+    Wraps a model with a single_action(prompt) method and caches its outputs on disk
+
+    Each output is stored in its own file named by the sha256 of the model id, temperature and the messages sent
+    to the model, so the cache can be shared by different runs and different models. Models that add messages to
+    the prompt (eg. a system prompt) should return all of them from a get_messages(prompt) method, so that
+    changing those messages does not return stale outputs; otherwise the prompt is the only message. Files are written atomically, so concurrent
+    calls (eg. from Search/llm_batching.py) and interrupted runs never leave partial entries.
+    When the cache holds more than max_entries files, the least recently used ones are deleted
+    '''
+
+    def __init__(self, model, cache_dir='Search/cache', model_id=None, temperature=None, max_entries=100000):
+        '''
+        Args:
+            model: model with a single_action(prompt) method, and optionally a get_messages(prompt) method that
+                returns the messages single_action sends, as strings or as objects with type and content
+            cache_dir: directory to store the cache in
+            model_id: name of the model in the cache keys, defaults to the class name of the model
+            temperature: temperature of the model in the cache keys, defaults to model.temperature if it exists
+            max_entries: maximum number of entries to keep, or None for no limit
+        '''
+        self.model = model
+        self.cache_dir = cache_dir
+        self.model_id = model_id if model_id is not None else type(model).__name__
+        self.temperature = temperature if temperature is not None else getattr(model, 'temperature', None)
+        self.max_entries = max_entries
+        self.hits = 0 # number of calls answered from the cache
+        self.misses = 0 # number of calls sent to the model
+        self.num_evicted = 0 # number of entries deleted to stay under max_entries
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._num_entries = len(self._entry_paths())
+
+    def get_messages(self, prompt: str):
+        '''
+        Returns the messages that the model sends for the prompt, as (type, content) pairs
+        '''
+        if not hasattr(self.model, 'get_messages'):
+            return [('human', prompt)]
+        return [(getattr(message, 'type', 'human'), getattr(message, 'content', message))
+                for message in self.model.get_messages(prompt)]
+
+    def get_key(self, prompt: str):
+        '''
+        Returns the cache key of the prompt for this model and temperature, from all the messages sent for it
+        '''
+        content = json.dumps([self.model_id, self.temperature, self.get_messages(prompt)])
+        return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+    def _get_path(self, key):
+        '''
+        Returns the path of the entry with the key, in a subdirectory named by its first two characters
+        '''
+        return os.path.join(self.cache_dir, key[:2], key + '.json')
+
+    def _entry_paths(self):
+        '''
+        Returns the paths of all entries in the cache
+        '''
+        paths = []
+        for subdir in os.listdir(self.cache_dir):
+            subdir = os.path.join(self.cache_dir, subdir)
+            if os.path.isdir(subdir):
+                paths.extend(os.path.join(subdir, name) for name in os.listdir(subdir) if name.endswith('.json'))
+        return paths
+
+    def _read(self, path):
+        '''
+        Returns (True, output) if the entry at path exists and can be read, otherwise (False, None)
+        '''
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return False, None
+        # mark the entry as recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return True, entry['output']
+
+    def _write(self, path, prompt, output):
+        '''
+        Writes the entry to a temporary file and renames it to path
+
+        Returns:
+            created: whether path did not exist before
+        '''
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {'model_id': self.model_id, 'temperature': self.temperature, 'messages': self.get_messages(prompt),
+                 'output': output}
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            created = not os.path.exists(path)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        return created
+
+    def _evict(self):
+        '''
+        Deletes the least recently used entries until there are at most 90% of max_entries,
+        so that the cache directory is not scanned on every call once it is full
+        '''
+        paths = self._entry_paths()
+        paths.sort(key=lambda path: os.path.getmtime(path))
+        for path in paths[:max(0, len(paths) - int(0.9 * self.max_entries))]:
+            try:
+                os.remove(path)
+                self.num_evicted += 1
+            except OSError:
+                pass
+        self._num_entries = len(self._entry_paths())
+
+    def single_action(self, input_prompt: str):
+        '''
+        Returns the cached output for the prompt, or calls the model and caches its output
+        '''
+        path = self._get_path(self.get_key(input_prompt))
+        found, output = self._read(path)
+        if found:
+            with self._lock:
+                self.hits += 1
+            return output
+
+        output = self.model.single_action(input_prompt)
+        with self._lock:
+            self.misses += 1
+            if self._write(path, input_prompt, output):
+                self._num_entries += 1
+            if self.max_entries is not None and self._num_entries > self.max_entries:
+                self._evict()
+        return output
+
+    def get_stats(self):
+        '''
+        Returns:
+            stats: dictionary with the number of hits, misses, evicted entries and entries in the cache
+        '''
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'num_evicted': self.num_evicted, 'num_entries': self._num_entries}
+
+    def clear(self):
+        '''
+        Deletes all entries and resets the counters
+        '''
+        with self._lock:
+            for path in self._entry_paths():
+                os.remove(path)
+            self._num_entries = 0
+            self.hits = 0
+            self.misses = 0
+            self.num_evicted = 0
@@ -0,0 +1,117 @@
+import numpy as np
+
+# solvers for two-player zero-sum matrix games, used by SMMinimax to find mixed strategies at simultaneous nodes
+
+def find_saddle_point(payoffs: np.ndarray, tolerance=1e-9):
+    '''
+    Finds a pure strategy equilibrium of a zero-sum matrix game
+
+    Args:
+        payoffs: (num_rows, num_columns) array of payoffs to the row player, who maximizes
+        tolerance: tolerance when comparing the maximin and minimax values
+
+    Returns:
+        row, column: indices of the equilibrium actions, or None if the game has no pure equilibrium
+    '''
+    row_mins = payoffs.min(axis=1)
+    column_maxs = payoffs.max(axis=0)
+    row = int(np.argmax(row_mins))
+    column = int(np.argmin(column_maxs))
+    if column_maxs[column] - row_mins[row] <= tolerance:
+        return row, column
+    return None
+
+def solve_matrix_game(payoffs, tolerance=1e-9):
+    '''
+    Solves a zero-sum matrix game exactly
+
+    Games with a saddle point are solved directly. Otherwise the payoffs are shifted to be at least 1 and
+    the column player's linear program, maximize sum(y) subject to payoffs @ y <= 1 and y >= 0, is solved
+    with the simplex method. The origin is feasible, so no first phase is needed, and Bland's rule
+    prevents cycling. The row player's strategy is read from the dual values of the constraints.
+
+    Args:
+        payoffs: (num_rows, num_columns) array of payoffs to the row player, who maximizes
+        tolerance: tolerance used for pivoting and for detecting saddle points
+
+    Returns:
+        value: value of the game to the row player
+        row_strategy: (num_rows,) array of equilibrium probabilities of the row player
+        column_strategy: (num_columns,) array of equilibrium probabilities of the column player
+    '''
+    payoffs = np.asarray(payoffs, dtype=float)
+    num_rows, num_columns = payoffs.shape
+    row_strategy = np.zeros(num_rows)
+    column_strategy = np.zeros(num_columns)
+
+    saddle_point = find_saddle_point(payoffs, tolerance)
+    if saddle_point is not None:
+        row, column = saddle_point
+        row_strategy[row] = 1.0
+        column_strategy[column] = 1.0
+        return payoffs[row, column], row_strategy, column_strategy
+
+    # tableau with the constraints in the first rows and the negated objective in the last row
+    shift = 1.0 - payoffs.min()
+    tableau = np.zeros((num_rows + 1, num_columns + num_rows + 1))
+    tableau[:num_rows, :num_columns] = payoffs + shift
+    tableau[:num_rows, num_columns:-1] = np.eye(num_rows)
+    tableau[:num_rows, -1] = 1.0
+    tableau[-1, :num_columns] = -1.0
+    basis = list(range(num_columns, num_columns + num_rows)) # slack variables start in the basis
+
+    while True:
+        # entering variable is the first one that improves the objective
+        candidates = np.flatnonzero(tableau[-1, :-1] < -tolerance)
+        if len(candidates) == 0:
+            break
+        column = candidates[0]
+
+        # leaving variable has the smallest ratio, ties are broken by the smallest basis variable
+        entries = tableau[:num_rows, column]
+        ratios = np.full(num_rows, np.inf)
+        positive = entries > tolerance
+        ratios[positive] = tableau[:num_rows, -1][positive] / entries[positive]
+        ties = np.flatnonzero(ratios <= ratios.min() + tolerance)
+        row = min(ties, key=lambda tie: basis[tie])
+
+        # pivot
+        pivot_row = tableau[row] / tableau[row, column]
+        tableau -= np.outer(tableau[:, column], pivot_row)
+        tableau[row] = pivot_row
+        basis[row] = column
+
+    for row, variable in enumerate(basis):
+        if variable < num_columns:
+            column_strategy[variable] = tableau[row, -1]
+    row_strategy = np.maximum(tableau[-1, num_columns:-1], 0.0)
+
+    value = 1.0 / tableau[-1, -1] - shift
+    return value, row_strategy / row_strategy.sum(), column_strategy / column_strategy.sum()
+
+def get_exploitability(payoffs, row_strategy, column_strategy):
+    '''
+    Returns how much the players can gain in total by deviating from the strategies, which is 0 at an equilibrium
+
+    Args:
+        payoffs: (num_rows, num_columns) array of payoffs to the row player, who maximizes
+        row_strategy: (num_rows,) array of probabilities of the row player
+        column_strategy: (num_columns,) array of probabilities of the column player
+
+    Returns:
+        exploitability: best response value against column_strategy minus best response value against row_strategy
+    '''
+    payoffs = np.asarray(payoffs, dtype=float)
+    return np.max(payoffs @ column_strategy) - np.min(row_strategy @ payoffs)
+
+
+if __name__ == "__main__":
+    # rock paper scissors has value 0 and uniform strategies
+    print(solve_matrix_game([[0, -1, 1], [1, 0, -1], [-1, 1, 0]]))
+
+    # random games should have no exploitability
+    rng = np.random.RandomState(0)
+    for size in (2, 5, 13):
+        payoffs = rng.randint(-10, 10, size=(size, size))
+        value, row_strategy, column_strategy = solve_matrix_game(payoffs)
+        print(size, value, get_exploitability(payoffs, row_strategy, column_strategy))
@@ -0,0 +1,150 @@
+import os
+import time
+import random
+import multiprocessing
+import numpy as np
+from Search.beliefs import ValueGraph
+from Search.headers import State
+from Search.search import Search
+
+# search that the worker processes run. it is set before the pool is forked, so it is inherited by the
+# workers instead of being pickled, which also works for searches with models that cannot be pickled
+_worker_search = None
+
+def _seed_worker(seed):
+    '''
+    Reseeds the random number generators of a worker, which are copies of the parent's after the fork
+
+    Args:
+        seed: np.random.SeedSequence of the task, or None for fresh entropy
+    '''
+    seed = None if seed is None else int(seed.generate_state(1)[0])
+    random.seed(seed)
+    np.random.seed(seed)
+    # value heuristics such as GOPSRandomRolloutValueHeuristic keep their own generator
+    if isinstance(getattr(_worker_search.value_heuristic, 'rng', None), np.random.RandomState):
+        _worker_search.value_heuristic.rng = np.random.RandomState(seed)
+
+def _expand_child(task):
+    '''
+    Searches one child of the root in a fresh graph
+
+    Args:
+        task: (child state, depth, keyword arguments of expand, seed sequence of the task)
+
+    Returns:
+        child: child state
+        value: value of the child
+        action_to_value: action values of the child's node
+        num_nodes: number of nodes in the worker's graph
+    '''
+    child, depth, kwargs, seed = task
+    # seeding per task rather than per process makes the results independent of the number of workers and
+    # of which worker gets which child
+    _seed_worker(seed)
+    graph = ValueGraph()
+    value = _worker_search.expand(graph, child, depth=depth, use_transposition=True, **kwargs)
+    node = graph.get_node(child)
+    return child, value, dict(node.action_to_value) if hasattr(node, 'action_to_value') else dict(), len(graph.id_to_node)
+
+class ParallelRootSearch:
+    '''
+    Splits the children of the root across a pool of worker processes
+
+    Each worker searches some of the root's children to depth-1 in its own graph. The values of the children
+    are stored in the caller's graph.transposition_table together with their action values, then the root is
+    expanded in the caller's process, where the children are found in the transposition table. The root's
+    values are therefore combined by the search's own expand, with any of its options (eg. oracle for SMMinimax).
+
+    Works with searches whose expand takes use_transposition (ValueBFS and SMMinimax). Worker processes are
+    forked, so the search and its models are not pickled, but the states are
+    '''
+
+    def __init__(self, search: Search, num_workers=None, seed=None):
+        '''
+        Args:
+            search: search to run in the workers and at the root
+            num_workers: number of worker processes, defaults to the number of CPUs. With 1, the children are searched
+                in the caller's process
+            seed: seed for the random number generators of the workers. The search of each child is seeded with
+                its own child of np.random.SeedSequence(seed), so results are reproducible for any num_workers.
+                Workers are reseeded with fresh entropy if None
+        '''
+        self.search = search
+        self.num_workers = num_workers if num_workers is not None else os.cpu_count()
+        self.seed = seed
+        self.last_search_time = 0.0 # seconds taken by the last call to expand
+        self.last_worker_nodes = 0 # number of nodes created by the workers in the last call to expand
+
+    def expand(self, graph: ValueGraph, state: State, depth=3, **kwargs):
+        '''
+        Searches the state to depth, splitting its children across the worker processes
+
+        Args:
+            graph: graph that the results are merged into
+            state: state to search from
+            depth: depth to search to
+            kwargs: other keyword arguments of the search's expand
+
+        Returns:
+            value: value of the state
+        '''
+        global _worker_search
+        start = time.time()
+        kwargs.pop('use_transposition', None) # always used to pass the children's values to the root
+
+        children = self.search.enumerate_next_states(state) if depth > 0 else []
+        if len(children) == 0:
+            self.last_worker_nodes = 0
+            value = self.search.expand(graph, state, depth=depth, **kwargs)
+            self.last_search_time = time.time() - start
+            return value
+
+        # search the children in the workers
+        seeds = np.random.SeedSequence(self.seed).spawn(len(children)) if self.seed is not None else [None] * len(children)
+        tasks = [(child, depth - 1, kwargs, seed) for child, seed in zip(children, seeds)]
+        _worker_search = self.search
+        try:
+            if self.num_workers <= 1:
+                # run the same tasks in this process, as a serial reference for the parallel results
+                results = self._expand_serial(tasks)
+            else:
+                context = multiprocessing.get_context('fork')
+                with context.Pool(min(self.num_workers, len(tasks))) as pool:
+                    results = pool.map(_expand_child, tasks)
+        finally:
+            _worker_search = None
+
+        # merge the children's results into the caller's graph
+        mode = self.search.get_transposition_mode(**kwargs)
+        self.last_worker_nodes = 0
+        for child, value, action_to_value, num_nodes in results:
+            node = graph.get_node(child)
+            if node is None:
+                node = graph.add_state(child)
+            if action_to_value:
+                node.action_to_value.update(action_to_value)
+            node.add_value_estimate(value)
+            graph.transposition_table.store(child, depth - 1, value, mode=mode)
+            self.last_worker_nodes += num_nodes
+
+        # combine the children's values at the root, which should not reuse a stored result of its own
+        graph.transposition_table.remove(state)
+        value = self.search.expand(graph, state, depth=depth, use_transposition=True, **kwargs)
+        self.last_search_time = time.time() - start
+        return value
+
+    def _expand_serial(self, tasks):
+        '''
+        Runs the tasks one after another in the caller's process, restoring the caller's random number generators
+        afterwards since each task reseeds them
+        '''
+        rng = getattr(self.search.value_heuristic, 'rng', None)
+        random_state, np_random_state = random.getstate(), np.random.get_state()
+        try:
+            return [_expand_child(task) for task in tasks]
+        finally:
+            random.setstate(random_state)
+            np.random.set_state(np_random_state)
+            if rng is not None:
+                self.search.value_heuristic.rng = rng
@@ -1,17 +1,19 @@
-from Search.beliefs import ValueGraph
+from Search.beliefs import ValueGraph, MinMaxStats, JointActionSpace
+from Search.trace import SearchTraceRecorder
 from Search.headers import *
 from Search.estimators import *
 from collections import deque
 import warnings
-import itertools
-from datetime import datetime
 import numpy as np
+import time
 
-# TODO: implement MinMaxStats
-# TODO: implement UCT search
 
+class SearchBudgetExceeded(Exception):
+    '''
+    Raised inside a search when its time or node budget runs out
+    '''
+    pass
 
-    
 
 
 class Search:
@@ -33,6 +35,9 @@ class Search:
         self.opponent_action_enumerator = opponent_action_enumerator
         self.opponent_enumerator = opponent_enumerator
         self.utility_estimator = utility_estimator
+        self._leaf_values = dict() # values of the frontier states evaluated in a batch by expand_batched
+        self.trace_recorder = None # SearchTraceRecorder that records the search for rendering afterwards, see Search/trace.py
+        self.last_trace = None # trace recorded by the last search run with render set
         
 
     def expand(self, node_id):
@@ -40,6 +45,175 @@ class Search:
         Expand starting from a node
         '''
         raise NotImplementedError
+
+    def _get_or_create_node(self, graph: ValueGraph, state: State, prev_node = None):
+        '''
+        Returns the node of the state, adding it to the graph if it does not exist, and links it to prev_node
+
+        Args:
+            state: state to get the node of
+            prev_node: parent node that the search came from, or None at the root
+
+        Returns:
+            node: node of the state
+        '''
+        node = graph.get_node(state)
+        if node is None: # node does not exist, create it
+            node = graph.add_state(state)
+        if prev_node is not None:
+            node.parents.add(prev_node)
+            prev_node.children.add(node)
+        if self.trace_recorder is not None:
+            self.trace_recorder.record_node(node.id, None if prev_node is None else prev_node.id)
+        return node
+
+    def _add_value_estimate(self, node, value):
+        '''
+        Adds a value estimate to the node, recording it in the trace recorder if there is one
+        '''
+        node.add_value_estimate(value)
+        if self.trace_recorder is not None:
+            self.trace_recorder.record_value(node.id, value)
+
+    def _expand_traced(self, expand, *args, **kwargs):
+        '''
+        Runs a search with render set, recording it in a fresh trace recorder. Once the search finishes, the
+        recorder is moved to self.last_trace and self.trace_recorder is restored, so later searches do not record
+        '''
+        previous_recorder = self.trace_recorder
+        self.trace_recorder = SearchTraceRecorder()
+        try:
+            return expand(*args, **kwargs)
+        finally:
+            self.last_trace = self.trace_recorder
+            self.trace_recorder = previous_recorder
+
+    def get_transposition_mode(self, **kwargs):
+        '''
+        Returns the mode that a search with the keyword arguments of expand stores its transposition table entries
+        under. Searches only reuse entries stored in their own mode, since values of other modes can differ.
+        Searches with a single mode return None
+        '''
+        return None
+
+    def _is_leaf(self, state: State, depth, prev_node = None):
+        '''
+        Returns whether the search should evaluate a state with the value heuristic instead of searching below it,
+        which is at depth 0 and below the root at states that the value heuristic evaluates exactly
+        '''
+        return depth == 0 or (prev_node is not None and self.value_heuristic.is_exact(state))
+
+    def _evaluate_leaf(self, state: State):
+        '''
+        Returns the value heuristic's value of a state at depth 0, using the batch of expand_batched if it has the state
+        '''
+        if state in self._leaf_values:
+            return self._leaf_values[state]
+        return self.value_heuristic.evaluate(state)
+
+    def collect_frontier(self, graph: ValueGraph, state: State, depth=3, revise=False, use_transposition=False,
+                         mode=None):
+        '''
+        Finds the states that expand would evaluate with the value heuristic when searching state to depth.
+        Interior nodes are added to the graph with _get_or_create_node and their children enumerated with
+        _prepare_node, so that expand reuses the same children instead of calling the enumerators and predictors
+        again. Like expand, revise only applies to the root, which expand then enumerates once more
+
+        Args:
+            state: state to search from
+            depth: depth to search to
+            revise: whether the root is enumerated again and its transposition table entry ignored, like expand would
+            use_transposition: whether subtrees of states found in graph.transposition_table are skipped like expand would
+            mode: transposition mode of the search, see get_transposition_mode
+
+        Returns:
+            frontier: list of distinct non-terminal states at depth 0
+        '''
+        frontier = dict() # used as an ordered set
+        visited = set()
+        stack = [(state, depth, None)]
+        while stack:
+            state, depth, prev_node = stack.pop()
+            if (state, depth) in visited or state.is_done():
+                continue
+            visited.add((state, depth))
+            is_root = prev_node is None
+            if use_transposition and not (revise and is_root):
+                entry = graph.transposition_table.get_entry(state, mode)
+                if entry is not None and entry.depth >= depth:
+                    continue
+            if self._is_leaf(state, depth, prev_node):
+                frontier[state] = None
+                continue
+
+            # enumerate the children into the node, so that expand reuses them instead of enumerating them again
+            node = self._get_or_create_node(graph, state, prev_node)
+            self._prepare_node(node, state, revise and is_root)
+            next_states = getattr(node, 'next_states', None) or set(node.action_to_next_state.values())
+            if not next_states:
+                next_states = self.enumerate_next_states(state)
+            next_depth = depth if node.virtual else depth - 1 # skip virtual nodes
+            for next_state in next_states:
+                stack.append((next_state, next_depth, node))
+        return list(frontier)
+
+    def expand_batched(self, graph: ValueGraph, state: State, depth=3, **kwargs):
+        '''
+        Expands like expand, but first evaluates all frontier states with one call to value_heuristic.evaluate_many,
+        so that heuristics backed by a remote model can evaluate them concurrently. Only the value heuristic is
+        batched: enumerators and predictors are still called once per interior node, by collect_frontier
+
+        Args:
+            state: state to expand from
+            depth: depth to expand to
+            kwargs: other keyword arguments of expand
+
+        Returns:
+            value: updated value of the node
+        '''
+        if kwargs.pop('render', False):
+            # record collect_frontier in the same trace as expand
+            return self._expand_traced(self.expand_batched, graph, state, depth, **kwargs)
+        frontier = self.collect_frontier(graph, state, depth, kwargs.get('revise', False),
+                                         kwargs.get('use_transposition', False), self.get_transposition_mode(**kwargs))
+        self._leaf_values = dict(zip(frontier, self.value_heuristic.evaluate_many(frontier)))
+        try:
+            return self.expand(graph, state, depth=depth, **kwargs)
+        finally:
+            self._leaf_values = dict()
+
+    def _prepare_node(self, node, state: State, revise = False):
+        '''
+        Enumerates the actions and next states of a node the way expand does. Searches that do not override it
+        leave the node as it is, and collect_frontier falls back to enumerate_next_states
+        '''
+        pass
+
+    def enumerate_next_states(self, state: State):
+        '''
+        Enumerates the states that can follow the state, using the same enumerators and transitor as expand
+
+        Args:
+            state: state to enumerate the next states of
+
+        Returns:
+            next_states: list of distinct next states
+        '''
+        if state.is_done():
+            return []
+        if state.state_type == 'control':
+            joint_actions = self.action_enumerator.enumerate(state)
+        elif state.state_type == 'stochastic':
+            joint_actions = self.random_state_enumerator.enumerate(state)
+        elif state.state_type in ('adversarial', 'simultaneous'):
+            adactions = [self.opponent_action_enumerator.enumerate(state, opponent) for opponent in self.opponent_enumerator.enumerate(state)]
+            if state.state_type == 'simultaneous':
+                adactions.insert(0, self.action_enumerator.enumerate(state))
+            joint_actions = JointActionSpace(*adactions)
+        else:
+            raise NotImplementedError
+        # keep the first occurrence of each next state in order
+        return list(dict.fromkeys(self.forward_transistor.transition(state, joint_action) for joint_action in joint_actions))
     
 class ValueBFS(Search):
     '''
@@ -52,61 +226,59 @@ class ValueBFS(Search):
                  utility_estimator: UtilityEstimator):
         super().__init__(forward_transistor, value_heuristic, action_enumerator, 
                          random_state_enumerator, random_state_predictor,
-                         opponent_action_enumerator, opponent_action_predictor, 
-                         utility_estimator, opponent_enumerator = OpponentEnumerator())
+                         opponent_action_enumerator, utility_estimator,
+                         opponent_enumerator = OpponentEnumerator())
         self.opponent_action_predictor = opponent_action_predictor
 
-    def expand(self, graph: ValueGraph, state: State, prev_node = None, depth=3, render = False, revise = False):
+    def expand(self, graph: ValueGraph, state: State, prev_node = None, depth=3, render = False, revise = False, use_transposition = False):
         '''
         Expand starting from a node
         
         Args:
             state: state to expand from
             depth: depth to expand to
+            render: whether to record the search in a new trace recorder, which is kept in self.last_trace to render it afterwards
             revise: whether to revise the graph or not
+            use_transposition: whether to reuse and store results in graph.transposition_table
 
         Returns:
             value: updated value of the node
         '''
 
-        node = graph.get_node(state)
-        if node is None: # node does not exist, create it
-            node = graph.add_state(state)   
-        if prev_node is not None:
-            node.parents.add(prev_node)
-            prev_node.children.add(node)
+        if render:
+            return self._expand_traced(self.expand, graph, state, prev_node, depth, revise=revise, use_transposition=use_transposition)
+        node = self._get_or_create_node(graph, state, prev_node)
 
         # check if node is terminal
         if state.is_done():
             value = state.get_reward()
-            node.values_estimates.append(value)
+            self._add_value_estimate(node, value)
             return value
 
-        if depth == 0:
-            value = self.value_heuristic.evaluate(state)
-            node.values_estimates.append(value)
+        # reuse the result of a previous search that went at least as deep
+        if use_transposition and not revise:
+            entry = graph.transposition_table.lookup(state, depth)
+            if entry is not None:
+                return entry.value
+
+        if self._is_leaf(state, depth, prev_node):
+            value = self._evaluate_leaf(state)
+            self._add_value_estimate(node, value)
             utility = self.utility_estimator.estimate(node)
+            if use_transposition:
+                graph.transposition_table.store(state, depth, utility)
             return utility
         else:
             value = 0.0
             next_state_to_values = dict()
             next_depth = depth if node.virtual else depth -1 # skip virtual nodes
             
-            if state.state_type == 'control':
-                # enumerate actions
-                if node.actions is None or revise:
-                    node.actions = self.action_enumerator.enumerate(state)
-
-                # find next states
-                if not node.next_states or revise:
-                    for action in node.actions:
-                        next_state = self.forward_transistor.transition(state, action)
-                        node.next_states.add(next_state)
-                        node.action_to_next_state[action] = next_state
+            self._prepare_node(node, state, revise)
 
+            if state.state_type == 'control':
                 # expand next states
                 for next_state in node.next_states:
-                    next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth)
+                    next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth, use_transposition=use_transposition)
 
                 # add action to value
                 for action in node.actions:
@@ -117,60 +289,18 @@ class ValueBFS(Search):
                 value = max(node.action_to_value.values())
 
             elif state.state_type == 'adversarial':
-                # enumerate opponents
-                if node.opponents is None or revise:
-                    node.opponents = self.opponent_enumerator.enumerate(state)
-
-                # enumerate actions
-                if not node.adactions or revise:
-                    for opponent in node.opponents:
-                        node.adactions[opponent] = self.opponent_action_enumerator.enumerate(state, opponent)
-
-                # predict probabilities over actions
-                if not node.opponent_to_probs_over_actions or revise:
-                    for opponent in node.opponents:
-                        node.opponent_to_probs_over_actions[opponent] = self.opponent_action_predictor.predict(state, node.adactions[opponent], opponent)
-
-                # enumerate joint adversarial actions
-                if node.joint_adversarial_actions is None or revise:
-                    node.joint_adversarial_actions = list(itertools.product(*node.adactions.values()))
-
-                # find joint adversarial actions to probabilities over actions
-                if not node.joint_adversarial_actions_to_probs or revise:
-                    for joint_adversarial_action in node.joint_adversarial_actions:
-                        node.joint_adversarial_actions_to_probs[joint_adversarial_action] = 1.0
-                        for i, opponent in enumerate(node.opponents):
-                            action = joint_adversarial_action[i]
-                            prob = node.opponent_to_probs_over_actions[opponent][action]
-                            node.joint_adversarial_actions_to_probs[joint_adversarial_action] *= prob
-                        
-                # find next states
-                if not node.next_states or revise:
-                    for joint_adversarial_action in node.joint_adversarial_actions:
-                        next_state = self.forward_transistor.transition(state, joint_adversarial_action)
-                        node.next_states.add(next_state)
-                        node.joint_adversarial_actions_to_next_states[joint_adversarial_action] = next_state
-
                 # expand next states
                 for next_state in node.next_states:
-                    next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth)
+                    next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth, use_transposition=use_transposition)
 
-                # add expected value over actions
-                for joint_adversarial_action in node.joint_adversarial_actions:
-                    prob = node.joint_adversarial_actions_to_probs[joint_adversarial_action]
-                    next_state = node.joint_adversarial_actions_to_next_states[joint_adversarial_action]
-                    value += prob*next_state_to_values[next_state]
+                # add expected value over actions, contracting the joint probabilities with the values of the joint actions
+                values = node.joint_adversarial_actions.get_value_tensor(
+                    lambda joint_adversarial_action: next_state_to_values[node.joint_adversarial_actions_to_next_states[joint_adversarial_action]])
+                value = float(np.tensordot(node.joint_adversarial_probs, values, axes=values.ndim))
 
             elif state.state_type == 'stochastic': # random
-                if node.actions is None or revise:
-                    node.actions = self.random_state_enumerator.enumerate(state)
-                if not node.action_to_next_state or revise: # Dictionary is empty
-                    for action in node.actions:
-                        node.action_to_next_state[action] = self.forward_transistor.transition(state, action)
-                if not node.probs_over_actions or revise: # Dictionary is empty
-                    node.probs_over_actions = self.random_state_predictor.predict(state, node.actions)
                 for next_state in set(node.action_to_next_state.values()):
-                    next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth)
+                    next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth, use_transposition=use_transposition)
 
                 # add expected value over actions 
                 for action in node.actions:
@@ -179,82 +309,129 @@ class ValueBFS(Search):
                     value += prob*next_state_to_values[next_state]
 
             elif state.state_type == 'simultaneous':
-                
-                # enumerate opponents
-                if node.opponents is None or revise:
-                    node.opponents = self.opponent_enumerator.enumerate(state)
-                    
-                # enumerate adactions
-                if not node.adactions or revise:
-                    for opponent in node.opponents:
-                        node.adactions[opponent] = self.opponent_action_enumerator.enumerate(state, opponent)
-
-                # predict probabilities over actions
-                if not node.opponent_to_probs_over_actions or revise:
-                    for opponent in node.opponents:
-                        node.opponent_to_probs_over_actions[opponent] = self.opponent_action_predictor.predict(state, node.adactions[opponent], player=opponent, prob=True)
-                
-                # enumerate joint adversarial actions. make sure they are tuples
-                if node.joint_adversarial_actions is None or revise:
-                    node.joint_adversarial_actions = itertools.product(*node.adactions.values())
-
-                # find joint adversarial actions to probabilities over actions
-                if not node.joint_adversarial_actions_to_probs or revise:
-                    for joint_adversarial_action in node.joint_adversarial_actions:
-                        node.joint_adversarial_actions_to_probs[joint_adversarial_action] = 1.0
-                        for i, opponent in enumerate(node.opponents):
-                            action = joint_adversarial_action[i]
-                            prob = node.opponent_to_probs_over_actions[opponent][action]
-                            node.joint_adversarial_actions_to_probs[joint_adversarial_action] *= prob
-
-                # enumerate proagonist actions
-                if node.proactions is None or revise:
-                    node.proactions = self.action_enumerator.enumerate(state)
-                        
-                # enumerate all possible joint actions. first dimension always protagonist. dimensions after that are opponents
-                if node.joint_actions is None or revise:
-                    node.joint_actions = itertools.product(node.proactions, *node.adactions.values())
-
-                # find next states
-                # TODO: some weird bug here where node.next_states is not empty but node.joint_actions_to_next_states is empty
-                # UPDATE: fixed. dicts are mutable so when I was adding to node.joint_actions_to_next_states, I was adding to the same dict
-                if not node.next_states or revise:
-                    for joint_action in node.joint_actions:
-                        next_state = self.forward_transistor.transition(state, joint_action)
-                        node.next_states.add(next_state)
-                        node.joint_actions_to_next_states[joint_action] = next_state
-
                 # expand next states
                 for next_state in node.next_states:
-                    next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth)
+                    next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth, use_transposition=use_transposition)
 
-                # reset action_to_value to 0
-                node.action_to_value = dict()
-                for action in node.proactions:
-                    node.action_to_value[action] = 0.0
-
-                # add expected value over actions
-                for joint_action in node.joint_actions:
-                    prob = node.joint_adversarial_actions_to_probs[joint_action[1:]]
-                    next_state = node.joint_actions_to_next_states[joint_action]
-                    node.action_to_value[joint_action[0]] += prob*next_state_to_values[next_state]
+                # expected value of each protagonist action, contracting the values of the joint actions with the joint probabilities of the opponents
+                values = node.joint_actions.get_value_tensor(
+                    lambda joint_action: next_state_to_values[node.joint_actions_to_next_states[joint_action]])
+                proaction_values = np.tensordot(values, node.joint_adversarial_probs, axes=node.joint_adversarial_probs.ndim)
+                node.action_to_value = dict(zip(node.joint_actions.action_lists[0], proaction_values.tolist()))
 
                 # value should be max of actions
                 value = max(node.action_to_value.values())
                 
 
-            if render and not node.virtual:
-                plt = graph.to_mathplotlib()
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                filename = f'Search/output/output_graph_{timestamp}.png'
-                plt.savefig(filename)
-                plt.close()
-                # plt.show()
-            
-            node.values_estimates.append(value)
+            self._add_value_estimate(node, value)
             utility = self.utility_estimator.estimate(node)
+
+            if use_transposition:
+                best_action = None
+                if state.state_type in ('control', 'simultaneous'):
+                    best_action = max(node.action_to_value, key=node.action_to_value.get)
+                graph.transposition_table.store(state, depth, utility, best_action)
             return utility
 
+    def _prepare_node(self, node, state: State, revise = False):
+        '''
+        Enumerates the actions and next states of a node and predicts the probabilities over them, unless the node
+        already has them (eg. from collect_frontier) and revise is not set
+        '''
+        if state.state_type == 'control':
+            # enumerate actions
+            if node.actions is None or revise:
+                node.actions = self.action_enumerator.enumerate(state)
+
+            # find next states
+            if not node.next_states or revise:
+                for action in node.actions:
+                    next_state = self.forward_transistor.transition(state, action)
+                    node.next_states.add(next_state)
+                    node.action_to_next_state[action] = next_state
+
+        elif state.state_type == 'adversarial':
+            # enumerate opponents
+            if node.opponents is None or revise:
+                node.opponents = self.opponent_enumerator.enumerate(state)
+
+            # enumerate actions
+            if not node.adactions or revise:
+                for opponent in node.opponents:
+                    node.adactions[opponent] = self.opponent_action_enumerator.enumerate(state, opponent)
+
+            # predict probabilities over actions
+            if not node.opponent_to_probs_over_actions or revise:
+                for opponent in node.opponents:
+                    node.opponent_to_probs_over_actions[opponent] = self.opponent_action_predictor.predict(state, node.adactions[opponent], opponent)
+
+            # enumerate joint adversarial actions
+            if node.joint_adversarial_actions is None or revise:
+                node.joint_adversarial_actions = JointActionSpace(*node.adactions.values())
+
+            # find joint adversarial actions to probabilities over actions
+            if node.joint_adversarial_probs is None or revise:
+                node.joint_adversarial_probs = node.joint_adversarial_actions.get_prob_tensor(
+                    [node.opponent_to_probs_over_actions[opponent] for opponent in node.opponents])
+                    
+            # find next states
+            if not node.next_states or revise:
+                for joint_adversarial_action in node.joint_adversarial_actions:
+                    next_state = self.forward_transistor.transition(state, joint_adversarial_action)
+                    node.next_states.add(next_state)
+                    node.joint_adversarial_actions_to_next_states[joint_adversarial_action] = next_state
+
+        elif state.state_type == 'stochastic': # random
+            if node.actions is None or revise:
+                node.actions = self.random_state_enumerator.enumerate(state)
+            if not node.action_to_next_state or revise: # Dictionary is empty
+                for action in node.actions:
+                    node.action_to_next_state[action] = self.forward_transistor.transition(state, action)
+            if not node.probs_over_actions or revise: # Dictionary is empty
+                node.probs_over_actions = self.random_state_predictor.predict(state, node.actions)
+
+        elif state.state_type == 'simultaneous':
+            
+            # enumerate opponents
+            if node.opponents is None or revise:
+                node.opponents = self.opponent_enumerator.enumerate(state)
+                
+            # enumerate adactions
+            if not node.adactions or revise:
+                for opponent in node.opponents:
+                    node.adactions[opponent] = self.opponent_action_enumerator.enumerate(state, opponent)
+
+            # predict probabilities over actions
+            if not node.opponent_to_probs_over_actions or revise:
+                for opponent in node.opponents:
+                    node.opponent_to_probs_over_actions[opponent] = self.opponent_action_predictor.predict(state, node.adactions[opponent], player=opponent, prob=True)
+            
+            # enumerate joint adversarial actions. make sure they are tuples
+            if node.joint_adversarial_actions is None or revise:
+                node.joint_adversarial_actions = JointActionSpace(*node.adactions.values())
+
+            # find joint adversarial actions to probabilities over actions
+            if node.joint_adversarial_probs is None or revise:
+                node.joint_adversarial_probs = node.joint_adversarial_actions.get_prob_tensor(
+                    [node.opponent_to_probs_over_actions[opponent] for opponent in node.opponents])
+
+            # enumerate proagonist actions
+            if node.proactions is None or revise:
+                node.proactions = self.action_enumerator.enumerate(state)
+                    
+            # enumerate all possible joint actions. first dimension always protagonist. dimensions after that are opponents
+            if node.joint_actions is None or revise:
+                node.joint_actions = JointActionSpace(node.proactions, *node.adactions.values())
+
+            # find next states
+            # TODO: some weird bug here where node.next_states is not empty but node.joint_actions_to_next_states is empty
+            # UPDATE: fixed. dicts are mutable so when I was adding to node.joint_actions_to_next_states, I was adding to the same dict
+            if not node.next_states or revise:
+                for joint_action in node.joint_actions:
+                    next_state = self.forward_transistor.transition(state, joint_action)
+                    node.next_states.add(next_state)
+                    node.joint_actions_to_next_states[joint_action] = next_state
+
 class SMMinimax(Search):
     '''
     Used to perform breadth-first search
@@ -264,50 +441,219 @@ class SMMinimax(Search):
     def __init__(self, forward_transistor: ForwardTransitor,
                  value_heuristic: ValueHeuristic, action_enumerator: ActionEnumerator, 
                  random_state_enumerator: RandomStateEnumerator, random_state_predictor: RandomStatePredictor,
-                 opponent_action_enumerator: OpponentActionEnumerator, utility_estimator: UtilityEstimator):
+                 opponent_action_enumerator: OpponentActionEnumerator, utility_estimator: UtilityEstimator,
+                 prune = False):
+        '''
+        Args:
+            prune: whether to skip opponent replies that cannot change the value of simultaneous nodes
+        '''
         super().__init__(forward_transistor, value_heuristic, action_enumerator, 
                          random_state_enumerator, random_state_predictor,
                          opponent_action_enumerator, utility_estimator, opponent_enumerator = OpponentEnumerator())
+        self.prune = prune
+        self.nodes_expanded = 0 # number of nodes visited by the last search
+        self._deadline = None # time after which the current search should stop
+        self._node_limit = None # number of nodes after which the current search should stop
+
+    def get_transposition_mode(self, oracle = True, **kwargs):
+        '''
+        Returns oracle, since oracle and Nash values of the same state differ
+        '''
+        return oracle
+
+    def _estimate_state(self, graph: ValueGraph, state: State, default):
+        '''
+        Returns the current utility estimate of a state in the graph, or default if it has not been evaluated
+        '''
+        node = graph.get_node(state)
+        if node is None or node.get_visits() == 0:
+            return default
+        return self.utility_estimator.estimate(node)
+
+    def _expand_simultaneous_pruned(self, graph: ValueGraph, node, next_depth, oracle, use_transposition):
+        '''
+        Computes max over protagonist actions of the opponent's best response, skipping the remaining
+        opponent replies to a protagonist action once its running minimum falls below the best value so far.
+        Values of skipped protagonist actions in node.action_to_value are upper bounds that are below the best value.
+
+        Protagonist actions are tried in order of their previous values and opponent replies in order of
+        the previous values of their next states, with the best response to the previous protagonist action first.
+
+        Returns:
+            value: value of the node
+        '''
+        next_state_to_values = dict()
+        proactions = sorted(node.proactions, key=lambda action: node.action_to_value.get(action, -np.inf), reverse=True)
+
+        best_value = -np.inf
+        killer_action = None # best response to the previous protagonist action
+        for proaction in proactions:
+            adactions = sorted(node.adactions, key=lambda adaction: self._estimate_state(
+                graph, node.joint_actions_to_next_states[(proaction, adaction)], 0.0))
+            if killer_action in node.adactions:
+                adactions.remove(killer_action)
+                adactions.insert(0, killer_action)
+
+            running_min = np.inf
+            best_response = None
+            for adaction in adactions:
+                next_state = node.joint_actions_to_next_states[(proaction, adaction)]
+                if next_state not in next_state_to_values:
+                    next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth, oracle=oracle, use_transposition=use_transposition)
+                value = next_state_to_values[next_state]
+                if value < running_min:
+                    running_min = value
+                    best_response = adaction
+                # the opponent can already hold this action below the best value
+                if running_min < best_value:
+                    break
+
+            node.action_to_value[proaction] = running_min
+            best_value = max(best_value, running_min)
+            killer_action = best_response
+
+        return best_value
+
+    def _expand_simultaneous_nash(self, graph: ValueGraph, node, next_depth, use_transposition):
+        '''
+        Expands all joint actions and solves the payoff matrix of the node as a zero-sum matrix game,
+        see ValueGraph.set_nash_equilibrium. Pruning does not apply since every payoff is needed
+
+        Returns:
+            value: value of the node
+        '''
+        next_state_to_values = dict()
+        for next_state in node.next_states:
+            next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth, oracle=False, use_transposition=use_transposition)
+
+        proactions = list(node.proactions)
+        adactions = list(node.adactions)
+        payoffs = np.array([[next_state_to_values[node.joint_actions_to_next_states[(proaction, adaction)]]
+                             for adaction in adactions] for proaction in proactions])
+        return graph.set_nash_equilibrium(node, proactions, adactions, payoffs)
+
+    def _check_budget(self):
+        '''
+        Raises SearchBudgetExceeded if the current search ran out of time or nodes
+        '''
+        if self._node_limit is not None and self.nodes_expanded > self._node_limit:
+            raise SearchBudgetExceeded
+        if self._deadline is not None and time.time() > self._deadline:
+            raise SearchBudgetExceeded
+
+    def iterative_deepening(self, graph: ValueGraph, state: State, max_depth=10, time_limit=None, node_limit=None, oracle = True):
+        '''
+        Searches state to depth 1, 2, ... max_depth until the time or node budget runs out.
+        Results are stored in graph.transposition_table, so each iteration (and later calls) only
+        re-searches states that were not already searched deep enough.
 
-    def expand(self, graph: ValueGraph, state: State, prev_node = None, depth=3, render = False, revise = False, oracle = True):
+        If state was already searched (eg. in the previous move's search, kept with graph.reroot), the search
+        continues one ply deeper than the stored result. Otherwise the first iteration always runs to completion
+        so that there is a move to return.
+
+        Args:
+            state: state to search from
+            max_depth: maximum depth to search to
+            time_limit: maximum time to search for in seconds, or None for no limit
+            node_limit: maximum number of nodes to visit, or None for no limit
+            oracle: whether the opponent always plays the best response as if they knew the protagonist's action, otherwise simultaneous nodes are solved for Nash equilibria
+
+        Returns:
+            best_action: best action at the deepest completed depth
+            value: value of state at the deepest completed depth
+            depth: deepest completed depth
+        '''
+        deadline = None if time_limit is None else time.time() + time_limit
+        best_action = None
+        value = None
+        completed_depth = 0
+        action_to_value = dict()
+        total_nodes = 0
+
+        # continue from a previous search of the state
+        entry = graph.transposition_table.get_entry(state, oracle)
+        node = graph.get_node(state)
+        if entry is not None and entry.best_action is not None and node is not None and node.action_to_value:
+            completed_depth = min(entry.depth, max_depth)
+            best_action = entry.best_action
+            value = entry.value
+            action_to_value = dict(node.action_to_value)
+
+        try:
+            for depth in range(completed_depth + 1, max_depth + 1):
+                # the first iteration is not interrupted unless there is already a move to return
+                if depth > 1 or best_action is not None:
+                    self._deadline = deadline
+                    self._node_limit = None if node_limit is None else node_limit - total_nodes
+                try:
+                    value = self.expand(graph, state, depth=depth, oracle=oracle, use_transposition=True)
+                finally:
+                    total_nodes += self.nodes_expanded
+                node = graph.get_node(state)
+                action_to_value = dict(node.action_to_value)
+                best_action = graph.get_best_action(state)
+                completed_depth = depth
+                if state.is_done():
+                    break
+        except SearchBudgetExceeded:
+            # discard root values from the unfinished iteration
+            graph.get_node(state).action_to_value = action_to_value
+        finally:
+            self._deadline = None
+            self._node_limit = None
+            self.nodes_expanded = total_nodes
+
+        return best_action, value, completed_depth
+
+    def expand(self, graph: ValueGraph, state: State, prev_node = None, depth=3, render = False, revise = False, oracle = True, use_transposition = False):
         '''
         Expand starting from a node
         
         Args:
             state: state to expand from
             depth: depth to expand to
-            render: whether to render the graph or not
+            render: whether to record the search in a new trace recorder, which is kept in self.last_trace to render it afterwards
             revise: whether to revise the graph or not
-            oracle: whether the opponent always plays the best response or not as if they knew the protagonist's policy
+            oracle: whether the opponent always plays the best response as if they knew the protagonist's action,
+                otherwise simultaneous nodes are solved for Nash equilibrium mixed strategies
+            use_transposition: whether to reuse and store results in graph.transposition_table
 
         Returns:
             value: updated value of the node
         '''
 
-        if not oracle:
-            raise NotImplementedError
+        if render:
+            return self._expand_traced(self.expand, graph, state, prev_node, depth, revise=revise, oracle=oracle,
+                                       use_transposition=use_transposition)
+        if prev_node is None:
+            self.nodes_expanded = 0
+        self.nodes_expanded += 1
+        self._check_budget()
         
         # print('Now exploring state', state)
 
-        node = graph.get_node(state)
-        if node is None: # node does not exist, create it
-            node = graph.add_state(state)   
-        if prev_node is not None:
-            node.parents.add(prev_node)
-            prev_node.children.add(node)
+        node = self._get_or_create_node(graph, state, prev_node)
 
         # check if node is terminal
         if state.is_done():
             value = state.get_reward()
-            node.values_estimates.append(value)
+            self._add_value_estimate(node, value)
             utility = self.utility_estimator.estimate(node)
             # print('Terminal state', state, 'value', utility)
             return utility
 
-        if depth == 0:
-            value = self.value_heuristic.evaluate(state)
-            node.values_estimates.append(value)
+        # reuse the result of a previous search that went at least as deep
+        if use_transposition and not revise:
+            entry = graph.transposition_table.lookup(state, depth, oracle)
+            if entry is not None:
+                return entry.value
+
+        if self._is_leaf(state, depth, prev_node):
+            value = self._evaluate_leaf(state)
+            self._add_value_estimate(node, value)
             utility = self.utility_estimator.estimate(node)
+            if use_transposition:
+                graph.transposition_table.store(state, depth, utility, mode=oracle)
             # print('Depth 0 state', state, 'value', utility)
             return utility
         else:
@@ -315,21 +661,12 @@ class SMMinimax(Search):
             next_state_to_values = dict()
             next_depth = depth if node.virtual else depth -1 # skip virtual nodes
             
-            if state.state_type == 'control':
-                # enumerate actions
-                if node.actions is None or revise:
-                    node.actions = self.action_enumerator.enumerate(state)
-
-                # find next states
-                if not node.next_states or revise:
-                    for action in node.actions:
-                        next_state = self.forward_transistor.transition(state, action)
-                        node.next_states.add(next_state)
-                        node.action_to_next_state[action] = next_state
+            self._prepare_node(node, state, revise)
 
+            if state.state_type == 'control':
                 # expand next states
                 for next_state in node.next_states:
-                    next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth)
+                    next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth, oracle=oracle, use_transposition=use_transposition)
 
                 # add action to value
                 for action in node.actions:
@@ -342,20 +679,9 @@ class SMMinimax(Search):
 
 
             elif state.state_type == 'adversarial':
-                # enumerate actions
-                if not node.adactions or revise:
-                    node.adactions = self.opponent_action_enumerator.enumerate(state)
-
-                # find next states
-                if not node.next_states or revise:
-                    for action in node.adactions:
-                        next_state = self.forward_transistor.transition(state, action)
-                        node.next_states.add(next_state)
-                        node.action_to_next_state[action] = next_state
-
                 # expand next states
                 for next_state in node.next_states:
-                    next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth)
+                    next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth, oracle=oracle, use_transposition=use_transposition)
 
                 # add action to value
                 for action in node.adactions:
@@ -366,15 +692,8 @@ class SMMinimax(Search):
                 value = min(node.action_to_value.values())
 
             elif state.state_type == 'stochastic': # random
-                if node.actions is None or revise:
-                    node.actions = self.random_state_enumerator.enumerate(state)
-                if not node.action_to_next_state or revise: # Dictionary is empty
-                    for action in node.actions:
-                        node.action_to_next_state[action] = self.forward_transistor.transition(state, action)
-                if not node.probs_over_actions or revise: # Dictionary is empty
-                    node.probs_over_actions = self.random_state_predictor.predict(state, node.actions)
                 for next_state in set(node.action_to_next_state.values()):
-                    next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth)
+                    next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth, oracle=oracle, use_transposition=use_transposition)
 
                 # add expected value over actions 
                 for action in node.actions:
@@ -385,77 +704,307 @@ class SMMinimax(Search):
                 # print('Random state', state, 'value', value)
 
             elif state.state_type == 'simultaneous':
-                    
-                # enumerate adactions
-                if not node.adactions or revise:
-                    node.adactions = self.opponent_action_enumerator.enumerate(state)
+                if not oracle:
+                    value = self._expand_simultaneous_nash(graph, node, next_depth, use_transposition)
+                elif self.prune:
+                    value = self._expand_simultaneous_pruned(graph, node, next_depth, oracle, use_transposition)
+                else:
+                    # expand next states
+                    for next_state in node.next_states:
+                        next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth, oracle=oracle, use_transposition=use_transposition)
 
-                # print('adactions', node.adactions)
+                    # print('next state to values', next_state_to_values)
 
-                # enumerate proagonist actions
-                if node.proactions is None or revise:
-                    node.proactions = self.action_enumerator.enumerate(state)
+                    # for each protagonist action, find the best response of the opponent
+                    opponent_best_responses = dict() # mapping from protagonist action to tuple of (opponent action, value)
 
-                # print('proactions', node.proactions)
-                        
-                # enumerate all possible joint actions. first dimension is protagonist. second dimension is opponent
-                if node.joint_actions is None or revise:
-                    node.joint_actions = list(itertools.product(node.proactions, node.adactions))
+                    # set br values to infinity
+                    for proaction in node.proactions:
+                        opponent_best_responses[proaction] = (None, float('inf'))
 
-                # print('joint actions', list(node.joint_actions))
-                
-                # print('next states', node.next_states)
-                # find next states
-                if not node.next_states or revise:
-                    # print('next states not found')
+                    # find best response for each protagonist action
                     for joint_action in node.joint_actions:
-                        next_state = self.forward_transistor.transition(state, joint_action)
-                        node.next_states.add(next_state)
-                        node.joint_actions_to_next_states[joint_action] = next_state
-                        # print('joint action', joint_action, 'next state', next_state)
+                        proaction = joint_action[0]
+                        value = next_state_to_values[node.joint_actions_to_next_states[joint_action]]
+                        # print('joint action', joint_action, 'value', value)
+                        if value < opponent_best_responses[proaction][1]:
+                            opponent_best_responses[proaction] = (joint_action[1], value)
 
-                # print('next states', node.next_states)
+                    # print('opponent best responses', opponent_best_responses)
 
-                # expand next states
-                for next_state in node.next_states:
-                    next_state_to_values[next_state] = self.expand(graph, next_state, node, next_depth)
+                    # set action to value to be opponent best response
+                    for proaction in node.proactions:
+                        node.action_to_value[proaction] = opponent_best_responses[proaction][1]
+
+                    # value should be max of actions
+                    value = max(node.action_to_value.values())
+
+                # print('Simultaneous state', state, 'value', value)
+                
+            self._add_value_estimate(node, value)
+            utility = self.utility_estimator.estimate(node)
+
+            if use_transposition:
+                best_action = None
+                if state.state_type in ('control', 'simultaneous'):
+                    best_action = max(node.action_to_value, key=node.action_to_value.get)
+                elif state.state_type == 'adversarial':
+                    best_action = min(node.action_to_value, key=node.action_to_value.get)
+                graph.transposition_table.store(state, depth, utility, best_action, oracle)
+            return utility
 
-                # print('next state to values', next_state_to_values)
+    def _prepare_node(self, node, state: State, revise = False):
+        '''
+        Enumerates the actions and next states of a node, unless the node already has them
+        (eg. from collect_frontier) and revise is not set
+        '''
+        if state.state_type == 'control':
+            # enumerate actions
+            if node.actions is None or revise:
+                node.actions = self.action_enumerator.enumerate(state)
 
-                # for each protagonist action, find the best response of the opponent
-                opponent_best_responses = dict() # mapping from protagonist action to tuple of (opponent action, value)
+            # find next states
+            if not node.next_states or revise:
+                for action in node.actions:
+                    next_state = self.forward_transistor.transition(state, action)
+                    node.next_states.add(next_state)
+                    node.action_to_next_state[action] = next_state
 
-                # set br values to infinity
-                for proaction in node.proactions:
-                    opponent_best_responses[proaction] = (None, float('inf'))
+        elif state.state_type == 'adversarial':
+            # enumerate actions
+            if not node.adactions or revise:
+                node.adactions = self.opponent_action_enumerator.enumerate(state)
 
-                # find best response for each protagonist action
+            # find next states
+            if not node.next_states or revise:
+                for action in node.adactions:
+                    next_state = self.forward_transistor.transition(state, action)
+                    node.next_states.add(next_state)
+                    node.action_to_next_state[action] = next_state
+
+        elif state.state_type == 'stochastic': # random
+            if node.actions is None or revise:
+                node.actions = self.random_state_enumerator.enumerate(state)
+            if not node.action_to_next_state or revise: # Dictionary is empty
+                for action in node.actions:
+                    node.action_to_next_state[action] = self.forward_transistor.transition(state, action)
+            if not node.probs_over_actions or revise: # Dictionary is empty
+                node.probs_over_actions = self.random_state_predictor.predict(state, node.actions)
+
+        elif state.state_type == 'simultaneous':
+            # enumerate adactions
+            if not node.adactions or revise:
+                node.adactions = self.opponent_action_enumerator.enumerate(state)
+
+            # enumerate proagonist actions
+            if node.proactions is None or revise:
+                node.proactions = self.action_enumerator.enumerate(state)
+                    
+            # enumerate all possible joint actions. first dimension is protagonist. second dimension is opponent
+            if node.joint_actions is None or revise:
+                node.joint_actions = JointActionSpace(node.proactions, node.adactions)
+
+            # find next states
+            if not node.next_states or revise:
                 for joint_action in node.joint_actions:
-                    proaction = joint_action[0]
-                    value = next_state_to_values[node.joint_actions_to_next_states[joint_action]]
-                    # print('joint action', joint_action, 'value', value)
-                    if value < opponent_best_responses[proaction][1]:
-                        opponent_best_responses[proaction] = (joint_action[1], value)
+                    next_state = self.forward_transistor.transition(state, joint_action)
+                    node.next_states.add(next_state)
+                    node.joint_actions_to_next_states[joint_action] = next_state
 
-                # print('opponent best responses', opponent_best_responses)
+class UCTSearch(Search):
+    '''
+    Used to perform Monte Carlo tree search with UCB action selection
 
-                # set action to value to be opponent best response
-                for proaction in node.proactions:
-                    node.action_to_value[proaction] = opponent_best_responses[proaction][1]
+    Simultaneous nodes use decoupled UCT: the protagonist and the opponent each select their action
+    from their own statistics. Values are normalized with graph.min_max_stats before computing UCB. This only works if the opponent is a single agent and the game is a zero-sum game
+    '''
+    def __init__(self, forward_transistor: ForwardTransitor,
+                 value_heuristic: ValueHeuristic, action_enumerator: ActionEnumerator, 
+                 random_state_enumerator: RandomStateEnumerator, random_state_predictor: RandomStatePredictor,
+                 opponent_action_enumerator: OpponentActionEnumerator, utility_estimator: UtilityEstimator,
+                 exploration_constant = np.sqrt(2), rng = None):
+        '''
+        Args:
+            exploration_constant: weight of the exploration term in UCB
+            rng: random number generator used to sample random states and break ties
+        '''
+        super().__init__(forward_transistor, value_heuristic, action_enumerator, 
+                         random_state_enumerator, random_state_predictor,
+                         opponent_action_enumerator, utility_estimator, opponent_enumerator = OpponentEnumerator())
+        self.exploration_constant = exploration_constant
+        if rng is None:
+            rng = np.random.RandomState()
+        self.rng = rng
+        self.num_simulations = 0 # number of simulations run by the last search
 
-                # value should be max of actions
-                value = max(node.action_to_value.values())
+    def expand(self, graph: ValueGraph, state: State, prev_node = None, depth = None, render = False, revise = False, num_simulations = 100, time_limit = None):
+        '''
+        Runs simulations from a node until num_simulations are run or time_limit runs out
 
-                # print('Simultaneous state', state, 'value', value)
-                
-            if render and not node.virtual:
-                plt = graph.to_mathplotlib()
-                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                filename = f'Search/output/output_graph_{timestamp}.png'
-                plt.savefig(filename)
-                plt.close()
-                # plt.show()
-            
-            node.values_estimates.append(value)
-            utility = self.utility_estimator.estimate(node)
-            return utility
\ No newline at end of file
+        Args:
+            state: state to expand from
+            depth: maximum depth of the tree below state, or None for no limit
+            render: whether to record the search in a new trace recorder, which is kept in self.last_trace to render it afterwards
+            revise: whether to revise the graph or not
+            num_simulations: maximum number of simulations to run, or None for no limit
+            time_limit: maximum time to search for in seconds, or None for no limit
+
+        Returns:
+            value: updated value of the node
+        '''
+        if num_simulations is None and time_limit is None:
+            raise ValueError("num_simulations or time_limit must be set")
+        if render:
+            return self._expand_traced(self.expand, graph, state, prev_node, depth, revise=revise,
+                                       num_simulations=num_simulations, time_limit=time_limit)
+        deadline = None if time_limit is None else time.time() + time_limit
+
+        self.num_simulations = 0
+        while num_simulations is None or self.num_simulations < num_simulations:
+            if deadline is not None and time.time() > deadline:
+                break
+            self.simulate(graph, state, prev_node, depth, revise = revise and self.num_simulations == 0)
+            self.num_simulations += 1
+
+        return self.utility_estimator.estimate(graph.get_node(state))
+
+    def _ucb_select(self, actions, action_to_value, action_to_visits, total_visits, min_max_stats: MinMaxStats, sign = 1.0):
+        '''
+        Selects an untried action at random, otherwise the action with the highest upper confidence bound.
+        Values are normalized with min_max_stats so that the exploration constant does not depend on the scale of the rewards
+
+        Args:
+            actions: actions to select from
+            action_to_value: mean value of each tried action
+            action_to_visits: number of times each action was tried
+            total_visits: number of times any action was tried
+            min_max_stats: range of the values seen so far
+            sign: 1.0 to maximize the value, -1.0 to minimize it
+
+        Returns:
+            action: selected action
+        '''
+        actions = list(actions)
+        untried = [action for action in actions if action_to_visits.get(action, 0) == 0]
+        if untried:
+            return untried[self.rng.randint(len(untried))]
+
+        log_visits = np.log(total_visits)
+        best_action = None
+        best_score = -np.inf
+        for action in actions:
+            visits = action_to_visits[action]
+            value = min_max_stats.normalize(action_to_value[action])
+            score = sign * value + self.exploration_constant * np.sqrt(log_visits / visits)
+            if score > best_score:
+                best_action = action
+                best_score = score
+        return best_action
+
+    def _update_action(self, action_to_value, action_to_visits, action, value):
+        '''
+        Adds value to the running mean value of action
+        '''
+        visits = action_to_visits.get(action, 0) + 1
+        mean = action_to_value.get(action, 0.0)
+        action_to_visits[action] = visits
+        action_to_value[action] = mean + (value - mean) / visits
+
+    def _transition(self, state: State, node, action_to_next_state: dict, action):
+        '''
+        Returns the next state after taking action, reusing transitions that were already computed
+        '''
+        next_state = action_to_next_state.get(action)
+        if next_state is None:
+            next_state = self.forward_transistor.transition(state, action)
+            action_to_next_state[action] = next_state
+            node.next_states.add(next_state)
+        return next_state
+
+    def simulate(self, graph: ValueGraph, state: State, prev_node = None, depth = None, revise = False):
+        '''
+        Runs one simulation from a node: selects actions down the tree, evaluates the first state
+        that has not been visited with the value heuristic and backs the value up the path
+
+        Args:
+            state: state to simulate from
+            depth: maximum depth of the tree below state, or None for no limit
+            revise: whether to revise the actions of the node or not
+
+        Returns:
+            value: value of the simulation
+        '''
+        node = self._get_or_create_node(graph, state, prev_node)
+
+        if state.is_done():
+            value = state.get_reward()
+            graph.min_max_stats.update(value)
+        elif node.get_visits() == 0 or self._is_leaf(state, depth, prev_node): # leaf, evaluate with the heuristic
+            value = self._evaluate_leaf(state)
+            graph.min_max_stats.update(value)
+        else:
+            next_depth = depth
+            if depth is not None and not node.virtual:
+                next_depth = depth - 1
+            total_visits = node.get_visits()
+
+            if state.state_type == 'control':
+                if node.actions is None or revise:
+                    node.actions = self.action_enumerator.enumerate(state)
+                action = self._ucb_select(node.actions, node.action_to_value, node.action_to_visits, total_visits, graph.min_max_stats)
+                next_state = self._transition(state, node, node.action_to_next_state, action)
+                value = self.simulate(graph, next_state, node, next_depth)
+                self._update_action(node.action_to_value, node.action_to_visits, action, value)
+
+            elif state.state_type == 'adversarial':
+                if not node.adactions or revise:
+                    node.adactions = self.opponent_action_enumerator.enumerate(state)
+                action = self._ucb_select(node.adactions, node.action_to_value, node.action_to_visits, total_visits, graph.min_max_stats, sign=-1.0)
+                next_state = self._transition(state, node, node.action_to_next_state, action)
+                value = self.simulate(graph, next_state, node, next_depth)
+                self._update_action(node.action_to_value, node.action_to_visits, action, value)
+
+            elif state.state_type == 'stochastic':
+                if node.actions is None or revise:
+                    node.actions = list(self.random_state_enumerator.enumerate(state))
+                if not node.probs_over_actions or revise:
+                    node.probs_over_actions = self.random_state_predictor.predict(state, node.actions)
+                probs = np.array([node.probs_over_actions[action] for action in node.actions], dtype=float)
+                action = node.actions[self.rng.choice(len(node.actions), p=probs/probs.sum())]
+                next_state = self._transition(state, node, node.action_to_next_state, action)
+                value = self.simulate(graph, next_state, node, next_depth)
+
+            elif state.state_type == 'simultaneous':
+                if not node.adactions or revise:
+                    node.adactions = self.opponent_action_enumerator.enumerate(state)
+                if node.proactions is None or revise:
+                    node.proactions = self.action_enumerator.enumerate(state)
+                proaction = self._ucb_select(node.proactions, node.action_to_value, node.proaction_to_visits, total_visits, graph.min_max_stats)
+                adaction = self._ucb_select(node.adactions, node.adaction_to_value, node.adaction_to_visits, total_visits, graph.min_max_stats, sign=-1.0)
+                next_state = self._transition(state, node, node.joint_actions_to_next_states, (proaction, adaction))
+                value = self.simulate(graph, next_state, node, next_depth)
+                self._update_action(node.action_to_value, node.proaction_to_visits, proaction, value)
+                self._update_action(node.adaction_to_value, node.adaction_to_visits, adaction, value)
+
+            else:
+                raise NotImplementedError
+
+        self._add_value_estimate(node, value)
+        return value
+
+    def get_best_action(self, graph: ValueGraph, state: State):
+        '''
+        Returns the protagonist action that was taken the most at the state
+
+        Args:
+            state: state to get best action of
+
+        Returns:
+            best_action: most visited action, ties broken by value
+        '''
+        node = graph.get_node(state)
+        if state.state_type == 'simultaneous':
+            action_to_visits = node.proaction_to_visits
+        else:
+            action_to_visits = node.action_to_visits
+        return max(action_to_visits, key=lambda action: (action_to_visits[action], node.action_to_value[action]))
@@ -0,0 +1,305 @@
+import os
+import json
+import itertools
+import argparse
+import numpy as np
+from math import comb
+from Search.headers import ValueHeuristic
+from Search.baseline_models_GOPS import GOPSState
+from Search.matrix_game import solve_matrix_game
+
+# endgame tablebase for GOPS, solved offline and looked up with a memory map
+#
+# the value of a GOPS state is its score difference so far plus the expected score difference of the rest
+# of the game, which only depends on the cards left in both hands and in the prize deck and on the contested
+# points (the stake). the tablebase stores the rest of the game for every position with up to max_remaining
+# cards left in each hand, indexed by the colex ranks of the hands and the prize deck and by the stake:
+#
+#   stochastic[k][player hand, opponent hand, prize deck, stake]      k cards in each hand and in the deck
+#   simultaneous[k][player hand, opponent hand, prize deck, stake]    k cards in each hand, k-1 in the deck,
+#                                                                      the stake includes the revealed prize
+#
+# the file is a header followed by the arrays, so the tablebase needs C(num_cards, k)^3 * (max_stake+1) values
+# for each k, eg. 6 cards are solved completely in a few MB, while 13 cards are only practical for small k or
+# with a small max_stake. stakes that cannot be reached (or are above max_stake) are stored as NaN
+
+MAGIC = b'GOPSTB01'
+ALIGNMENT = 64
+MODES = ('oracle', 'nash')
+
+def get_subsets(num_cards, size):
+    '''
+    Returns the masks of all subsets of cards 1..num_cards with size cards, in colex order, so that the
+    position of a mask in the list is its rank
+    '''
+    masks = [sum(1 << card for card in cards) for cards in itertools.combinations(range(num_cards), size)]
+    return sorted(masks)
+
+def get_ranks(num_cards):
+    '''
+    Returns an array mapping every mask of cards 1..num_cards to its rank among the masks with the same number of cards
+    '''
+    ranks = np.zeros(1 << num_cards, dtype=np.int64)
+    for size in range(num_cards + 1):
+        for rank, mask in enumerate(get_subsets(num_cards, size)):
+            ranks[mask] = rank
+    return ranks
+
+def get_cards(mask):
+    '''
+    Returns the cards (from 1) in a mask
+    '''
+    return [card + 1 for card in range(mask.bit_length()) if mask >> card & 1]
+
+def get_segments(num_cards, max_remaining, max_stake):
+    '''
+    Returns the (state type, remaining cards, shape) of each array in a tablebase
+    '''
+    segments = []
+    for remaining in range(1, max_remaining + 1):
+        hands = comb(num_cards, remaining)
+        segments.append(('simultaneous', remaining, (hands, hands, comb(num_cards, remaining - 1), max_stake + 1)))
+        segments.append(('stochastic', remaining, (hands, hands, hands, max_stake + 1)))
+    return segments
+
+def _solve_simultaneous(payoffs, mode):
+    '''
+    Solves the matrix games of a pair of hands for every prize deck and stake
+
+    Args:
+        payoffs: (player actions, opponent actions, prize decks, stakes) array of payoffs to the player
+        mode: 'oracle' if the opponent best responds to the player's action, 'nash' for the value of the matrix game
+
+    Returns:
+        values: (prize decks, stakes) array of values, NaN where a payoff is NaN
+    '''
+    maximin = payoffs.min(axis=1).max(axis=0)
+    if mode == 'oracle':
+        return maximin
+
+    # games with a saddle point are solved already, the others are solved one at a time
+    minimax = payoffs.max(axis=0).min(axis=0)
+    values = maximin.copy()
+    unsolved = np.argwhere(minimax - maximin > 1e-9)
+    for deck, stake in unsolved:
+        values[deck, stake], _, _ = solve_matrix_game(payoffs[:, :, deck, stake])
+    return values
+
+def generate_tablebase(filename, num_cards, max_remaining, mode='oracle', max_stake=None, verbose=False):
+    '''
+    Solves every GOPS position with up to max_remaining cards left in each hand, with the same rules as
+    GOPSForwardTransitor, and writes the values of the rest of the game to a file
+
+    Positions are solved backwards from the end of the game. A simultaneous position with k cards left is a
+    matrix game whose payoffs are the points won in the round plus the values of the stochastic positions with
+    k-1 cards left, and a stochastic position is the mean of the simultaneous positions over the prize card revealed
+
+    Args:
+        filename: file to write the tablebase to
+        num_cards: number of cards in each deck or hand
+        max_remaining: maximum number of cards left in each hand
+        mode: 'oracle' if the opponent always best responds to the player's card, as in SMMinimax with oracle=True,
+            or 'nash' to solve simultaneous positions for Nash equilibria, as in SMMinimax with oracle=False
+        max_stake: maximum stake stored, defaults to the sum of all prize cards
+        verbose: whether to print progress
+    '''
+    if mode not in MODES:
+        raise ValueError(f"mode should be one of {MODES}, not {mode}")
+    if not 1 <= max_remaining <= num_cards:
+        raise ValueError("max_remaining should be between 1 and num_cards")
+    if max_stake is None:
+        max_stake = num_cards * (num_cards + 1) // 2
+    num_stakes = max_stake + 1
+    stakes = np.arange(num_stakes, dtype=float)
+    ranks = get_ranks(num_cards)
+
+    # header with the offsets of the arrays
+    segments = []
+    offset = 0
+    for state_type, remaining, shape in get_segments(num_cards, max_remaining, max_stake):
+        segments.append({'state_type': state_type, 'remaining': remaining, 'shape': shape, 'offset': offset})
+        offset += int(np.prod(shape)) * 4
+        offset += -offset % ALIGNMENT
+    header = json.dumps({'num_cards': num_cards, 'max_remaining': max_remaining, 'max_stake': max_stake,
+                         'mode': mode, 'dtype': '<f4', 'segments': segments}).encode('utf-8')
+    data_start = len(MAGIC) + 8 + len(header)
+    data_start += -data_start % ALIGNMENT
+    offsets = {(segment['state_type'], segment['remaining']): segment['offset'] for segment in segments}
+
+    with open(filename, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, 'little'))
+        f.write(header)
+
+        # with no cards left nothing more can be won
+        previous = np.zeros((1, 1, 1, num_stakes))
+        for remaining in range(1, max_remaining + 1):
+            hands = get_subsets(num_cards, remaining)
+            num_decks = comb(num_cards, remaining - 1)
+
+            # simultaneous positions, one pair of hands at a time for all prize decks and stakes
+            simultaneous = np.empty((len(hands), len(hands), num_decks, num_stakes))
+            payoffs = np.empty((remaining, remaining, num_decks, num_stakes))
+            for i, player_hand in enumerate(hands):
+                player_cards = get_cards(player_hand)
+                for j, opponent_hand in enumerate(hands):
+                    opponent_cards = get_cards(opponent_hand)
+                    for x, player_card in enumerate(player_cards):
+                        for y, opponent_card in enumerate(opponent_cards):
+                            child = previous[ranks[player_hand ^ 1 << (player_card-1)], ranks[opponent_hand ^ 1 << (opponent_card-1)]]
+                            if player_card == opponent_card:
+                                # the stake stays contested
+                                payoffs[x, y] = child
+                            else:
+                                payoffs[x, y] = np.sign(player_card - opponent_card) * stakes + child[:, :1]
+                    simultaneous[i, j] = _solve_simultaneous(payoffs, mode)
+
+            # stochastic positions, the mean over the prize card revealed, which is added to the stake
+            stochastic = np.zeros((len(hands), len(hands), len(hands), num_stakes))
+            for d, deck in enumerate(hands):
+                for prize in get_cards(deck):
+                    next_deck = ranks[deck ^ 1 << (prize-1)]
+                    if prize < num_stakes:
+                        stochastic[:, :, d, :num_stakes-prize] += simultaneous[:, :, next_deck, prize:]
+                    stochastic[:, :, d, max(0, num_stakes-prize):] = np.nan
+            stochastic /= remaining
+
+            for state_type, array in (('simultaneous', simultaneous), ('stochastic', stochastic)):
+                f.seek(data_start + offsets[(state_type, remaining)])
+                array.astype('<f4').tofile(f)
+            previous = stochastic
+            if verbose:
+                print(f"solved positions with {remaining} cards left")
+
+class GOPSTablebase:
+    '''
+    Memory map of a tablebase written by generate_tablebase
+    '''
+
+    def __init__(self, filename):
+        '''
+        Args:
+            filename: file of the tablebase
+        '''
+        with open(filename, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{filename} is not a GOPS tablebase")
+            header_length = int.from_bytes(f.read(8), 'little')
+            header = json.loads(f.read(header_length))
+        data_start = len(MAGIC) + 8 + header_length
+        data_start += -data_start % ALIGNMENT
+
+        self.num_cards = header['num_cards']
+        self.max_remaining = header['max_remaining']
+        self.max_stake = header['max_stake']
+        self.mode = header['mode']
+        self.full_mask = (1 << self.num_cards) - 1
+        self.ranks = get_ranks(self.num_cards).tolist()
+        self.tables = dict() # maps (state type, remaining cards) to array
+        for segment in header['segments']:
+            self.tables[(segment['state_type'], segment['remaining'])] = np.memmap(
+                filename, dtype=header['dtype'], mode='r', offset=data_start + segment['offset'], shape=tuple(segment['shape']))
+
+    def lookup(self, state: GOPSState):
+        '''
+        Returns the exact value of the state, or None if it is not in the tablebase
+
+        Args:
+            state: GOPS state, including GOPSBitmaskState
+
+        Returns:
+            value: final score difference with both players playing as in the tablebase's mode, or None
+        '''
+        if state.num_cards != self.num_cards or state.state_type not in ('simultaneous', 'stochastic'):
+            return None
+        if hasattr(state, 'get_masks'):
+            player_mask, opponent_mask, prize_mask = state.get_masks()
+        else:
+            player_mask = sum(1 << (card-1) for card in state.player_cards)
+            opponent_mask = sum(1 << (card-1) for card in state.opponent_cards)
+            prize_mask = sum(1 << (card-1) for card in state.prize_cards)
+        player_hand = self.full_mask ^ player_mask
+        remaining = bin(player_hand).count('1')
+        if remaining == 0 or remaining > self.max_remaining:
+            return None
+        player_score, opponent_score, contested_points = state.score_summary()
+        if contested_points > self.max_stake:
+            return None
+
+        table = self.tables[(state.state_type, remaining)]
+        value = table[self.ranks[player_hand], self.ranks[self.full_mask ^ opponent_mask],
+                      self.ranks[self.full_mask ^ prize_mask], contested_points]
+        if np.isnan(value):
+            return None
+        return player_score - opponent_score + float(value)
+
+class GOPSTablebaseValueHeuristic(ValueHeuristic):
+    '''
+    Value heuristic that returns exact values from a GOPS endgame tablebase, and the values of another
+    heuristic for states that are not in the tablebase. is_exact is True for states in the tablebase,
+    so SMMinimax, ValueBFS and UCTSearch stop searching at them
+    '''
+
+    def __init__(self, filename, fallback: ValueHeuristic = None):
+        '''
+        Args:
+            filename: file of the tablebase, written by generate_tablebase
+            fallback: heuristic for states that are not in the tablebase, or None to raise an error for them
+        '''
+        super().__init__()
+        self.tablebase = GOPSTablebase(filename)
+        self.fallback = fallback
+        self.hits = 0 # number of evaluations answered by the tablebase
+        self.misses = 0 # number of evaluations passed to the fallback
+        # the searches call is_exact and then evaluate on the same leaf, so the last lookup is kept for evaluate
+        self._last_state = None
+        self._last_value = None
+
+    def _lookup(self, state):
+        '''
+        Returns the tablebase value of the state, reusing the last lookup if it was for the same state object
+        '''
+        if state is not self._last_state:
+            self._last_value = self.tablebase.lookup(state)
+            self._last_state = state
+        return self._last_value
+
+    def is_exact(self, state):
+        return state.is_done() or self._lookup(state) is not None
+
+    def evaluate(self, state):
+        '''
+        Predicts the value of the state
+
+        Args:
+            state: current GOPS state
+
+        Returns:
+            value: final score difference
+        '''
+        if state.is_done():
+            return state.get_reward()
+        value = self._lookup(state)
+        if value is not None:
+            self.hits += 1
+            return value
+        self.misses += 1
+        if self.fallback is None:
+            raise ValueError(f"state {state} is not in the tablebase")
+        return self.fallback.evaluate(state)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('filename')
+    parser.add_argument('--num-cards', type=int, default=6)
+    parser.add_argument('--max-remaining', type=int, default=None)
+    parser.add_argument('--mode', choices=MODES, default='oracle')
+    parser.add_argument('--max-stake', type=int, default=None)
+    args = parser.parse_args()
+
+    max_remaining = args.max_remaining if args.max_remaining is not None else args.num_cards
+    generate_tablebase(args.filename, args.num_cards, max_remaining, args.mode, args.max_stake, verbose=True)
+    tablebase = GOPSTablebase(args.filename)
+    print(f"{os.path.getsize(args.filename)} bytes, value of the game:",
+          tablebase.lookup(GOPSState('stochastic', (), (), (), args.num_cards)))
@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+import unittest
+from Search.baseline_models_GOPS import GOPSState
+from Search.cfr import GOPSCFRSolver
+from Search.tablebase import GOPSTablebase, generate_tablebase
+
+class TestCFR(unittest.TestCase):
+    NUM_CARDS = 4
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.root = GOPSState('stochastic', (), (), (), self.NUM_CARDS)
+
+    def test_exploitability_decreases(self):
+        solver = GOPSCFRSolver(self.root)
+        exploitabilities = [solver.get_exploitability()]
+        for _ in range(4):
+            exploitabilities.append(solver.solve(50))
+        for before, after in zip(exploitabilities, exploitabilities[1:]):
+            self.assertLess(after, before)
+        self.assertLess(exploitabilities[-1], 0.05)
+        self.assertGreaterEqual(exploitabilities[-1], -1e-9)
+
+        # the value of the average strategies approaches the value of the game
+        filename = os.path.join(self.directory, 'nash.bin')
+        generate_tablebase(filename, self.NUM_CARDS, self.NUM_CARDS, 'nash')
+        game_value = GOPSTablebase(filename).lookup(self.root)
+        self.assertAlmostEqual(solver.get_values(), game_value, delta=exploitabilities[-1])
+
+    def test_save_load(self):
+        solver = GOPSCFRSolver(self.root)
+        solver.solve(20)
+        filename = os.path.join(self.directory, 'cfr.npz')
+        solver.save(filename)
+
+        loaded = GOPSCFRSolver(self.root)
+        loaded.load(filename)
+        self.assertEqual(loaded.num_iterations, solver.num_iterations)
+        self.assertEqual(loaded.get_values(), solver.get_values())
+        self.assertEqual(loaded.get_exploitability(), solver.get_exploitability())
+        state = GOPSState('simultaneous', (2,), (), (), self.NUM_CARDS)
+        for player in (0, 1):
+            self.assertEqual(loaded.get_average_strategy(state, player), solver.get_average_strategy(state, player))
+
+        # strategies of another root are rejected
+        other = GOPSCFRSolver(GOPSState('stochastic', (), (), (), self.NUM_CARDS - 1))
+        with self.assertRaises(ValueError):
+            other.load(filename)
+        other = GOPSCFRSolver(GOPSState('simultaneous', (2,), (), (), self.NUM_CARDS))
+        with self.assertRaises(ValueError):
+            other.load(filename)
+
+if __name__ == "__main__":
+    unittest.main()
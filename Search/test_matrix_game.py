@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+from Search.matrix_game import find_saddle_point, get_exploitability, solve_matrix_game
+
+class TestMatrixGame(unittest.TestCase):
+
+    def assert_equilibrium(self, payoffs, value, row_strategy, column_strategy):
+        payoffs = np.asarray(payoffs, dtype=float)
+        for strategy in (row_strategy, column_strategy):
+            self.assertTrue(np.all(strategy >= -1e-9))
+            self.assertAlmostEqual(strategy.sum(), 1.0)
+        self.assertAlmostEqual(get_exploitability(payoffs, row_strategy, column_strategy), 0.0, places=7)
+        self.assertAlmostEqual(row_strategy @ payoffs @ column_strategy, value, places=7)
+
+    def test_rock_paper_scissors(self):
+        payoffs = [[0, -1, 1], [1, 0, -1], [-1, 1, 0]]
+        value, row_strategy, column_strategy = solve_matrix_game(payoffs)
+        self.assertAlmostEqual(value, 0.0)
+        np.testing.assert_allclose(row_strategy, np.full(3, 1 / 3))
+        np.testing.assert_allclose(column_strategy, np.full(3, 1 / 3))
+
+    def test_random_games(self):
+        rng = np.random.RandomState(0)
+        for _ in range(200):
+            shape = rng.randint(1, 8, size=2)
+            payoffs = rng.uniform(-10, 10, size=shape)
+            self.assert_equilibrium(payoffs, *solve_matrix_game(payoffs))
+
+    def test_random_integer_games(self):
+        # ties between payoffs make the simplex method pivot on degenerate vertices
+        rng = np.random.RandomState(1)
+        for _ in range(200):
+            shape = rng.randint(1, 8, size=2)
+            payoffs = rng.randint(-2, 3, size=shape)
+            self.assert_equilibrium(payoffs, *solve_matrix_game(payoffs))
+
+    def test_saddle_point_games(self):
+        rng = np.random.RandomState(2)
+        for _ in range(100):
+            num_rows, num_columns = rng.randint(1, 8, size=2)
+            row, column = rng.randint(num_rows), rng.randint(num_columns)
+            # the saddle point is the smallest payoff in its row and the largest in its column
+            payoffs = rng.uniform(-10, 10, size=(num_rows, num_columns))
+            payoffs[row, :] = rng.uniform(5, 10, size=num_columns)
+            payoffs[:, column] = rng.uniform(-10, 0, size=num_rows)
+            payoffs[row, column] = 2.0
+            self.assertEqual(find_saddle_point(payoffs), (row, column))
+            value, row_strategy, column_strategy = solve_matrix_game(payoffs)
+            self.assertAlmostEqual(value, 2.0)
+            self.assertEqual(row_strategy[row], 1.0)
+            self.assertEqual(column_strategy[column], 1.0)
+            self.assert_equilibrium(payoffs, value, row_strategy, column_strategy)
+
+if __name__ == "__main__":
+    unittest.main()
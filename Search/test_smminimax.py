@@ -0,0 +1,123 @@
+import unittest
+import numpy as np
+from Search.beliefs import ValueGraph
+from Search.benchmarks import build_gops_smminimax
+from Search.baseline_models_GOPS import *
+from Search.search import SMMinimax
+from Search.estimators import UtilityEstimatorLast
+from Search.test_search import HashValueHeuristic
+
+class TestSMMinimax(unittest.TestCase):
+    NUM_CARDS = 4
+
+    def setUp(self):
+        self.root = GOPSState('simultaneous', (3,), (), (), self.NUM_CARDS)
+        self.full_depth = 2*self.NUM_CARDS
+
+    def test_transposition_modes(self):
+        search = build_gops_smminimax(1, rng=np.random.RandomState(0))
+        nash_value = search.expand(ValueGraph(), self.root, depth=self.full_depth, oracle=False, use_transposition=True)
+        oracle_value = search.expand(ValueGraph(), self.root, depth=self.full_depth, use_transposition=True)
+        self.assertNotAlmostEqual(nash_value, oracle_value)
+
+        # entries stored by the oracle search are not reused by the Nash search on the same graph, and vice versa
+        graph = ValueGraph()
+        self.assertAlmostEqual(search.expand(graph, self.root, depth=self.full_depth, use_transposition=True),
+                               oracle_value)
+        self.assertAlmostEqual(search.expand(graph, self.root, depth=self.full_depth, oracle=False,
+                                             use_transposition=True), nash_value)
+        self.assertAlmostEqual(search.expand(graph, self.root, depth=self.full_depth, use_transposition=True),
+                               oracle_value)
+        self.assertAlmostEqual(search.iterative_deepening(graph, self.root, max_depth=self.full_depth, oracle=False)[1],
+                               nash_value)
+    def test_pruning_is_exact(self):
+        roots = [self.root, GOPSState('simultaneous', (4,), (), (), self.NUM_CARDS),
+                 GOPSState('simultaneous', (2, 4), (1,), (3,), self.NUM_CARDS)]
+        for root in roots:
+            search = build_gops_smminimax(1, rng=np.random.RandomState(0))
+            graph = ValueGraph()
+            value = search.expand(graph, root, depth=self.full_depth)
+            best_action = graph.get_best_action(root)
+
+            pruned_search = build_gops_smminimax(1, prune=True, rng=np.random.RandomState(0))
+            pruned_graph = ValueGraph()
+            self.assertAlmostEqual(pruned_search.expand(pruned_graph, root, depth=self.full_depth), value)
+            self.assertEqual(pruned_graph.get_best_action(root), best_action)
+            self.assertLess(pruned_search.nodes_expanded, search.nodes_expanded)
+            # values of the other actions are upper bounds below the best value
+            for action, action_value in pruned_graph.get_node(root).action_to_value.items():
+                if action != best_action:
+                    self.assertGreaterEqual(action_value, graph.get_node(root).action_to_value[action] - 1e-9)
+                    self.assertLess(action_value, value)
+    def make_search(self, prune=True):
+        '''
+        Returns a search with a deterministic value heuristic, so that depth-limited values do not depend on the
+        order that states are searched in
+        '''
+        return SMMinimax(GOPSForwardTransitor(), HashValueHeuristic(), GOPSActionEnumerator(),
+                         GOPSRandomStateEnumerator(), GOPSRandomStatePredictor(), GOPSOpponentActionEnumerator(),
+                         UtilityEstimatorLast(), prune=prune)
+
+    def search_to_depth(self, root, depth):
+        '''
+        Returns the value, best action and action values of a plain search of root to depth
+        '''
+        graph = ValueGraph()
+        value = self.make_search().expand(graph, root, depth=depth)
+        return value, graph.get_best_action(root), dict(graph.get_node(root).action_to_value)
+
+    def test_iterative_deepening_matches_search(self):
+        root = GOPSState('simultaneous', (3,), (), (), 5)
+        for max_depth in (1, 2, 3):
+            search = self.make_search()
+            graph = ValueGraph()
+            best_action, value, depth = search.iterative_deepening(graph, root, max_depth=max_depth)
+            expected_value, expected_best_action, expected_action_to_value = self.search_to_depth(root, max_depth)
+            self.assertEqual(depth, max_depth)
+            self.assertAlmostEqual(value, expected_value)
+            self.assertEqual(best_action, expected_best_action)
+            self.assertEqual(graph.transposition_table.get_entry(root, True).depth, max_depth)
+
+        # with the transposition table, a search that reuses the previous iterations' results finds the same value
+        search = self.make_search()
+        graph = ValueGraph()
+        search.expand(graph, root, depth=2, use_transposition=True)
+        self.assertAlmostEqual(search.expand(graph, root, depth=3, use_transposition=True),
+                               self.search_to_depth(root, 3)[0])
+
+    def test_iterative_deepening_budget(self):
+        # the best action at depth 3 differs from the one at depth 2
+        root = GOPSState('simultaneous', (3,), (), (), 5)
+        value_2, best_action_2, action_to_value_2 = self.search_to_depth(root, 2)
+        self.assertNotEqual(self.search_to_depth(root, 3)[1], best_action_2)
+
+        search = self.make_search()
+        search.iterative_deepening(ValueGraph(), root, max_depth=2)
+        nodes_to_depth_2 = search.nodes_expanded
+        search.iterative_deepening(ValueGraph(), root, max_depth=3)
+        nodes_to_depth_3 = search.nodes_expanded
+
+        # the node budget runs out halfway through the third iteration, after some root actions were searched
+        graph = ValueGraph()
+        node_limit = (nodes_to_depth_2 + nodes_to_depth_3) // 2
+        best_action, value, depth = search.iterative_deepening(graph, root, max_depth=4, node_limit=node_limit)
+        self.assertEqual(depth, 2)
+        self.assertEqual(best_action, best_action_2)
+        self.assertAlmostEqual(value, value_2)
+        self.assertLessEqual(search.nodes_expanded, node_limit + 1)
+        # the root's action values from the unfinished iteration are discarded
+        self.assertEqual(graph.get_node(root).action_to_value, action_to_value_2)
+        self.assertEqual(graph.get_best_action(root), best_action_2)
+
+        # a later call resumes from the stored depth, and returns the stored result if it cannot search deeper
+        self.assertEqual(search.iterative_deepening(graph, root, max_depth=4, node_limit=1),
+                         (best_action_2, value_2, 2))
+        self.assertEqual(search.iterative_deepening(graph, root, max_depth=2), (best_action_2, value_2, 2))
+        self.assertEqual(search.nodes_expanded, 0)
+        best_action, value, depth = search.iterative_deepening(graph, root, max_depth=3)
+        value_3, best_action_3, _ = self.search_to_depth(root, 3)
+        self.assertEqual((best_action, depth), (best_action_3, 3))
+        self.assertAlmostEqual(value, value_3)
+
+if __name__ == "__main__":
+    unittest.main()
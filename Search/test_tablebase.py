@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from Search.beliefs import ValueGraph
+from Search.benchmarks import build_gops_smminimax
+from Search.baseline_models_GOPS import *
+from Search.search import SMMinimax
+from Search.estimators import UtilityEstimatorLast
+from Search.tablebase import GOPSTablebase, GOPSTablebaseValueHeuristic, generate_tablebase
+
+class TestTablebase(unittest.TestCase):
+    NUM_CARDS = 4
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def sample_states(self, num_games, rng):
+        '''
+        Returns the states of random games, from their start
+        '''
+        transitor = GOPSForwardTransitor()
+        states = []
+        for _ in range(num_games):
+            state = GOPSState('stochastic', (), (), (), self.NUM_CARDS)
+            while not state.is_done():
+                states.append(state)
+                if state.state_type == 'stochastic':
+                    outcomes = sorted(GOPSRandomStateEnumerator().enumerate(state))
+                    state = transitor.transition(state, outcomes[rng.randint(len(outcomes))])
+                else:
+                    actions = sorted(GOPSActionEnumerator().enumerate(state))
+                    adactions = sorted(GOPSOpponentActionEnumerator().enumerate(state))
+                    state = transitor.transition(state, (actions[rng.randint(len(actions))], adactions[rng.randint(len(adactions))]))
+        return states
+
+    def check_against_search(self, mode):
+        filename = os.path.join(self.directory, f'{mode}.bin')
+        generate_tablebase(filename, self.NUM_CARDS, self.NUM_CARDS, mode)
+        tablebase = GOPSTablebase(filename)
+        search = build_gops_smminimax(1, rng=np.random.RandomState(0))
+        graph = ValueGraph()
+        for state in self.sample_states(5, np.random.RandomState(1)):
+            # searching to the end of the game never calls the value heuristic
+            value = search.expand(graph, state, depth=2*self.NUM_CARDS+2, oracle=(mode == 'oracle'), use_transposition=True)
+            self.assertAlmostEqual(tablebase.lookup(state), value, places=5)
+            self.assertAlmostEqual(tablebase.lookup(GOPSBitmaskState.from_state(state)), value, places=5)
+
+    def test_oracle_values(self):
+        self.check_against_search('oracle')
+
+    def test_nash_values(self):
+        self.check_against_search('nash')
+
+    def test_value_heuristic(self):
+        filename = os.path.join(self.directory, 'partial.bin')
+        generate_tablebase(filename, self.NUM_CARDS, 2, 'oracle')
+        heuristic = GOPSTablebaseValueHeuristic(filename)
+        lookups = []
+        lookup = heuristic.tablebase.lookup
+        heuristic.tablebase.lookup = lambda state: lookups.append(state) or lookup(state)
+        search = SMMinimax(GOPSForwardTransitor(), heuristic, GOPSActionEnumerator(), GOPSRandomStateEnumerator(),
+                           GOPSRandomStatePredictor(), GOPSOpponentActionEnumerator(), UtilityEstimatorLast())
+
+        # the search stops at the states with 2 cards left, which are in the tablebase
+        root = GOPSState('stochastic', (), (), (), self.NUM_CARDS)
+        value = search.expand(ValueGraph(), root, depth=2*self.NUM_CARDS+2)
+        full_search = build_gops_smminimax(1, rng=np.random.RandomState(0))
+        self.assertAlmostEqual(value, full_search.expand(ValueGraph(), root, depth=2*self.NUM_CARDS+2), places=5)
+        # is_exact and evaluate share one lookup per leaf
+        self.assertGreater(heuristic.hits, 0)
+        self.assertEqual(len(set(map(id, lookups))), len(lookups))
+
+    def test_missing_states(self):
+        filename = os.path.join(self.directory, 'partial.bin')
+        generate_tablebase(filename, self.NUM_CARDS, 2, 'oracle')
+        tablebase = GOPSTablebase(filename)
+        self.assertIsNone(tablebase.lookup(GOPSState('stochastic', (), (), (), self.NUM_CARDS)))
+        self.assertIsNone(tablebase.lookup(GOPSState('stochastic', (), (), (), self.NUM_CARDS + 1)))
+        self.assertIsNotNone(tablebase.lookup(GOPSState('stochastic', (1, 2), (1, 2), (1, 2), self.NUM_CARDS)))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+import numpy as np
+from Search.beliefs import ValueGraph
+from Search.benchmarks import build_gops_smminimax
+from Search.baseline_models_GOPS import *
+from Search.classic_models import GOPSRandomRolloutValueHeuristic
+from Search.search import UCTSearch
+from Search.estimators import UtilityEstimatorMean
+
+class TestUCTSearch(unittest.TestCase):
+    NUM_CARDS = 4
+
+    def test_endgames(self):
+        # endgames where the oracle action is also the action of the equilibrium that decoupled UCT converges to
+        endgames = [GOPSState('simultaneous', (2, 4), (1,), (3,), self.NUM_CARDS),
+                    GOPSState('simultaneous', (3, 1, 4), (1, 2), (2, 4), self.NUM_CARDS)]
+        for state in endgames:
+            graph = ValueGraph()
+            build_gops_smminimax(1, rng=np.random.RandomState(0)).expand(graph, state, depth=2*self.NUM_CARDS)
+            oracle_action = graph.get_best_action(state)
+
+            rng = np.random.RandomState(0)
+            search = UCTSearch(GOPSForwardTransitor(), GOPSRandomRolloutValueHeuristic(1, rng=rng),
+                               GOPSActionEnumerator(), GOPSRandomStateEnumerator(), GOPSRandomStatePredictor(),
+                               GOPSOpponentActionEnumerator(), UtilityEstimatorMean(), rng=rng)
+            graph = ValueGraph()
+            search.expand(graph, state, num_simulations=1000)
+            self.assertEqual(search.num_simulations, 1000)
+            self.assertEqual(graph.get_node(state).get_visits(), 1000)
+            self.assertEqual(search.get_best_action(graph, state), oracle_action)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+import numpy as np
+from Search.beliefs import ValueGraph
+from Search.benchmarks import build_gops_smminimax
+from Search.baseline_models_GOPS import GOPSState
+
+class TestValueGraphCapacity(unittest.TestCase):
+    NUM_CARDS = 6
+
+    def play(self, graph):
+        '''
+        Plays a game against a random opponent, and returns the actions of the search
+        '''
+        rng = np.random.RandomState(0)
+        search = build_gops_smminimax(5, rng=rng)
+        prizes = list(rng.permutation(self.NUM_CARDS) + 1)
+        actions, opponent_actions = [], []
+        for turn in range(self.NUM_CARDS):
+            state = GOPSState('simultaneous', tuple(prizes[:turn+1]), tuple(actions), tuple(opponent_actions),
+                              self.NUM_CARDS)
+            graph.set_root(state)
+            search.expand(graph, state, depth=2)
+            self.assertIn(state, graph.id_to_node)
+            actions.append(graph.get_best_action(state))
+            cards = [card for card in range(1, self.NUM_CARDS+1) if card not in opponent_actions]
+            opponent_actions.append(int(rng.choice(cards)))
+        return actions
+
+    def test_capacity_during_search(self):
+        actions = self.play(ValueGraph())
+        for eviction_policy in ('lru', 'visits'):
+            graph = ValueGraph(300, eviction_policy)
+            # nodes are evicted while searching, and the search still finds the same actions
+            self.assertEqual(self.play(graph), actions)
+            stats = graph.get_eviction_stats()
+            self.assertLessEqual(stats['peak_num_nodes'], 300)
+            self.assertGreater(stats['num_evicted'], 0)
+
+    def test_accessed_nodes_are_kept(self):
+        graph = ValueGraph(2)
+        root = graph.set_root(GOPSState('stochastic', (), (), (), self.NUM_CARDS))
+        # every node was accessed since the root was set, so the graph grows past its capacity
+        children = [graph.add_state(GOPSState('simultaneous', (prize,), (), (), self.NUM_CARDS),
+                                    parent_states=[root.state]) for prize in range(1, 4)]
+        self.assertEqual(len(graph.id_to_node), 4)
+        # after the root is set again, nodes that are not accessed are evicted as nodes are added
+        graph.set_root(children[0].state)
+        graph.add_state(GOPSState('simultaneous', (1,), (1,), (1,), self.NUM_CARDS), parent_states=[children[0].state])
+        self.assertIn(children[0].state, graph.id_to_node)
+        self.assertLessEqual(len(graph.id_to_node), 3)
+class TestValueGraphReroot(unittest.TestCase):
+    NUM_CARDS = 4
+
+    def test_reroot(self):
+        root = GOPSState('simultaneous', (3,), (), (), self.NUM_CARDS)
+        search = build_gops_smminimax(1, rng=np.random.RandomState(0))
+        graph = ValueGraph()
+        graph.set_root(root)
+        search.expand(graph, root, depth=2*self.NUM_CARDS, use_transposition=True)
+
+        # the state after a move and the next prize
+        new_root = GOPSState('simultaneous', (3, 1), (2,), (4,), self.NUM_CARDS)
+        node = graph.get_node(new_root)
+        subtree = {node.id}
+        stack = [node]
+        while stack:
+            for child in stack.pop().children:
+                if child.id not in subtree:
+                    subtree.add(child.id)
+                    stack.append(child)
+        num_nodes = len(graph.id_to_node)
+        action_to_value = dict(node.action_to_value)
+        entry = graph.transposition_table.get_entry(new_root, True)
+        self.assertLess(len(subtree), num_nodes)
+
+        self.assertIs(graph.reroot(new_root), node)
+        # the new root's subtree is kept with its values and transposition table entries, and the rest is removed
+        self.assertEqual(set(graph.id_to_node), subtree)
+        self.assertEqual(graph.get_eviction_stats()['num_collected'], num_nodes - len(subtree))
+        self.assertNotIn(root, graph.id_to_node)
+        self.assertEqual(len(node.parents), 0)
+        for other in graph.id_to_node.values():
+            self.assertTrue(all(parent.id in graph.id_to_node for parent in other.parents))
+            self.assertTrue(all(child.id in graph.id_to_node for child in other.children))
+        self.assertEqual(node.action_to_value, action_to_value)
+        self.assertIs(graph.transposition_table.get_entry(new_root, True), entry)
+        self.assertLessEqual(set(graph.transposition_table.id_to_entry),
+                             {other.state.id for other in graph.id_to_node.values()})
+        self.assertEqual(graph.root, new_root)
+        self.assertEqual(graph.pinned_nodes, {node})
+
+        # the next search reuses the result stored for the new root
+        self.assertAlmostEqual(search.expand(graph, new_root, depth=entry.depth, use_transposition=True), entry.value)
+        self.assertEqual(search.nodes_expanded, 1)
+
+        # rerooting to a state that is not in the graph clears it
+        unreachable = GOPSState('simultaneous', (1,), (), (), self.NUM_CARDS)
+        graph.reroot(unreachable)
+        self.assertEqual(list(graph.id_to_node), [unreachable])
+        self.assertEqual(len(graph.transposition_table), 0)
+
+if __name__ == "__main__":
+    unittest.main()
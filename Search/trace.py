@@ -0,0 +1,131 @@
+import pickle
+import networkx as nx
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+from Search.beliefs import draw_value_graph
+
+class SearchTraceRecorder:
+    '''
+    Records what a search does to its graph as a list of events, so that the search can be rendered
+    afterwards instead of drawing the whole graph after every expansion
+
+    Events are tuples:
+        ('node', node_id, parent_id): the search visited node_id from parent_id (None at the root)
+        ('value', node_id, value): the search added a value estimate to node_id
+
+    Set search.trace_recorder to a recorder to record every search until it is unset, or call expand with
+    render=True to record one search in a new recorder, which is kept in search.last_trace
+    '''
+
+    def __init__(self):
+        self.events = []
+
+    def record_node(self, node_id, parent_id = None):
+        '''
+        Records that the search visited a node, from its parent if it has one
+        '''
+        self.events.append(('node', node_id, parent_id))
+
+    def record_value(self, node_id, value):
+        '''
+        Records that the search added a value estimate to a node
+        '''
+        self.events.append(('value', node_id, value))
+
+    def __len__(self):
+        return len(self.events)
+
+    def clear(self):
+        self.events = []
+
+    def save(self, filename):
+        '''
+        Saves the events to a file
+        '''
+        with open(filename, 'wb') as f:
+            pickle.dump(self.events, f)
+
+    @classmethod
+    def load(cls, filename):
+        '''
+        Returns a recorder with the events saved in a file
+        '''
+        recorder = cls()
+        with open(filename, 'rb') as f:
+            recorder.events = pickle.load(f)
+        return recorder
+
+    def get_snapshot(self, num_events = None):
+        '''
+        Replays the events to rebuild the graph as it was after some of them
+
+        Args:
+            num_events: number of events to replay, or None for all of them
+
+        Returns:
+            G: networkx graph with the same 'value' and 'visits' attributes as ValueGraph.to_networkx
+        '''
+        G = nx.DiGraph()
+        value_sums = dict()
+        for kind, node_id, other in self.events[:num_events]:
+            if node_id not in value_sums:
+                value_sums[node_id] = 0.0
+                G.add_node(node_id, value = 0.0, visits = 0)
+            if kind == 'node':
+                if other is not None:
+                    G.add_edge(other, node_id)
+            else:
+                value_sums[node_id] += other
+                attributes = G.nodes[node_id]
+                attributes['visits'] += 1
+                # round value to 4 significant figures
+                attributes['value'] = round(float(value_sums[node_id]) / attributes['visits'], 4)
+        return G
+
+    def render(self, num_events = None, filename = None, pos = None):
+        '''
+        Draws the graph as it was after some of the events
+
+        Args:
+            num_events: number of events to replay, or None for all of them
+            filename: file to save the figure to, or None to return it without saving
+            pos: positions of the nodes, computed with a spring layout if None
+
+        Returns:
+            fig: matplotlib figure
+        '''
+        G = self.get_snapshot(num_events)
+        fig, ax = plt.subplots()
+        num_events = len(self.events) if num_events is None else num_events
+        draw_value_graph(G, pos = pos, ax = ax, title = f"Value Graph after {num_events} events")
+        if filename is not None:
+            fig.savefig(filename)
+            plt.close(fig)
+        return fig
+
+    def animate(self, filename, num_frames = 50, interval = 200):
+        '''
+        Saves an animation of the graph growing during the search. The layout is computed once for the
+        final graph, so nodes keep their positions across frames
+
+        Args:
+            filename: file to save the animation to, eg. 'Search/output/search.gif'
+            num_frames: number of frames, spread evenly over the events
+            interval: time between frames in milliseconds
+        '''
+        if len(self.events) == 0:
+            raise ValueError("no events to animate")
+        num_frames = max(1, min(num_frames, len(self.events)))
+        frame_events = [round((frame + 1) * len(self.events) / num_frames) for frame in range(num_frames)]
+        pos = nx.spring_layout(self.get_snapshot())
+
+        fig = plt.figure()
+        def draw_frame(frame):
+            fig.clear()
+            ax = fig.add_subplot()
+            draw_value_graph(self.get_snapshot(frame_events[frame]), pos = pos, ax = ax,
+                             title = f"Value Graph after {frame_events[frame]} events")
+
+        animation = FuncAnimation(fig, draw_frame, frames = num_frames, interval = interval)
+        animation.save(filename, writer = 'pillow' if filename.endswith('.gif') else None)
+        plt.close(fig)
@@ -3,6 +3,7 @@ Bots that work on OpenSpiel game environments
 """
 
 # import libraries
+import os
 import re
 import random
 import pyspiel
@@ -16,6 +17,7 @@ from Search.baseline_models_GOPS import *
 from Search.engine import *
 from Search.estimators import *
 from Search.classic_models import *
+from Search.cfr import GOPSCFRSolver
 
 
 class OpenSpielBot:
@@ -102,7 +104,8 @@ class MCTSBot(OpenSpielBot):
     
 class SMMinimaxBot(OpenSpielBot):
 
-    def __init__(self, env, player_id, rng=None, max_depth=3, num_rollouts=100):
+    def __init__(self, env, player_id, rng=None, max_depth=3, num_rollouts=100, time_limit=None, node_limit=None, prune=False,
+                 graph_capacity=None, eviction_policy='lru', canonical=False, oracle=True):
         """Initializes the SMMinimaxBot.
         
         Args:
@@ -111,22 +114,31 @@ class SMMinimaxBot(OpenSpielBot):
             rng: random number generator
             max_depth: maximum depth to search
             num_rollouts: number of rollouts to perform for value estimation
+            time_limit: seconds to search per move with iterative deepening, or None to search to max_depth
+            node_limit: nodes to search per move with iterative deepening, or None to search to max_depth
+            prune: whether the search skips opponent replies that cannot change the value
+            graph_capacity: number of nodes the value graph keeps, or None to keep every node
+            eviction_policy: 'lru' or 'visits', which nodes the value graph evicts first when it is over capacity
+            canonical: whether to search canonical GOPS states, so that histories reaching the same position share nodes
+            oracle: whether the search assumes the opponent best responds to our action, otherwise the bot samples from the Nash equilibrium strategy
         """
         super().__init__(env, player_id, rng)
         self.max_depth = max_depth
-        self.value_graph = ValueGraph()
+        self.oracle = oracle
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.canonical = canonical
+        self.value_graph = ValueGraph(graph_capacity, eviction_policy)
         self.action_enumerator = GOPSActionEnumerator()
         self.opponent_action_enumerator = GOPSOpponentActionEnumerator()
         self.hidden_state_enumerator = GOPSRandomStateEnumerator()
         self.hidden_state_predictor = GOPSRandomStatePredictor()
         self.forward_transitor = GOPSForwardTransitor()
         self.utility_estimator = UtilityEstimatorLast()
-        self.value_heuristic = RandomRolloutValueHeuristic(self.action_enumerator, self.opponent_action_enumerator, 
-                                                      self.forward_transitor, self.hidden_state_enumerator, 
-                                                      num_rollouts=num_rollouts)
+        self.value_heuristic = GOPSRandomRolloutValueHeuristic(num_rollouts=num_rollouts, rng=self.rng)
         self.search = SMMinimax(self.forward_transitor, self.value_heuristic, self.action_enumerator,
                                 self.hidden_state_enumerator, self.hidden_state_predictor,
-                                self.opponent_action_enumerator, self.utility_estimator)
+                                self.opponent_action_enumerator, self.utility_estimator, prune=prune)
 
     def step(self, state):
         """Returns the action to be taken by this bot in the given state."""
@@ -134,11 +146,24 @@ class SMMinimaxBot(OpenSpielBot):
         # first convert state from OpenSpiel state to GOPSState
         gops_state = open_spiel_state_to_gops_state(state)
 
-        # then expand the value graph
-        self.search.expand(self.value_graph, gops_state, depth=self.max_depth)
+        if self.canonical:
+            gops_state = gops_state.to_canonical()
 
-        # then get the best action from the value graph
-        action = self.value_graph.get_best_action(gops_state)
+        # then expand the value graph and get the best action from it
+        self.value_graph.reroot(gops_state)
+        if self.time_limit is None and self.node_limit is None:
+            self.search.expand(self.value_graph, gops_state, depth=self.max_depth, oracle=self.oracle)
+            action = self.value_graph.get_best_action(gops_state)
+        else:
+            action, _, _ = self.search.iterative_deepening(self.value_graph, gops_state, max_depth=self.max_depth,
+                                                           time_limit=self.time_limit, node_limit=self.node_limit,
+                                                           oracle=self.oracle)
+
+        # sample from the mixed strategy if the state was solved for a Nash equilibrium
+        if not self.oracle:
+            action_to_prob = self.value_graph.get_policy(gops_state)
+            actions = list(action_to_prob)
+            action = actions[self.rng.choice(len(actions), p=list(action_to_prob.values()))]
 
         return action - 1 # subtract 1 because OpenSpiel actions are 0-indexed
 
@@ -160,7 +185,8 @@ class CustomBot:
 
 class SMMinimaxCustomBot(CustomBot):
 
-    def __init__(self, player_id, rng=None, max_depth=3, num_rollouts=100):
+    def __init__(self, player_id, rng=None, max_depth=3, num_rollouts=100, time_limit=None, node_limit=None, prune=False,
+                 graph_capacity=None, eviction_policy='lru', canonical=False, oracle=True):
         """Initializes the SMMinimaxBot.
         
         Args:
@@ -168,30 +194,143 @@ class SMMinimaxCustomBot(CustomBot):
             rng: random number generator
             max_depth: maximum depth to search
             num_rollouts: number of rollouts to perform for value estimation
+            time_limit: seconds to search per move with iterative deepening, or None to search to max_depth
+            node_limit: nodes to search per move with iterative deepening, or None to search to max_depth
+            prune: whether the search skips opponent replies that cannot change the value
+            graph_capacity: number of nodes the value graph keeps, or None to keep every node
+            eviction_policy: 'lru' or 'visits', which nodes the value graph evicts first when it is over capacity
+            canonical: whether to search canonical GOPS states, so that histories reaching the same position share nodes
+            oracle: whether the search assumes the opponent best responds to our action, otherwise the bot samples from the Nash equilibrium strategy
         """
         super().__init__(player_id, rng)
         self.max_depth = max_depth
-        self.value_graph = ValueGraph()
+        self.oracle = oracle
+        self.time_limit = time_limit
+        self.node_limit = node_limit
+        self.canonical = canonical
+        self.value_graph = ValueGraph(graph_capacity, eviction_policy)
         self.action_enumerator = GOPSActionEnumerator()
         self.opponent_action_enumerator = GOPSOpponentActionEnumerator()
         self.hidden_state_enumerator = GOPSRandomStateEnumerator()
         self.hidden_state_predictor = GOPSRandomStatePredictor()
         self.forward_transitor = GOPSForwardTransitor()
         self.utility_estimator = UtilityEstimatorLast()
-        self.value_heuristic = RandomRolloutValueHeuristic(self.action_enumerator, self.opponent_action_enumerator, 
-                                                      self.forward_transitor, self.hidden_state_enumerator, 
-                                                      num_rollouts=num_rollouts)
+        self.value_heuristic = GOPSRandomRolloutValueHeuristic(num_rollouts=num_rollouts, rng=self.rng)
         self.search = SMMinimax(self.forward_transitor, self.value_heuristic, self.action_enumerator,
                                 self.hidden_state_enumerator, self.hidden_state_predictor,
-                                self.opponent_action_enumerator, self.utility_estimator)
+                                self.opponent_action_enumerator, self.utility_estimator, prune=prune)
 
     def step(self, state: GOPSState):
         """Returns the action to be taken by this bot in the given state."""
     
-        # then expand the value graph
-        self.search.expand(self.value_graph, state, depth=self.max_depth)
+        if self.canonical:
+            state = state.to_canonical()
+
+        # then expand the value graph and get the best action from it
+        self.value_graph.reroot(state)
+        if self.time_limit is None and self.node_limit is None:
+            self.search.expand(self.value_graph, state, depth=self.max_depth, oracle=self.oracle)
+            action = self.value_graph.get_best_action(state)
+        else:
+            action, _, _ = self.search.iterative_deepening(self.value_graph, state, max_depth=self.max_depth,
+                                                           time_limit=self.time_limit, node_limit=self.node_limit,
+                                                           oracle=self.oracle)
+
+        # sample from the mixed strategy if the state was solved for a Nash equilibrium
+        if not self.oracle:
+            action_to_prob = self.value_graph.get_policy(state)
+            actions = list(action_to_prob)
+            action = actions[self.rng.choice(len(actions), p=list(action_to_prob.values()))]
+
+        return action - 1 # subtract 1 because OpenSpiel actions are 0-indexed
+
+class UCTCustomBot(CustomBot):
+
+    def __init__(self, player_id, rng=None, num_simulations=1000, time_limit=None, num_rollouts=10, exploration_constant=np.sqrt(2),
+                 graph_capacity=None, eviction_policy='lru', canonical=False):
+        """Initializes the UCTCustomBot.
+        
+        Args:
+            player_id: player id
+            rng: random number generator
+            num_simulations: number of simulations to run per move, or None to only use time_limit
+            time_limit: seconds to search per move, or None to only use num_simulations
+            num_rollouts: number of rollouts to perform for value estimation
+            exploration_constant: weight of the exploration term in UCB
+            graph_capacity: number of nodes the value graph keeps, or None to keep every node
+            eviction_policy: 'lru' or 'visits', which nodes the value graph evicts first when it is over capacity
+            canonical: whether to search canonical GOPS states, so that histories reaching the same position share nodes
+        """
+        super().__init__(player_id, rng)
+        self.num_simulations = num_simulations
+        self.time_limit = time_limit
+        self.canonical = canonical
+        self.value_graph = ValueGraph(graph_capacity, eviction_policy)
+        self.action_enumerator = GOPSActionEnumerator()
+        self.opponent_action_enumerator = GOPSOpponentActionEnumerator()
+        self.hidden_state_enumerator = GOPSRandomStateEnumerator()
+        self.hidden_state_predictor = GOPSRandomStatePredictor()
+        self.forward_transitor = GOPSForwardTransitor()
+        self.utility_estimator = UtilityEstimatorMean()
+        self.value_heuristic = GOPSRandomRolloutValueHeuristic(num_rollouts=num_rollouts, rng=self.rng)
+        self.search = UCTSearch(self.forward_transitor, self.value_heuristic, self.action_enumerator,
+                                self.hidden_state_enumerator, self.hidden_state_predictor,
+                                self.opponent_action_enumerator, self.utility_estimator,
+                                exploration_constant=exploration_constant, rng=self.rng)
+
+    def step(self, state: GOPSState):
+        """Returns the action to be taken by this bot in the given state."""
+
+        if self.canonical:
+            state = state.to_canonical()
+
+        # run simulations from the state
+        self.value_graph.reroot(state)
+        self.search.expand(self.value_graph, state, num_simulations=self.num_simulations, time_limit=self.time_limit)
+
+        # then get the most visited action
+        action = self.search.get_best_action(self.value_graph, state)
+
+        return action - 1 # subtract 1 because OpenSpiel actions are 0-indexed
+
+class CFRCustomBot(CustomBot):
+
+    def __init__(self, player_id, num_cards, rng=None, num_iterations=1000, time_limit=None, strategy_file=None):
+        """Initializes the CFRCustomBot, which plays the average strategy of GOPSCFRSolver without searching.
+
+        The whole game is solved when the bot is created, which is only practical for small numbers of cards.
+
+        Args:
+            player_id: player id
+            num_cards: number of cards in each deck or hand
+            rng: random number generator
+            num_iterations: number of CFR+ iterations to run
+            time_limit: seconds to run CFR+ for, or None to only use num_iterations
+            strategy_file: .npz file to load the strategy from if it exists, otherwise the strategy is solved and saved to it
+        """
+        super().__init__(player_id, rng)
+        self.solver = GOPSCFRSolver(GOPSState('stochastic', (), (), (), num_cards))
+        if strategy_file is not None and os.path.exists(strategy_file):
+            self.solver.load(strategy_file)
+        else:
+            self.solver.solve(num_iterations, time_limit)
+            if strategy_file is not None:
+                self.solver.save(strategy_file)
+
+    def step(self, state: GOPSState):
+        """Returns the action to be taken by this bot in the given state."""
+
+        # the second player is shown the first player's card of the round, which is not part of the position
+        if len(state.player_cards) > len(state.opponent_cards):
+            state = GOPSState(state.state_type, state.prize_cards, state.player_cards[:-1], state.opponent_cards, state.num_cards)
 
-        # then get the best action from the value graph
-        action = self.value_graph.get_best_action(state)
+        # sample from the average strategy, or uniformly from the hand if the position was not solved
+        card_to_prob = self.solver.get_average_strategy(state, player=self.player_id)
+        if card_to_prob is None:
+            played_cards = state.player_cards if self.player_id == 0 else state.opponent_cards
+            hand = [card for card in range(1, state.num_cards + 1) if card not in played_cards]
+            card_to_prob = {card: 1.0 / len(hand) for card in hand}
+        cards = list(card_to_prob)
+        action = cards[self.rng.choice(len(cards), p=list(card_to_prob.values()))]
 
         return action - 1 # subtract 1 because OpenSpiel actions are 0-indexed
@@ -6,6 +6,10 @@ import itertools
 import warnings
 from typing import List, Dict, Tuple
 from .agent import Agent
+from .belief_tracker import BeliefTracker
+
+# team preferences within this of the maximum count as ties
+PREFERENCE_TOLERANCE = 1e-9
 
 
 class NaiveAgent(Agent):
@@ -141,9 +145,9 @@ class NaiveMinion(NaiveAgent):
             [i for i in range(self.config.num_players) if self.player_sides[i] == 0 and i != self.id],
             num_fails - 1) + [self.id]
 
-        # propose a random team that includes evil_team and y-x good player(s), where y is number of players required for this mission
+        # propose a random team that includes evil_team and y-x player(s) not known to be evil (Oberon is unknown), where y is number of players required for this mission
         return frozenset(random.sample(
-            [i for i in range(self.config.num_players) if i not in evil_team and self.player_sides[i] == 1],
+            [i for i in range(self.config.num_players) if i not in evil_team and self.player_sides[i] != 0],
             self.config.num_players_for_quest[mission_id] - num_fails) + evil_team)
 
 
@@ -186,14 +190,14 @@ class NaiveAssassin(NaiveAgent):
             [i for i in range(self.config.num_players) if self.player_sides[i] == 0 and i != self.id],
             num_fails - 1) + [self.id]
 
-        # propose a random team that includes evil_team and y-x good player(s), where y is number of players required for this mission
+        # propose a random team that includes evil_team and y-x player(s) not known to be evil (Oberon is unknown), where y is number of players required for this mission
         return frozenset(random.sample(
-            [i for i in range(self.config.num_players) if i not in evil_team and self.player_sides[i] == 1],
+            [i for i in range(self.config.num_players) if i not in evil_team and self.player_sides[i] != 0],
             self.config.num_players_for_quest[mission_id] - num_fails) + evil_team)
 
     async def assassinate(self, **kwargs):
-        # assassinate a random good player
-        return random.choice([i for i in range(self.config.num_players) if self.player_sides[i] == 1])
+        # assassinate a random player not known to be evil
+        return random.choice([i for i in range(self.config.num_players) if self.player_sides[i] != 0])
 
 
 class NaiveMerlin(NaiveAgent):
@@ -237,10 +241,14 @@ class NaiveServant(NaiveAgent):
             role=role,
             sides=sides
         )
+        self.init_beliefs(lexigraphic)
 
-        # maintain a list of all possible combinations of player sides
-        self.possible_player_sides = self.generate_possible_player_sides(self.player_sides, self.config.num_evil)
-        self.player_side_probabilities = [1 / len(self.possible_player_sides)] * len(self.possible_player_sides)
+    def init_beliefs(self, lexigraphic: bool = True):
+        '''
+        initializes the beliefs over player sides and the team preferences from the known player sides
+        '''
+        # maintain beliefs over all possible combinations of player sides
+        self.belief_tracker = BeliefTracker(self.player_sides, self.config.num_evil)
 
         # generate team preferences for first mission
         self.team_preferences = self.generate_team_preferences(0)
@@ -250,55 +258,12 @@ class NaiveServant(NaiveAgent):
 
         self.lexigraphic = lexigraphic
 
-    def generate_possible_player_sides(self, sides: List[int], num_evils: int):
-        '''Util func of NaiveServant
-        
-        generates a list of all possible combinations of player sides given a list of known sides and unknown sides recursively as well number of unknown evils
-        '''
-        out = []
-        # if there are no unknown sides, return the list of sides   
-        if -1 not in sides:
-            return [sides]
-        else:
-            # find the first unknown side
-            unknown_index = sides.index(-1)
-            unknown_count = sum([1 for side in sides if side == -1])
-            num_good = unknown_count - num_evils
-            # recurse on the two possible sides
-            for side in [0, 1]:
-                if side == 0 and num_evils == 0:
-                    continue
-                if side == 1 and num_good == 0:
-                    continue
-                sides_copy = sides.copy()
-                sides_copy[unknown_index] = side
-                if side == 0:
-                    out.extend(self.generate_possible_player_sides(sides_copy, num_evils - 1))
-                else:
-                    out.extend(self.generate_possible_player_sides(sides_copy, num_evils))
-            return out
-
     def generate_team_preferences(self, mission_id: int):
         '''
-        generates preferences across mission teams specified by mission_id
+        generates preferences across mission teams specified by mission_id, i.e. the probability that each team is all good
         '''
-        team_size = self.config.num_players_for_quest[mission_id]
-        # generate list of all possible teams of size team_size, where team should be a set of player ids
-        teams = [frozenset(team) for team in itertools.combinations(range(self.config.num_players), team_size)]
-
-        # maintain a list of preferences for each team, and set all preferences to 0
-        team_preferences = [0] * len(teams)
-
-        # iterate over possible player sides and side probabilities
-        for sides, prob in zip(self.possible_player_sides, self.player_side_probabilities):
-            # iterate over possible teams
-            for team in teams:
-                # if team is all good in sides, increment team preference by prob of side
-                if all([sides[i] == 1 for i in team]):
-                    team_preferences[teams.index(team)] += prob
-
         # return dictionary mapping teams to preferences
-        return dict(zip(teams, team_preferences))
+        return self.belief_tracker.get_team_preferences(self.config.num_players_for_quest[mission_id])
 
     def find_most_prefered_teams(self, team_to_preferences: Dict):
         '''
@@ -306,9 +271,9 @@ class NaiveServant(NaiveAgent):
         '''
         # find the maximum preference
         max_preference = max(team_to_preferences.values())
-        # return a list of all teams with maximum preference
+        # return a list of all teams with maximum preference, up to floating point error
         max_teams = [frozenset(team) for team, preference in team_to_preferences.items() if
-                     preference == max_preference]
+                     preference >= max_preference - PREFERENCE_TOLERANCE]
         # if there is only one team with maximum preference, return it
         if len(max_teams) == 1:
             return max_teams
@@ -373,19 +338,8 @@ class NaiveServant(NaiveAgent):
             if self.largest_successful_team is None or len(team) > len(self.largest_successful_team):
                 self.largest_successful_team = team
 
-        # set the probability of all sides that have less than num_fails evil players on the team to 0
-        for sides, prob in zip(self.possible_player_sides, self.player_side_probabilities):
-            if sum([sides[i] == 0 for i in team]) < num_fails:
-                self.player_side_probabilities[self.possible_player_sides.index(sides)] = 0
-
-        # normalize probabilities TODO: threre could be situations where sum(self.player_side_probabilities) = 0; should take a look
-        try:
-            self.player_side_probabilities = [prob / sum(self.player_side_probabilities) for prob in
-                                              self.player_side_probabilities]
-        except:
-            self.player_side_probabilities = [0.25 for _ in range(len(self.player_side_probabilities))]
-        # print('side probs', self.player_side_probabilities)
-        # print(self.possible_player_sides)
+        # set the probability of all sides that have less than num_fails evil players on the team to 0, and normalize
+        self.belief_tracker.observe_mission(team, num_fails)
 
         # generate team preferences for next mission, if there is one
         if mission_id < len(self.config.num_players_for_quest) - 1:
@@ -394,25 +348,109 @@ class NaiveServant(NaiveAgent):
 
     async def get_believed_sides(self, **kwargs):
         '''
-        Return marginal distribution of each player being good based on self.player_side_probabilities and self.possible_player_sides
+        Return marginal distribution of each player being good based on the beliefs over player sides
         '''
-        # initialize marginal distribution to 0
-        marginal_distribution = [0] * self.config.num_players
-        # iterate over possible player sides and side probabilities
-        for sides, prob in zip(self.possible_player_sides, self.player_side_probabilities):
-            # iterate over players
-            for i in range(self.config.num_players):
-                # if player is good in sides, increment marginal distribution by prob of side
-                if sides[i] == 1:
-                    marginal_distribution[i] += prob
-        return marginal_distribution
+        return self.belief_tracker.get_marginals()
+
+
+
+class NaivePercival(NaiveServant):
+    r"""Plays like a servant, but also uses that exactly one of the players it sees as Merlin is good.
+
+    `merlin_candidates` are the players Percival sees as Merlin (Merlin and Morgana, if she is in the game).
+    """
+
+    def __init__(self, id: int, name: str, config: AvalonBasicConfig, side: int = 1, role: int = 1,
+                 sides: List[int] = None, merlin_candidates: List[int] = None, lexigraphic: bool = True, **configs):
+        assert role == 1
+        NaiveAgent.__init__(
+            self,
+            id=id,
+            name=name,
+            config=config,
+            side=side,
+            role=role,
+            sides=sides
+        )
+        self.merlin_candidates = merlin_candidates or []
+        self.init_beliefs(lexigraphic)
+
+        # Merlin is good and Morgana is evil, so all but one of the candidates are evil
+        if len(self.merlin_candidates) > 1:
+            self.belief_tracker.observe_num_evil(self.merlin_candidates, len(self.merlin_candidates) - 1)
+            self.team_preferences = self.generate_team_preferences(0)
+
+
+class NaiveMorgana(NaiveMinion):
+    r"""Plays like a minion. Appearing as Merlin to Percival needs no action from the agent."""
+
+    def __init__(self, id: int, name: str, config: AvalonBasicConfig, side: int = 0, role_name: str = "Morgana",
+                 role: int = 2, sides: List[int] = None, **configs):
+        assert role == 2
+        NaiveAgent.__init__(
+            self,
+            id=id,
+            name=name,
+            config=config,
+            side=side,
+            role=role,
+            sides=sides
+        )
+
+
+class NaiveMordred(NaiveMinion):
+    r"""Plays like a minion. Being hidden from Merlin needs no action from the agent."""
+
+    def __init__(self, id: int, name: str, config: AvalonBasicConfig, side: int = 0, role_name: str = "Mordred",
+                 role: int = 3, sides: List[int] = None, **configs):
+        assert role == 3
+        NaiveAgent.__init__(
+            self,
+            id=id,
+            name=name,
+            config=config,
+            side=side,
+            role=role,
+            sides=sides
+        )
+
+
+class NaiveOberon(NaiveMinion):
+    r"""Evil player that does not know the other evil players, so it cannot coordinate fails with them."""
+
+    def __init__(self, id: int, name: str, config: AvalonBasicConfig, side: int = 0, role_name: str = "Oberon",
+                 role: int = 4, sides: List[int] = None, **configs):
+        assert role == 4
+        NaiveAgent.__init__(
+            self,
+            id=id,
+            name=name,
+            config=config,
+            side=side,
+            role=role,
+            sides=sides
+        )
+
+    async def vote_on_mission(self, mission_id: int, team: frozenset, **kwargs):
+        # always fail, since the other evil players on the team are unknown
+        return 0
+
+    async def propose_team(self, mission_id: int, **kwargs):
+        # propose a random team that includes Oberon
+        return frozenset(
+            random.sample([i for i in range(self.config.num_players) if i != self.id],
+                          self.config.num_players_for_quest[mission_id] - 1) + [self.id])
 
 
 NAIVEAGENT_FINDER = {
     'Servant': NaiveServant,
     'Merlin': NaiveMerlin,
+    'Percival': NaivePercival,
     'Assassin': NaiveAssassin,
-    'Minion': NaiveMinion
+    'Minion': NaiveMinion,
+    'Morgana': NaiveMorgana,
+    'Mordred': NaiveMordred,
+    'Oberon': NaiveOberon
 }
 
 
@@ -433,7 +471,9 @@ def find_naive_agent(**configs):
         oberon=configs["oberon"],
         num_good=configs["num_good"],
         num_evil=configs["num_evil"],
-        seed=configs["seed"]
+        seed=configs["seed"],
+        sides=configs.get("sides"),
+        merlin_candidates=configs.get("merlin_candidates")
     )
 
 
@@ -0,0 +1,90 @@
+import itertools
+from functools import lru_cache
+from typing import Dict, List
+
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def get_team_members(num_players: int, team_size: int):
+    r"""Return the teams of `team_size` players, in the order of `itertools.combinations`, and a
+    (teams x players) 0/1 matrix of their members. Shared by all trackers, since it only depends on the arguments"""
+    teams = [frozenset(team) for team in itertools.combinations(range(num_players), team_size)]
+    members = np.zeros((len(teams), num_players))
+    for row, team in enumerate(teams):
+        members[row, list(team)] = 1
+    return teams, members
+
+
+class BeliefTracker:
+    r"""Bayesian beliefs over the side assignments of the players, backed by NumPy arrays.
+
+    The assignments consistent with the known sides are stored once as a boolean matrix, and the beliefs as a
+    probability vector over its rows. Observations only update the probability vector, and the preferences over
+    teams of a given size are a single matrix product with a cached (teams x assignments) matrix.
+
+    Args:
+        sides (List[int]): The known sides of the players, -1 for unknown, 0 for evil and 1 for good.
+        num_evil (int): The number of evil players in the game.
+    """
+
+    def __init__(self, sides: List[int], num_evil: int):
+        self.num_players = len(sides)
+        sides = np.array([-1 if side == -1 else int(side) for side in sides])
+        unknown = np.nonzero(sides == -1)[0]
+        num_unknown_evil = num_evil - int(np.sum(sides == 0))
+
+        # one row per choice of the unknown evil players, True for good players
+        evil_choices = list(itertools.combinations(unknown, num_unknown_evil))
+        if not evil_choices:
+            raise ValueError(f"No side assignment has {num_evil} evil players and the known sides {sides.tolist()}")
+        self.assignments = np.tile(sides == 1, (len(evil_choices), 1))
+        self.assignments[:, unknown] = True
+        rows = np.repeat(np.arange(len(evil_choices)), num_unknown_evil)
+        self.assignments[rows, np.array(evil_choices, dtype=np.int64).ravel()] = False
+        self.probabilities = np.full(len(self.assignments), 1 / len(self.assignments))
+
+        # team size -> (teams, (teams x assignments) matrix of whether each team is all good)
+        self._teams = {}
+
+    def get_teams(self, team_size: int):
+        r"""Return the teams of `team_size` players, in the order of `itertools.combinations`, and their all-good matrix"""
+        if team_size not in self._teams:
+            teams, members = get_team_members(self.num_players, team_size)
+            # a team is all good in an assignment if none of its members is evil
+            all_good = (members @ (~self.assignments).T.astype(np.float64)) == 0
+            self._teams[team_size] = (teams, all_good.astype(np.float64))
+        return self._teams[team_size]
+
+    def get_team_preferences(self, team_size: int) -> Dict[frozenset, float]:
+        r"""Return a dictionary mapping each team of `team_size` players to the probability that it is all good"""
+        teams, all_good = self.get_teams(team_size)
+        return dict(zip(teams, (all_good @ self.probabilities).tolist()))
+
+    def observe_mission(self, team: frozenset, num_fails: int):
+        r"""Condition the beliefs on `num_fails` fails in a mission of `team`
+
+        Assignments with fewer evil players on the team than fails become impossible. If no assignment is
+        left, the beliefs are reset to uniform.
+        """
+        num_evil_on_team = np.sum(~self.assignments[:, list(team)], axis=1)
+        self.probabilities[num_evil_on_team < num_fails] = 0
+        self._normalize()
+
+    def _normalize(self):
+        r"""Normalize the probabilities, or reset them to uniform if no assignment is possible"""
+        total = self.probabilities.sum()
+        if total > 0:
+            self.probabilities /= total
+        else:
+            self.probabilities[:] = 1 / len(self.probabilities)
+
+    def observe_num_evil(self, players: List[int], num_evil: int):
+        r"""Condition the beliefs on exactly `num_evil` of `players` being evil (e.g. Percival's Merlin candidates)"""
+        num_evil_in_players = np.sum(~self.assignments[:, list(players)], axis=1)
+        self.probabilities[num_evil_in_players != num_evil] = 0
+        self._normalize()
+
+    def get_marginals(self) -> List[float]:
+        r"""Return the marginal probability of each player being good"""
+        return (self.probabilities @ self.assignments).tolist()
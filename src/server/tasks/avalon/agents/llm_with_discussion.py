@@ -39,10 +39,11 @@ class LLMAgentWithDiscussion(Agent):
 
     def see_sides(self, sides):
         self.player_sides = sides
+        # unknown sides (-1) are equally likely to be good or evil
         if self.side == 1:
-            self.infer_relation = sides
+            self.infer_relation = [0.5 if side == -1 else side for side in sides]
         else:
-            self.infer_relation = [1 - side for side in sides]
+            self.infer_relation = [0.5 if side == -1 else 1 - side for side in sides]
 
     async def initialize_game_info(self, player_list) -> None:
         """Initiliaze the game info for the agent, which includes game introduction, role, and reveal information for different roles."""
@@ -32,7 +32,7 @@ class AvalonBasicConfig(BaseModel):
 
     Method:
         :method:`from_num_players` (@classmethod): instantiate the class from number of players
-        :method:`from_presets` (@classmethod): instantiate the class from presets
+        :method:`from_presets` (@classmethod): instantiate the class from presets, with the role flags set from the role names
     """
 
     QUEST_PRESET: ClassVar = {5: [[3, 2], [2, 3, 2, 3, 3], [1, 1, 1, 1, 1], ],
@@ -64,7 +64,19 @@ class AvalonBasicConfig(BaseModel):
 
     @classmethod
     def from_num_players(cls, num_players: int, **kwargs) -> 'AvalonBasicConfig':
+        r"""Instantiate the class from number of players, with the role flags in `kwargs`
+
+        Raises a ValueError if there is no preset for `num_players`, or if the evil special roles leave no evil
+        player to be the Assassin, since :method:`AvalonGameEnvironment.assign_roles` gives every evil slot a role
+        """
+        if num_players not in cls.QUEST_PRESET:
+            raise ValueError(f"Games with {num_players} players are not supported, "
+                             f"the number of players must be one of {list(cls.QUEST_PRESET)}")
         num_evil = cls.QUEST_PRESET[num_players][0][1]
+        evil_special_roles = [role_name for role_name in ["morgana", "mordred", "oberon"] if kwargs.get(role_name)]
+        if num_evil < 1 + len(evil_special_roles):
+            raise ValueError(f"Games with {num_players} players have {num_evil} evil players, too few for the Assassin "
+                             f"and {', '.join(role_name.capitalize() for role_name in evil_special_roles)}")
         num_good = num_players - num_evil
         num_players_for_quest = cls.QUEST_PRESET[num_players][1]
         num_fails_for_quest = cls.QUEST_PRESET[num_players][2]
@@ -82,6 +94,7 @@ class AvalonBasicConfig(BaseModel):
     @classmethod
     def from_presets(cls, presets: Dict) -> 'AvalonBasicConfig':
         num_players = presets['num_players']
+        role_names = presets['role_names']
 
         num_evil = cls.QUEST_PRESET[num_players][0][1]
         num_good = num_players - num_evil
@@ -89,6 +102,11 @@ class AvalonBasicConfig(BaseModel):
         num_fails_for_quest = cls.QUEST_PRESET[num_players][2]
 
         return cls(
+            merlin="Merlin" in role_names,
+            percival="Percival" in role_names,
+            morgana="Morgana" in role_names,
+            mordred="Mordred" in role_names,
+            oberon="Oberon" in role_names,
             num_players=num_players,
             num_good=num_good,
             num_evil=num_evil,
@@ -109,33 +127,39 @@ class AvalonGameEnvironment():
     - role_names (List[str]): List of role names for each player
     - num_players (int): Number of players in the game
     - quest_leader (int): The id of the quest leader
+
+    Pass `verbose=False` to the constructor to create the environment without printing (e.g. for headless simulation)
     """
 
-    def __init__(self, config: AvalonBasicConfig) -> None:
+    def __init__(self, config: AvalonBasicConfig, verbose: bool = True) -> None:
         for key, value in config.dict().items():
             setattr(self, key, value)
 
         self.config = config
 
         if not self.preset_flag:
-            print("New Game!")
+            if verbose:
+                print("New Game!")
             self.reset()
 
     @classmethod
-    def from_num_players(cls, num_players: Dict) -> 'AvalonGameEnvironment':
+    def from_num_players(cls, num_players: int) -> 'AvalonGameEnvironment':
         r"""Instantiate the environment with number of players"""
         config = AvalonBasicConfig.from_num_players(num_players)
-        cls.config = config
 
         return cls(config)
 
     @classmethod
-    def from_presets(cls, presets: Dict) -> 'AvalonGameEnvironment':
-        r"""Instantiate the environment with game presets"""
+    def from_presets(cls, presets: Dict, verbose: bool = True) -> 'AvalonGameEnvironment':
+        r"""Instantiate the environment with game presets
+
+        The presets are applied to the new instance only, so several games can be played concurrently
+        """
         config = AvalonBasicConfig.from_presets(presets)
-        cls.config = config
+        env = cls(config, verbose=verbose)
 
-        print(presets)
+        if verbose:
+            print(presets)
 
         num_players = presets['num_players']
         quest_leader = presets['quest_leader']
@@ -147,24 +171,24 @@ class AvalonGameEnvironment():
             if role in ["Morgana", "Mordred", "Oberon", "Minion", "Assassin"]:
                 is_good[idx] = False
 
-        cls.roles = np.array(role_ids)
-        cls.role_names = role_names
-        cls.is_good = np.array(is_good)
-        cls.quest_leader = quest_leader
+        env.roles = np.array(role_ids)
+        env.role_names = role_names
+        env.is_good = np.array(is_good)
+        env.quest_leader = quest_leader
 
-        cls.round = 0
-        cls.quest = 0
-        cls.phase = 0
-        cls.turn = 0
-        cls.done = False
-        cls.good_victory = False
+        env.round = 0
+        env.quest = 0
+        env.phase = 0
+        env.turn = 0
+        env.done = False
+        env.good_victory = False
 
-        cls.quest_results = []
-        cls.quest_team = []
-        cls.team_votes = []
-        cls.quest_votes = []
+        env.quest_results = []
+        env.quest_team = []
+        env.team_votes = []
+        env.quest_votes = []
 
-        return cls(config)
+        return env
 
     def reset(self):
         '''
@@ -245,15 +269,41 @@ class AvalonGameEnvironment():
 
     def get_partial_sides(self, player):
         '''
-        returns list of the sides of other players that player knows
+        returns list of the sides of other players that player knows: 1 for good, 0 for evil, -1 for unknown
+        - Merlin sees the evil players except Mordred
+        - evil players except Oberon see each other, but not Oberon
+        - Oberon, Percival and Servants only know their own side (Percival's view of Merlin is in get_merlin_candidates)
+        if a player sees every evil player, the remaining players are known to be good
         '''
+        role = self.roles[player]
+        evil_players = np.where(~np.asarray(self.is_good, dtype=bool))[0]
 
-        # if player is Merlin or evil, return all sides
-        if self.roles[player] == 0 or not self.is_good[player]:
-            return self.is_good
-        # otherwise return list of -1 for unknown
+        if role == 0:
+            visible_evil = [i for i in evil_players if self.roles[i] != 3]
+        elif not self.is_good[player] and role != 4:
+            visible_evil = [i for i in evil_players if self.roles[i] != 4]
         else:
-            return [-1 if i != player else 1 for i in range(self.num_players)]
+            visible_evil = [player] if not self.is_good[player] else []
+
+        # players that are not seen as evil are known to be good only if all evil players are seen
+        others = 1 if len(visible_evil) == len(evil_players) else -1
+        sides = [others] * self.num_players
+        for i in visible_evil:
+            sides[i] = 0
+        sides[player] = int(self.is_good[player])
+        # without Morgana, Percival sees only Merlin, who is good
+        merlin_candidates = self.get_merlin_candidates(player)
+        if len(merlin_candidates) == 1:
+            sides[merlin_candidates[0]] = 1
+        return sides
+
+    def get_merlin_candidates(self, player):
+        '''
+        returns list of the players that player sees as Merlin: Merlin and Morgana for Percival, empty for other roles
+        '''
+        if self.roles[player] != 1:
+            return []
+        return [i for i in range(self.num_players) if self.roles[i] in (0, 2)]
 
     def get_phase(self):
         '''
@@ -445,6 +495,228 @@ class AvalonGameEnvironment():
         return (self.phase, self.done, False)
 
 
+class BatchedAvalonGameEnvironment():
+    r"""Avalon game environment that holds a batch of games in NumPy arrays and steps them together.
+
+    Every game in the batch has the same configuration. Teams are bitmasks over player ids
+    (bit `i` set if player `i` is on the team), and each transition takes one action per game as an array.
+    Transitions step the games selected by a boolean mask `games`. If `games` is None, they step every
+    game that is not done and is in the corresponding phase.
+
+    State (arrays of length `batch_size` unless noted):
+        roles, is_good: (batch_size, num_players) role ids and sides of the players
+        phase, round, turn, quest_leader: as in :class:`AvalonGameEnvironment`
+        done, good_victory: whether each game ended, and whether good won it
+        quest_team: bitmask of the current quest team
+        team_votes: (batch_size, num_players) the last team votes of each game
+        num_team_approvals: number of approvals in the last team vote
+        quest_results: (batch_size, MAX_ROUNDS) results of the quests, -1 if not played, 0 if failed, 1 if succeeded
+        num_quest_fails: number of fails in the last quest vote
+        num_successes, num_failures: number of quests that succeeded and failed
+    """
+
+    def __init__(self, config: AvalonBasicConfig, batch_size: int, seed: Optional[int] = None) -> None:
+        self.config = config
+        self.batch_size = batch_size
+        self.num_players = config.num_players
+        self.num_players_for_quest = np.array(config.num_players_for_quest)
+        self.num_fails_for_quest = np.array(config.num_fails_for_quest)
+        self.rng = np.random.default_rng(seed)
+
+        # role deck that is shuffled between the players of each game
+        evil_roles = [7] + [role for role, flag in [(2, config.morgana), (3, config.mordred), (4, config.oberon)] if flag]
+        evil_roles += [6] * (config.num_evil - len(evil_roles))
+        good_roles = [role for role, flag in [(0, config.merlin), (1, config.percival)] if flag]
+        good_roles += [5] * (config.num_good - len(good_roles))
+        self.role_deck = np.array(good_roles + evil_roles)
+        self.side_deck = np.arange(self.num_players) < config.num_good
+
+        # bit of each player in team bitmasks
+        self.player_bits = np.left_shift(1, np.arange(self.num_players, dtype=np.int64))
+
+        self.roles = np.zeros((batch_size, self.num_players), dtype=np.int64)
+        self.is_good = np.zeros((batch_size, self.num_players), dtype=bool)
+        self.phase = np.zeros(batch_size, dtype=np.int64)
+        self.round = np.zeros(batch_size, dtype=np.int64)
+        self.turn = np.zeros(batch_size, dtype=np.int64)
+        self.quest_leader = np.zeros(batch_size, dtype=np.int64)
+        self.done = np.zeros(batch_size, dtype=bool)
+        self.good_victory = np.zeros(batch_size, dtype=bool)
+        self.quest_team = np.zeros(batch_size, dtype=np.int64)
+        self.team_votes = np.zeros((batch_size, self.num_players), dtype=np.int64)
+        self.num_team_approvals = np.zeros(batch_size, dtype=np.int64)
+        self.quest_results = np.full((batch_size, config.MAX_ROUNDS), -1, dtype=np.int64)
+        self.num_quest_fails = np.zeros(batch_size, dtype=np.int64)
+        self.num_successes = np.zeros(batch_size, dtype=np.int64)
+        self.num_failures = np.zeros(batch_size, dtype=np.int64)
+
+        self.reset()
+
+    def reset(self, games: Optional[np.ndarray] = None):
+        r"""Reset the selected games (all games if `games` is None) and reassign their roles
+
+        Returns:
+            np.ndarray: (batch_size, num_players) role ids of all games
+        """
+        if games is None:
+            games = np.ones(self.batch_size, dtype=bool)
+        games = np.asarray(games, dtype=bool)
+        num_games = int(games.sum())
+
+        self.phase[games] = 0
+        self.round[games] = 0
+        self.turn[games] = 0
+        self.done[games] = False
+        self.good_victory[games] = False
+        self.quest_leader[games] = self.rng.integers(0, self.num_players, size=num_games)
+        self.quest_team[games] = 0
+        self.team_votes[games] = 0
+        self.num_team_approvals[games] = 0
+        self.quest_results[games] = -1
+        self.num_quest_fails[games] = 0
+        self.num_successes[games] = 0
+        self.num_failures[games] = 0
+
+        # shuffle the role deck independently for each game
+        permutations = np.argsort(self.rng.random((num_games, self.num_players)), axis=1)
+        self.roles[games] = self.role_deck[permutations]
+        self.is_good[games] = self.side_deck[permutations]
+        return self.roles
+
+    def _select(self, games: Optional[np.ndarray], phase: int, phase_name: str) -> np.ndarray:
+        r"""Return the mask of games to step, checking that they are not done and are in `phase`"""
+        in_phase = (self.phase == phase) & ~self.done
+        if games is None:
+            return in_phase
+        games = np.asarray(games, dtype=bool)
+        if np.any(games & self.done):
+            raise AvalonEnvException("Game ended")
+        if np.any(games & ~in_phase):
+            raise AvalonEnvException(f"Not in {phase_name} phase")
+        return games
+
+    def get_team_size(self) -> np.ndarray:
+        r"""Return the team size of the current quest of each game"""
+        return self.num_players_for_quest[np.minimum(self.turn, len(self.num_players_for_quest) - 1)]
+
+    def get_team_members(self, teams: Optional[np.ndarray] = None) -> np.ndarray:
+        r"""Return a (batch_size, num_players) boolean matrix of the players in `teams` (the current quest teams by default)"""
+        if teams is None:
+            teams = self.quest_team
+        return (np.asarray(teams, dtype=np.int64)[:, None] & self.player_bits) != 0
+
+    def teams_to_bitmasks(self, members: np.ndarray) -> np.ndarray:
+        r"""Return the bitmasks of teams given as a (batch_size, num_players) boolean matrix"""
+        return np.asarray(members, dtype=bool) @ self.player_bits
+
+    def get_assassin(self) -> np.ndarray:
+        r"""Return the assassin of each game"""
+        return np.argmax(self.roles == 7, axis=1)
+
+    def choose_quest_team(self, teams: np.ndarray, games: Optional[np.ndarray] = None) -> np.ndarray:
+        r"""Choose the quest teams of the selected games, proposed by their quest leaders
+
+        Args:
+            teams (np.ndarray): (batch_size,) team bitmasks, only read for the selected games
+            games (np.ndarray): boolean mask of the games to step
+
+        Returns:
+            np.ndarray: the mask of the games that were stepped
+        """
+        games = self._select(games, 0, "team selection")
+        teams = np.asarray(teams, dtype=np.int64)
+        team_sizes = self.get_team_members(teams).sum(axis=1)
+        if np.any(games & (team_sizes != self.get_team_size())):
+            raise AvalonEnvException("Invalid team size")
+
+        self.quest_team[games] = teams[games]
+        self.phase[games] = 1
+        self.quest_leader[games] = (self.quest_leader[games] + 1) % self.num_players
+        return games
+
+    def gather_team_votes(self, votes: np.ndarray, games: Optional[np.ndarray] = None) -> np.ndarray:
+        r"""Gather the team votes of the selected games
+
+        Args:
+            votes (np.ndarray): (batch_size, num_players) votes, 0 for reject and 1 for accept
+            games (np.ndarray): boolean mask of the games to step
+
+        Returns:
+            np.ndarray: whether the team of each game was accepted (False for the games that were not stepped)
+        """
+        games = self._select(games, 1, "team voting")
+        votes = np.asarray(votes, dtype=np.int64)
+        if votes.shape != (self.batch_size, self.num_players):
+            raise AvalonEnvException("Invalid number of votes")
+
+        approvals = votes.sum(axis=1)
+        self.team_votes[games] = votes[games]
+        self.num_team_approvals[games] = approvals[games]
+
+        # the team passes with a strict majority, or automatically in the MAX_ROUNDS round
+        accepted = games & ((approvals > self.num_players / 2) | (self.round == self.config.MAX_ROUNDS - 1))
+        rejected = games & ~accepted
+        self.phase[accepted] = 2
+        self.round[accepted] = 0
+        self.phase[rejected] = 0
+        self.round[rejected] += 1
+        return accepted
+
+    def gather_quest_votes(self, votes: np.ndarray, games: Optional[np.ndarray] = None):
+        r"""Gather the quest votes of the selected games
+
+        Args:
+            votes (np.ndarray): (batch_size, num_players) votes, 0 for fail and 1 for pass. Only the votes of the
+                players on the quest team are counted
+            games (np.ndarray): boolean mask of the games to step
+
+        Returns:
+            (np.ndarray, np.ndarray): whether the quest of each game succeeded, and the number of fails
+        """
+        games = self._select(games, 2, "quest voting")
+        votes = np.asarray(votes, dtype=np.int64)
+        if votes.shape != (self.batch_size, self.num_players):
+            raise AvalonEnvException("Invalid number of votes")
+
+        num_fails = np.sum(self.get_team_members() & (votes == 0), axis=1)
+        succeeded = games & (num_fails < self.num_fails_for_quest[np.minimum(self.turn, len(self.num_fails_for_quest) - 1)])
+        failed = games & ~succeeded
+
+        indices = np.nonzero(games)[0]
+        self.quest_results[indices, self.turn[indices]] = succeeded[indices]
+        self.num_quest_fails[games] = num_fails[games]
+        self.num_successes += succeeded
+        self.num_failures += failed
+        self.turn[games] += 1
+
+        # evil wins after 3 failed quests, assassination after 3 successful quests, team selection otherwise
+        evil_wins = failed & (self.num_failures == 3)
+        self.done[evil_wins] = True
+        self.good_victory[evil_wins] = False
+        self.phase[games & ~evil_wins] = 0
+        self.phase[succeeded & (self.num_successes == 3)] = 3
+        return succeeded, np.where(games, num_fails, 0)
+
+    def choose_assassination_target(self, targets: np.ndarray, games: Optional[np.ndarray] = None) -> np.ndarray:
+        r"""Assassinate the targets of the assassins of the selected games, which ends them
+
+        Args:
+            targets (np.ndarray): (batch_size,) ids of the targets
+            games (np.ndarray): boolean mask of the games to step
+
+        Returns:
+            np.ndarray: whether good won each game (False for the games that were not stepped)
+        """
+        games = self._select(games, 3, "assassination")
+        targets = np.asarray(targets, dtype=np.int64)
+
+        merlin_killed = self.roles[np.arange(self.batch_size), targets] == 0
+        good_wins = games & ~merlin_killed & (self.num_successes >= 3)
+        self.done[games] = True
+        self.good_victory[games] = good_wins[games]
+        return good_wins
+
+
 if __name__ == "__main__":
     config = AvalonBasicConfig.from_num_players(5)
     env = AvalonGameEnvironment.from_presets({
@@ -458,6 +730,16 @@ if __name__ == "__main__":
     env = AvalonGameEnvironment.from_num_players(5)
 
     print(env.get_role(0))
+
+    # play a batch of games with random actions
+    env = BatchedAvalonGameEnvironment(AvalonBasicConfig.from_num_players(5), batch_size=1000, seed=0)
+    while not env.done.all():
+        members = np.argsort(env.rng.random((env.batch_size, env.num_players)), axis=1) < env.get_team_size()[:, None]
+        env.choose_quest_team(env.teams_to_bitmasks(members))
+        env.gather_team_votes(env.rng.integers(0, 2, size=(env.batch_size, env.num_players)))
+        env.gather_quest_votes(env.is_good | env.rng.integers(0, 2, size=(env.batch_size, env.num_players)))
+        env.choose_assassination_target(env.rng.integers(0, env.num_players, size=env.batch_size))
+    print(f"Good wins {env.good_victory.mean():.3f} of {env.batch_size} random games")
     # print(config.dict())
     # print(env.roles)
     # print(env.is_good)
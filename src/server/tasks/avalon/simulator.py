@@ -0,0 +1,244 @@
+import random
+import time
+from multiprocessing import Pool
+from typing import Dict, List
+
+import numpy as np
+
+from .engine import AvalonBasicConfig, AvalonGameEnvironment
+from .agents.baseline_agents import NAIVEAGENT_FINDER
+
+
+def run_sync(coroutine):
+    r"""Run a coroutine of a naive agent to completion without an event loop.
+
+    The naive agents implement the async agent interface but never await anything, so their coroutines
+    finish on the first `send`. Raises a RuntimeError for agents that do suspend (e.g. LLM agents).
+    """
+    try:
+        coroutine.send(None)
+    except StopIteration as stop:
+        return stop.value
+    coroutine.close()
+    raise RuntimeError("Agent suspended; headless simulation only supports agents that do not await")
+
+
+def create_naive_agents(env: AvalonGameEnvironment, agent_finder: Dict = NAIVEAGENT_FINDER) -> List:
+    r"""Create one naive agent per player of the current game in `env`.
+
+    Each agent sees the sides its role reveals, as in `AvalonBench.start_sample`.
+    """
+    # NaiveAgent.__init__ reseeds `random`, so keep the simulation's random stream going across games
+    random_state = random.getstate()
+    agents = []
+    for i, (role_i, role_name, side) in enumerate(env.get_roles()):
+        agents.append(agent_finder[role_name](
+            id=i,
+            name=f"Player {i}",
+            config=env.config,
+            side=int(side),
+            role=int(role_i),
+            sides=env.get_partial_sides(i),
+            merlin_candidates=env.get_merlin_candidates(i),
+        ))
+    random.setstate(random_state)
+    return agents
+
+
+def play_game(env: AvalonGameEnvironment, agents: List) -> Dict:
+    r"""Play the current game in `env` to the end with `agents`, without discussion or I/O.
+
+    Returns:
+        Dict: The outcome of the game, with keys
+            - good_victory (bool): Whether good won
+            - assassinated (bool | None): Whether Merlin was assassinated, None if there was no assassination
+            - quest_results (List[bool]): The results of the quests
+            - teams_rejected (int): The number of proposed teams that were rejected
+    """
+    teams_rejected = 0
+    assassinated = None
+    while not env.done:
+        phase = env.phase
+        # team selection
+        if phase == 0:
+            leader = env.get_quest_leader()
+            team = run_sync(agents[leader].propose_team(
+                team_size=env.get_team_size(),
+                mission_id=env.turn,
+                discussion_history=[]
+            ))
+            env.choose_quest_team(team=frozenset(team), leader=leader)
+
+        # team voting
+        elif phase == 1:
+            team = frozenset(env.get_current_quest_team())
+            mission_id = env.turn
+            votes = [run_sync(agent.vote_on_team(team=team, mission_id=mission_id, discussion_history=[]))
+                     for agent in agents]
+            outcome = env.gather_team_votes(votes)
+            if not outcome[2]:
+                teams_rejected += 1
+            for agent in agents:
+                run_sync(agent.observe_team_result(mission_id=mission_id, team=team, votes=votes, outcome=outcome[2]))
+
+        # quest voting
+        elif phase == 2:
+            team = frozenset(env.get_current_quest_team())
+            mission_id = env.turn
+            votes = [run_sync(agents[i].vote_on_mission(team=team, mission_id=mission_id, discussion_history=[]))
+                     for i in team]
+            outcome = env.gather_quest_votes(votes)
+            for agent in agents:
+                run_sync(agent.observe_mission(team=team, mission_id=mission_id, num_fails=outcome[3], votes=votes,
+                                               outcome=outcome[2]))
+
+        # assassination
+        elif phase == 3:
+            assassin = env.get_assassin()
+            target = int(run_sync(agents[assassin].assassinate()))
+            env.choose_assassination_target(assassin, target)
+            assassinated = bool(env.roles[target] == 0)
+
+    return {
+        "good_victory": bool(env.good_victory),
+        "assassinated": assassinated,
+        "quest_results": list(env.quest_results),
+        "teams_rejected": teams_rejected,
+    }
+
+
+def _empty_counts(config: AvalonBasicConfig) -> Dict:
+    num_quests = len(config.num_players_for_quest)
+    return {
+        "num_games": 0,
+        "good_wins": 0,
+        "evil_wins_by_quests": 0,
+        "evil_wins_by_assassination": 0,
+        "assassinations": 0,
+        "quests_played": [0] * num_quests,
+        "quests_succeeded": [0] * num_quests,
+        "teams_rejected": 0,
+        "games_by_role": {},
+        "wins_by_role": {},
+    }
+
+
+def _merge_counts(counts: Dict, other: Dict) -> Dict:
+    for key, value in other.items():
+        if isinstance(value, list):
+            counts[key] = [a + b for a, b in zip(counts[key], value)]
+        elif isinstance(value, dict):
+            for role_name, count in value.items():
+                counts[key][role_name] = counts[key].get(role_name, 0) + count
+        else:
+            counts[key] += value
+    return counts
+
+
+def _simulate_counts(num_games: int, num_players: int, seed: int, config_kwargs: Dict) -> Dict:
+    r"""Play `num_games` games in one process and return the raw counts"""
+    np.random.seed(seed)
+    random.seed(seed)
+
+    config = AvalonBasicConfig.from_num_players(num_players, **config_kwargs)
+    env = AvalonGameEnvironment(config, verbose=False)
+    counts = _empty_counts(config)
+
+    for game in range(num_games):
+        if game > 0:
+            env.reset()
+        agents = create_naive_agents(env)
+        result = play_game(env, agents)
+
+        counts["num_games"] += 1
+        if result["good_victory"]:
+            counts["good_wins"] += 1
+        elif result["assassinated"]:
+            counts["evil_wins_by_assassination"] += 1
+        else:
+            counts["evil_wins_by_quests"] += 1
+        if result["assassinated"] is not None:
+            counts["assassinations"] += 1
+        for quest, succeeded in enumerate(result["quest_results"]):
+            counts["quests_played"][quest] += 1
+            counts["quests_succeeded"][quest] += int(succeeded)
+        counts["teams_rejected"] += result["teams_rejected"]
+
+        for agent in agents:
+            role_name = config.ROLES[agent.role]
+            counts["games_by_role"][role_name] = counts["games_by_role"].get(role_name, 0) + 1
+            if bool(agent.side) == result["good_victory"]:
+                counts["wins_by_role"][role_name] = counts["wins_by_role"].get(role_name, 0) + 1
+
+    return counts
+
+
+def simulate_games(num_games: int, num_players: int = 5, seed: int = 0, num_workers: int = 1,
+                   **config_kwargs) -> Dict:
+    r"""Play `num_games` games between naive agents headlessly and return aggregate statistics.
+
+    Roles are reassigned at random for every game. Unlike `AvalonBench.start_sample`, games run in a tight loop
+    without the multi-agent proxy, sessions, discussion or printing. Raises a ValueError before playing any game if
+    the role flags leave no evil player to be the Assassin.
+
+    Args:
+        num_games (int): Number of games to play
+        num_players (int): Number of players in each game
+        seed (int): Seed of the random number generators. Worker k is seeded with `seed + k`
+        num_workers (int): Number of processes to split the games over
+        **config_kwargs: Role flags passed to :method:`AvalonBasicConfig.from_num_players`
+
+    Returns:
+        Dict: The counts of wins, assassinations and quests, and the rates derived from them
+    """
+    # validate the players and role flags here rather than in every worker
+    AvalonBasicConfig.from_num_players(num_players, **config_kwargs)
+    if num_workers <= 1:
+        counts = _simulate_counts(num_games, num_players, seed, config_kwargs)
+    else:
+        games_per_worker = [num_games // num_workers + (k < num_games % num_workers) for k in range(num_workers)]
+        with Pool(num_workers) as pool:
+            worker_counts = pool.starmap(_simulate_counts, [(games, num_players, seed + k, config_kwargs)
+                                                            for k, games in enumerate(games_per_worker)])
+        counts = worker_counts[0]
+        for other in worker_counts[1:]:
+            _merge_counts(counts, other)
+
+    num_games = max(counts["num_games"], 1)
+    counts["good_win_rate"] = counts["good_wins"] / num_games
+    counts["evil_win_rate_by_quests"] = counts["evil_wins_by_quests"] / num_games
+    counts["evil_win_rate_by_assassination"] = counts["evil_wins_by_assassination"] / num_games
+    counts["assassination_success_rate"] = counts["evil_wins_by_assassination"] / max(counts["assassinations"], 1)
+    counts["quest_success_rate"] = [succeeded / max(played, 1) for played, succeeded in
+                                    zip(counts["quests_played"], counts["quests_succeeded"])]
+    counts["avg_teams_rejected"] = counts["teams_rejected"] / num_games
+    counts["win_rate_by_role"] = {role_name: counts["wins_by_role"].get(role_name, 0) / games
+                                  for role_name, games in counts["games_by_role"].items()}
+    return counts
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Simulate games between naive Avalon agents")
+    parser.add_argument("--num_games", type=int, default=1000)
+    parser.add_argument("--num_players", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--num_workers", type=int, default=1)
+    for role_name in ["percival", "morgana", "mordred", "oberon"]:
+        parser.add_argument(f"--{role_name}", action="store_true", help=f"Include {role_name.capitalize()} in the game")
+    args = parser.parse_args()
+    try:
+        AvalonBasicConfig.from_num_players(args.num_players, percival=args.percival, morgana=args.morgana,
+                                           mordred=args.mordred, oberon=args.oberon)
+    except ValueError as error:
+        parser.error(str(error))
+
+    start = time.time()
+    stats = simulate_games(args.num_games, num_players=args.num_players, seed=args.seed,
+                           num_workers=args.num_workers, percival=args.percival, morgana=args.morgana,
+                           mordred=args.mordred, oberon=args.oberon)
+    elapsed = time.time() - start
+    print(json.dumps(stats, indent=4))
+    print(f"{args.num_games} games in {elapsed:.2f}s ({args.num_games / elapsed:.0f} games/s)")
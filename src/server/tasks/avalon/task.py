@@ -48,6 +48,12 @@ class AvalonBench(Task):
         self.inputs = data_object
 
         self.seed = configs.pop('seed', 0)
+        # whether to print the games as they are played
+        self.verbose = configs.pop('verbose', True)
+
+    def _print(self, *args, **kwargs):
+        if self.verbose:
+            print(*args, **kwargs)
 
     def calculate_overall(self, results: List[TaskOutput]) -> Dict[str, Any]:
         outputs = [None for _ in range(len(self.data))]
@@ -59,10 +65,12 @@ class AvalonBench(Task):
         valid_games = 0
         for result in results:
             if result.status == SampleStatus.COMPLETED:
-                llm_idx = result.result['llm_idx']
-                if result.result[f'Player_{llm_idx}_wins']:
-                    win_counter += 1
-                deduc_acc += result.result[f'Player_{llm_idx}_deduc_acc']
+                for id, is_llm in enumerate(result.result['llm_idx']):
+                    if not is_llm:
+                        continue
+                    if result.result[f'Player_{id}_wins']:
+                        win_counter += 1
+                    deduc_acc += result.result.get(f'Player_{id}_deduc_acc', 0)
                 valid_games += 1
 
         return {
@@ -79,7 +87,7 @@ class AvalonBench(Task):
         proxy = MultiAgentProxy(session, self.num_players)
         sessions = [SessionWrapper(FakeSession(), proxy) for _ in range(self.num_players)]
         proxy.initialize_sessions(sessions)
-        env = AvalonGameEnvironment.from_presets(self.inputs[index])
+        env = AvalonGameEnvironment.from_presets(self.inputs[index], verbose=self.verbose)
         scoring = AvalonScoring(env.config)
 
         true_player_sides = []
@@ -95,7 +103,7 @@ class AvalonBench(Task):
                 f"Number of players {num_players} doesn't match number of sessions {len(sessions)}"
             )
 
-        # Initialize players. Please remember to let Merlin and Evil players see the sides of all players.
+        # Initialize players. Please remember to let Merlin and Evil players see the sides of the players they know.
         for i, (role_i, role_name, side) in enumerate(env.get_roles()):
             player_list.append(AGENT_FINDER[self.agent_list[i]](
                 id=i,
@@ -116,12 +124,12 @@ class AvalonBench(Task):
                 discussion=self.discussion,
                 prompt=self.prompt,
                 sides=env.get_partial_sides(i),
+                merlin_candidates=env.get_merlin_candidates(i),
                 seed=self.seed  # TODO: seed
             ))
-            # If the player is Merlin or Evil, let them see the sides of all players.
-            player_sides = [side for _, _, side in env.get_roles()]
+            # If the player is Merlin or Evil, let them see the sides of the players their role reveals.
             if player_list[i].role == 0 or player_list[i].side == 0:
-                player_list[i].see_sides(player_sides)
+                player_list[i].see_sides(env.get_partial_sides(i))
                 await player_list[i].initialize_game_info(player_list=env.get_roles())
             else:
                 await player_list[i].initialize_game_info(player_list=[])
@@ -131,24 +139,24 @@ class AvalonBench(Task):
         try:
             while not env.done:
                 phase = env.get_phase()[0]
-                print()
-                print(ColorMessage.orange(f"##### Mission {env.turn}, Round {env.round} #####"))
+                self._print()
+                self._print(ColorMessage.orange(f"##### Mission {env.turn}, Round {env.round} #####"))
                 discussion_history = []
                 # if phase is team selection phase, ask for team
                 if phase == 0:
                     leader = env.get_quest_leader()
                     game_env_log.append(f"Selection Phase, the leader is Player {leader}")
-                    print()
-                    print(ColorMessage.cyan(f"##### System #####"))
-                    print()
-                    print(f"Selection Phase, the leader is Player {leader}")
+                    self._print()
+                    self._print(ColorMessage.cyan(f"##### System #####"))
+                    self._print()
+                    self._print(f"Selection Phase, the leader is Player {leader}")
                     """
                     Leader speaks & Discussion
                     """
                     discussion_history = []
                     if self.discussion:
                         # Leader speaks
-                        print(f"Discussion")
+                        self._print(f"Discussion")
                         game_env_log.append("Discussion")
                         proxy.set_current_agent(leader)
                         team, statement = await player_list[leader].team_discussion(
@@ -161,19 +169,19 @@ class AvalonBench(Task):
                         )
                         game_env_log.append(f"Leader {leader} : " + statement)
                         discussion_history.append(f"Leader {leader} : " + statement + '\n')
-                        print()
-                        print(ColorMessage.cyan(f"##### LLM Agent (Player {leader}) #####"))
-                        print()
-                        print(ColorMessage.blue(f"Said: {statement}"))
+                        self._print()
+                        self._print(ColorMessage.cyan(f"##### LLM Agent (Player {leader}) #####"))
+                        self._print()
+                        self._print(ColorMessage.blue(f"Said: {statement}"))
 
                         # Discussion (sequential, once, in order for now) and Summarize
                         for idx, player in enumerate(player_list):
                             proxy.set_current_agent(idx)
                             if idx == leader:
                                 continue
-                            print()
-                            print(ColorMessage.cyan(f"##### LLM Agent (Player {idx}) #####"))
-                            print()
+                            self._print()
+                            self._print(ColorMessage.cyan(f"##### LLM Agent (Player {idx}) #####"))
+                            self._print()
                             discussion = await player.team_discussion(
                                 team_size=env.get_team_size(),
                                 team=team,
@@ -182,7 +190,7 @@ class AvalonBench(Task):
                                 mission_id=env.turn, round_id=env.round
                             )
                             discussion_history.append(f"Player {idx} : " + discussion + '\n')
-                            print(ColorMessage.blue(f"{discussion}"))
+                            self._print(ColorMessage.blue(f"{discussion}"))
                             game_env_log.append(f"Player {idx} : " + discussion)
 
                         for idx, player in enumerate(player_list):
@@ -202,24 +210,24 @@ class AvalonBench(Task):
                             mission_id=env.turn,
                             discussion_history=discussion_history
                         )
-                    print(ColorMessage.cyan(f"##### Discussion End #####"))
+                    self._print(ColorMessage.cyan(f"##### Discussion End #####"))
                     env.choose_quest_team(
                         team=frozenset(team),
                         leader=leader
                     )
                     game_env_log.append(f"Leader Player {leader} chooses team {list(team)}")
-                    print()
-                    print(ColorMessage.cyan(f"##### System #####"))
-                    print()
-                    print(f"Leader Player {leader} chooses team {list(team)}")
+                    self._print()
+                    self._print(ColorMessage.cyan(f"##### System #####"))
+                    self._print()
+                    self._print(f"Leader Player {leader} chooses team {list(team)}")
 
                 # if phase is team voting phase, ask for votes
                 elif phase == 1:
                     game_env_log.append("Team Voting Phase")
-                    print()
-                    print(ColorMessage.cyan(f"##### System #####"))
-                    print()
-                    print("Team voting Phase")
+                    self._print()
+                    self._print(ColorMessage.cyan(f"##### System #####"))
+                    self._print()
+                    self._print("Team voting Phase")
                     votes = []
                     for i in range(num_players):
                         proxy.set_current_agent(i)
@@ -229,7 +237,7 @@ class AvalonBench(Task):
                             discussion_history=discussion_history
                         )
                         votes.append(vote)
-                        print(ColorMessage.cyan(f"Player {i} votes {vote}."))
+                        self._print(ColorMessage.cyan(f"Player {i} votes {vote}."))
 
                     # votes = [
                     #     await player_list[i].vote_on_team(
@@ -253,20 +261,20 @@ class AvalonBench(Task):
                     game_env_log.append(
                         "Team result: " + verbalize_team_result(team=env.get_current_quest_team(), votes=votes,
                                                                 outcome=outcome[2]))
-                    print()
-                    print(ColorMessage.cyan(f"##### System #####"))
-                    print()
-                    print("Team result: " + verbalize_team_result(team=env.get_current_quest_team(), votes=votes,
+                    self._print()
+                    self._print(ColorMessage.cyan(f"##### System #####"))
+                    self._print()
+                    self._print("Team result: " + verbalize_team_result(team=env.get_current_quest_team(), votes=votes,
                                                                   outcome=outcome[2]))
 
 
                 # if phase is quest voting phase, ask for votes
                 elif phase == 2:
                     game_env_log.append("Quest Voting Phase")
-                    print()
-                    print(ColorMessage.cyan(f"##### System #####"))
-                    print()
-                    print("Quest Voting Phase")
+                    self._print()
+                    self._print(ColorMessage.cyan(f"##### System #####"))
+                    self._print()
+                    self._print("Quest Voting Phase")
                     '''
                     TODO: Can have a discussion before voting on quest
                     '''
@@ -304,17 +312,17 @@ class AvalonBench(Task):
 
                     game_env_log.append("Quest result: " + verbalize_mission_result(team=env.get_current_quest_team(),
                                                                                     outcome=outcome[2]))
-                    print()
-                    print(ColorMessage.cyan(f"##### System #####"))
-                    print()
-                    print("Quest result: " + verbalize_mission_result(team=env.get_current_quest_team(),
+                    self._print()
+                    self._print(ColorMessage.cyan(f"##### System #####"))
+                    self._print()
+                    self._print("Quest result: " + verbalize_mission_result(team=env.get_current_quest_team(),
                                                                       outcome=outcome[2]))
 
                     # reflect sides of each player at the end of the game
-                    print()
-                    print(ColorMessage.cyan(f"##### System #####"))
-                    print()
-                    print("Reflect sides of each player")
+                    self._print()
+                    self._print(ColorMessage.cyan(f"##### System #####"))
+                    self._print()
+                    self._print("Reflect sides of each player")
                     for idx, player in enumerate(player_list):
                         proxy.set_current_agent(idx)
                         if self.agent_list[idx] == "llm":
@@ -326,10 +334,10 @@ class AvalonBench(Task):
                 # if phase is assassination phase, ask for assassination
                 elif phase == 3:
                     game_env_log.append("Assassination phase")
-                    print()
-                    print(ColorMessage.cyan(f"##### System #####"))
-                    print()
-                    print("Assassination phase")
+                    self._print()
+                    self._print(ColorMessage.cyan(f"##### System #####"))
+                    self._print()
+                    self._print("Assassination phase")
                     '''
                         TODO: Discussion before Assassination Phase
                     '''
@@ -339,10 +347,10 @@ class AvalonBench(Task):
 
                     _, _, assassinated = env.choose_assassination_target(assassin, target)
                     game_env_log.append(f"Assassin Player {assassin} chooses to assassinate Player {target}")
-                    print()
-                    print(ColorMessage.cyan(f"##### System #####"))
-                    print()
-                    print(f"Assassin Player {assassin} chooses to assassinate Player {target}")
+                    self._print()
+                    self._print(ColorMessage.cyan(f"##### System #####"))
+                    self._print()
+                    self._print(f"Assassin Player {assassin} chooses to assassinate Player {target}")
             # reflect sides of each player at the end of the game
             for idx, player in enumerate(player_list):
                 proxy.set_current_agent(idx)
@@ -416,7 +424,8 @@ class AvalonBench(Task):
         result = {"game_result": verbal_game_result[answer],
                   "llm_idx": llm_idx, "game_env_log": game_env_log,
                   "chat-log": chat_log}
-        for id in llm_idx:
+        # llm_idx is a mask over the players, so record every player under its own index
+        for id in range(self.num_players):
             result[f"role_of_Player_{id}"] = player_list[id].role_name
             result[f"Player_{id}_wins"] = (answer > 0) == bool(player_list[id].side)
         return TaskSampleExecutionResult(status=finish_reason, result=result)
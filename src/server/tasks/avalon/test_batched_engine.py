@@ -0,0 +1,119 @@
+import unittest
+
+import numpy as np
+
+from .engine import AvalonBasicConfig, AvalonGameEnvironment, BatchedAvalonGameEnvironment
+
+
+class TestBatchedEngine(unittest.TestCase):
+    BATCH_SIZE = 200
+
+    def make_scalar_envs(self, batched):
+        r"""Create one scalar environment per batched game, with the same presets"""
+        envs = []
+        for game in range(batched.batch_size):
+            envs.append(AvalonGameEnvironment.from_presets({
+                "num_players": batched.num_players,
+                "quest_leader": int(batched.quest_leader[game]),
+                "role_names": [batched.config.ROLES[role] for role in batched.roles[game]],
+            }, verbose=False))
+        return envs
+
+    def assert_same_state(self, batched, envs):
+        for game, env in enumerate(envs):
+            self.assertEqual(env.done, batched.done[game])
+            self.assertEqual(env.phase, batched.phase[game])
+            self.assertEqual(env.turn, batched.turn[game])
+            self.assertEqual(env.round, batched.round[game])
+            self.assertEqual(env.quest_leader, batched.quest_leader[game])
+            self.assertEqual(env.quest_results, [bool(result) for result in batched.quest_results[game] if result >= 0])
+            if env.done:
+                self.assertEqual(env.good_victory, batched.good_victory[game])
+
+    def play_lockstep(self, num_players, partial, **role_flags):
+        r"""Play random games in the batched and the scalar environments and compare them after every step.
+
+        If `partial`, every step only selects a random subset of the games in its phase.
+        """
+        config = AvalonBasicConfig.from_num_players(num_players, **role_flags)
+        batched = BatchedAvalonGameEnvironment(config, self.BATCH_SIZE, seed=num_players)
+        envs = self.make_scalar_envs(batched)
+        rng = np.random.default_rng(num_players)
+
+        def select(phase):
+            games = (batched.phase == phase) & ~batched.done
+            if partial:
+                games &= rng.random(self.BATCH_SIZE) < 0.5
+            return games
+
+        while not batched.done.all():
+            # team selection
+            games = select(0)
+            members = np.argsort(rng.random((self.BATCH_SIZE, num_players)), axis=1) < batched.get_team_size()[:, None]
+            batched.choose_quest_team(batched.teams_to_bitmasks(members), games)
+            for game in np.nonzero(games)[0]:
+                team = frozenset(np.nonzero(members[game])[0].tolist())
+                envs[game].choose_quest_team(team, envs[game].quest_leader)
+            self.assert_same_state(batched, envs)
+
+            # team voting
+            games = select(1)
+            votes = rng.integers(0, 2, (self.BATCH_SIZE, num_players))
+            accepted = batched.gather_team_votes(votes, games)
+            for game in range(self.BATCH_SIZE):
+                if games[game]:
+                    self.assertEqual(envs[game].gather_team_votes(votes[game].tolist())[2], accepted[game])
+                else:
+                    self.assertFalse(accepted[game])
+            self.assert_same_state(batched, envs)
+
+            # quest voting, evil players fail at random
+            games = select(2)
+            votes = batched.is_good | rng.integers(0, 2, (self.BATCH_SIZE, num_players)).astype(bool)
+            succeeded, num_fails = batched.gather_quest_votes(votes, games)
+            for game in np.nonzero(games)[0]:
+                team = sorted(envs[game].get_current_quest_team())
+                outcome = envs[game].gather_quest_votes([int(votes[game, player]) for player in team])
+                self.assertEqual(outcome[2], succeeded[game])
+                self.assertEqual(outcome[3], num_fails[game])
+            self.assert_same_state(batched, envs)
+
+            # assassination
+            games = select(3)
+            targets = rng.integers(0, num_players, self.BATCH_SIZE)
+            good_wins = batched.choose_assassination_target(targets, games)
+            for game in np.nonzero(games)[0]:
+                outcome = envs[game].choose_assassination_target(envs[game].get_assassin(), int(targets[game]))
+                self.assertEqual(outcome[2], good_wins[game])
+            self.assert_same_state(batched, envs)
+
+        # both sides won some games
+        self.assertTrue(batched.good_victory.any())
+        self.assertFalse(batched.good_victory.all())
+
+    def test_lockstep(self):
+        for num_players in [5, 7, 10]:
+            with self.subTest(num_players=num_players):
+                self.play_lockstep(num_players, partial=False)
+
+    def test_lockstep_partial_masks(self):
+        for num_players in [5, 7, 10]:
+            with self.subTest(num_players=num_players):
+                self.play_lockstep(num_players, partial=True, percival=True, morgana=True)
+
+    def test_reset_partial(self):
+        config = AvalonBasicConfig.from_num_players(5)
+        batched = BatchedAvalonGameEnvironment(config, self.BATCH_SIZE, seed=0)
+        batched.choose_quest_team(np.full(self.BATCH_SIZE, 0b11))
+        games = np.arange(self.BATCH_SIZE) % 2 == 0
+        batched.reset(games)
+        np.testing.assert_array_equal(batched.phase, np.where(games, 0, 1))
+        np.testing.assert_array_equal(batched.quest_team, np.where(games, 0, 0b11))
+        # every game has the roles of the configuration
+        role_decks = np.tile(np.sort(batched.role_deck), (self.BATCH_SIZE, 1))
+        np.testing.assert_array_equal(np.sort(batched.roles, axis=1), role_decks)
+        np.testing.assert_array_equal(batched.is_good.sum(axis=1), config.num_good)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import itertools
+import random
+import unittest
+
+import numpy as np
+
+from .agents.belief_tracker import BeliefTracker
+
+
+class EnumeratedBeliefs:
+    r"""Reference beliefs that enumerate the side assignments as lists, as NaiveServant did before BeliefTracker"""
+
+    def __init__(self, sides, num_evil):
+        unknown = [i for i, side in enumerate(sides) if side == -1]
+        num_unknown_evil = num_evil - sides.count(0)
+        self.possible_sides = []
+        for evil in itertools.combinations(unknown, num_unknown_evil):
+            self.possible_sides.append([0 if i in evil else (1 if side == -1 else side)
+                                        for i, side in enumerate(sides)])
+        self.probabilities = [1 / len(self.possible_sides)] * len(self.possible_sides)
+
+    def get_team_preferences(self, num_players, team_size):
+        teams = [frozenset(team) for team in itertools.combinations(range(num_players), team_size)]
+        preferences = [0] * len(teams)
+        for sides, prob in zip(self.possible_sides, self.probabilities):
+            for t, team in enumerate(teams):
+                if all(sides[i] == 1 for i in team):
+                    preferences[t] += prob
+        return dict(zip(teams, preferences))
+
+    def observe_mission(self, team, num_fails):
+        for s, sides in enumerate(self.possible_sides):
+            if sum(sides[i] == 0 for i in team) < num_fails:
+                self.probabilities[s] = 0
+        total = sum(self.probabilities)
+        self.probabilities = [prob / total for prob in self.probabilities]
+
+    def get_marginals(self, num_players):
+        return [sum(prob for sides, prob in zip(self.possible_sides, self.probabilities) if sides[i] == 1)
+                for i in range(num_players)]
+
+
+class TestBeliefTracker(unittest.TestCase):
+
+    def assert_same_beliefs(self, tracker, reference, num_players, team_sizes):
+        np.testing.assert_allclose(tracker.get_marginals(), reference.get_marginals(num_players))
+        for team_size in team_sizes:
+            preferences = tracker.get_team_preferences(team_size)
+            reference_preferences = reference.get_team_preferences(num_players, team_size)
+            self.assertEqual(list(preferences), list(reference_preferences))
+            np.testing.assert_allclose(list(preferences.values()), list(reference_preferences.values()))
+
+    def test_matches_enumeration(self):
+        rng = random.Random(0)
+        for num_players, num_evil, team_sizes in [(5, 2, [2, 3]), (7, 3, [2, 3, 4]), (10, 4, [3, 4, 5])]:
+            for _ in range(20):
+                # a servant knows their own side, other players may be known to be good
+                sides = [-1] * num_players
+                for i in rng.sample(range(num_players), rng.randint(1, 2)):
+                    sides[i] = 1
+                true_evil = rng.sample([i for i, side in enumerate(sides) if side == -1], num_evil)
+                tracker = BeliefTracker(sides, num_evil)
+                reference = EnumeratedBeliefs(sides, num_evil)
+                self.assert_same_beliefs(tracker, reference, num_players, team_sizes)
+
+                # observe missions that are consistent with the true sides
+                for team_size in team_sizes:
+                    team = frozenset(rng.sample(range(num_players), team_size))
+                    num_fails = rng.randint(0, len(team & set(true_evil)))
+                    tracker.observe_mission(team, num_fails)
+                    reference.observe_mission(team, num_fails)
+                    self.assert_same_beliefs(tracker, reference, num_players, team_sizes)
+
+    def test_known_sides(self):
+        tracker = BeliefTracker([1, 0, -1, -1, -1], 2)
+        marginals = tracker.get_marginals()
+        self.assertEqual(marginals[:2], [1.0, 0.0])
+        np.testing.assert_allclose(marginals[2:], [2 / 3] * 3)
+        with self.assertRaises(ValueError):
+            BeliefTracker([0, 0, 0, -1, -1], 2)
+
+    def test_observe_num_evil(self):
+        # Percival knows that exactly one of the Merlin candidates is evil (Morgana)
+        tracker = BeliefTracker([1, -1, -1, -1, -1, -1, -1], 3)
+        tracker.observe_num_evil([1, 2], 1)
+        marginals = tracker.get_marginals()
+        np.testing.assert_allclose(marginals[1:3], [0.5, 0.5])
+        np.testing.assert_allclose(marginals[3:], [0.5] * 4)
+        np.testing.assert_allclose(tracker.get_team_preferences(2)[frozenset([1, 2])], 0.0)
+
+    def test_contradictory_observation_resets_to_uniform(self):
+        tracker = BeliefTracker([1, -1, -1, -1, -1], 2)
+        # only players 3 and 4 can be evil, then a mission without them fails
+        tracker.observe_mission(frozenset([0, 1, 2]), 0)
+        tracker.observe_mission(frozenset([3, 4]), 2)
+        tracker.observe_mission(frozenset([0, 1, 2]), 1)
+        # every assignment is equally likely again, instead of the fixed 0.25 of the enumeration
+        np.testing.assert_allclose(tracker.probabilities, np.full(6, 1 / 6))
+        self.assertAlmostEqual(sum(tracker.probabilities), 1.0)
+        np.testing.assert_allclose(tracker.get_marginals(), [1.0, 0.5, 0.5, 0.5, 0.5])
+
+
+if __name__ == "__main__":
+    unittest.main()
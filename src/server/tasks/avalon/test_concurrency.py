@@ -0,0 +1,109 @@
+import asyncio
+import json
+import os
+import random
+import tempfile
+import unittest
+from unittest import mock
+
+from src.server.task import Session
+from src.typings import SampleStatus
+
+from . import task as avalon_task
+from .agents.baseline_agents import find_naive_agent
+from .engine import AvalonGameEnvironment
+from .task import AvalonBench
+
+
+class YieldingAgent:
+    r"""Wraps a naive agent and yields to the event loop before every async call, so that concurrent games interleave"""
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    def __getattr__(self, name):
+        attr = getattr(self.agent, name)
+        if not asyncio.iscoroutinefunction(attr):
+            return attr
+
+        async def yielding(*args, **kwargs):
+            await asyncio.sleep(0)
+            return await attr(*args, **kwargs)
+        return yielding
+
+
+def find_yielding_naive_agent(**configs):
+    return YieldingAgent(find_naive_agent(**configs))
+
+
+class TestConcurrentGames(unittest.TestCase):
+    NUM_GAMES = 300
+    ROLE_NAMES = ["Merlin", "Servant", "Servant", "Minion", "Assassin"]
+
+    def setUp(self):
+        rng = random.Random(0)
+        self.presets = []
+        for _ in range(self.NUM_GAMES):
+            role_names = self.ROLE_NAMES.copy()
+            rng.shuffle(role_names)
+            self.presets.append({"num_players": 5, "quest_leader": rng.randint(0, 4), "role_names": role_names})
+
+        data_file = tempfile.NamedTemporaryFile("w", suffix=".json", delete=False)
+        with data_file:
+            json.dump(self.presets, data_file)
+        self.addCleanup(os.remove, data_file.name)
+
+        self.task = AvalonBench(name="avalon-concurrency-test", concurrency=self.NUM_GAMES, num_players=5,
+                                agent_list=["naive"] * 5, discussion=False, data_file=data_file.name, verbose=False)
+
+    def test_from_presets_is_per_instance(self):
+        envs = [AvalonGameEnvironment.from_presets(presets, verbose=False) for presets in self.presets[:2]]
+        for env, presets in zip(envs, self.presets):
+            self.assertEqual([env.config.ROLES[role] for role in env.roles], presets["role_names"])
+            self.assertEqual(env.quest_leader, presets["quest_leader"])
+        envs[0].quest_results.append(True)
+        self.assertEqual(envs[1].quest_results, [])
+        self.assertFalse(hasattr(AvalonGameEnvironment, "roles"))
+
+    def test_concurrent_games(self):
+        async def run_all():
+            return await asyncio.gather(*[self.task.start_sample(index, Session())
+                                          for index in self.task.get_indices()])
+
+        with mock.patch.dict(avalon_task.AGENT_FINDER, {"naive": find_yielding_naive_agent}):
+            results = asyncio.run(run_all())
+
+        for presets, output in zip(self.presets, results):
+            self.assertEqual(output.status, SampleStatus.COMPLETED, output.result.get("error"))
+            result = output.result
+            log = result["game_env_log"]
+
+            # each game kept its own roles and first leader
+            for id, role_name in enumerate(presets["role_names"]):
+                self.assertEqual(result[f"role_of_Player_{id}"], role_name)
+                good_player = role_name in ("Merlin", "Servant")
+                self.assertEqual(result[f"Player_{id}_wins"], good_player == (result["game_result"] == "Good wins!"))
+            self.assertEqual(log[0], f"Selection Phase, the leader is Player {presets['quest_leader']}")
+
+            # each game ended exactly when its own quests decided it
+            quest_results = [entry.startswith("Quest result: The mission succeeded") for entry in log
+                             if isinstance(entry, str) and entry.startswith("Quest result")]
+            if result["game_result"] == "Evil wins by mission!":
+                self.assertEqual(quest_results.count(False), 3)
+                self.assertLess(quest_results.count(True), 3)
+                self.assertFalse(quest_results[-1])
+            else:
+                self.assertEqual(quest_results.count(True), 3)
+                self.assertLess(quest_results.count(False), 3)
+                self.assertTrue(quest_results[-1])
+                assassination = [entry for entry in log if entry.startswith("Assassin Player")]
+                self.assertEqual(len(assassination), 1)
+                assassin = int(assassination[0].split()[2])
+                target = int(assassination[0].split()[-1])
+                self.assertEqual(presets["role_names"][assassin], "Assassin")
+                merlin_killed = presets["role_names"][target] == "Merlin"
+                self.assertEqual(result["game_result"] == "Evil wins by assassination!", merlin_killed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import asyncio
+import unittest
+
+import yaml
+
+from src.server.task import Session
+from src.typings import SampleStatus
+
+from .engine import AvalonGameEnvironment
+from .task import AvalonBench
+
+
+def make_env(role_names):
+    return AvalonGameEnvironment.from_presets({"num_players": len(role_names), "quest_leader": 0,
+                                               "role_names": role_names}, verbose=False)
+
+
+class TestVisibility(unittest.TestCase):
+    # 10 players with every special role
+    ROLE_NAMES = ["Merlin", "Percival", "Servant", "Servant", "Servant", "Servant",
+                  "Morgana", "Mordred", "Oberon", "Assassin"]
+    MERLIN, PERCIVAL, SERVANT, MORGANA, MORDRED, OBERON, ASSASSIN = 0, 1, 2, 6, 7, 8, 9
+
+    def setUp(self):
+        self.env = make_env(self.ROLE_NAMES)
+
+    def test_merlin(self):
+        sides = self.env.get_partial_sides(self.MERLIN)
+        # Merlin sees Morgana, Oberon and the Assassin, but not Mordred
+        for player in [self.MORGANA, self.OBERON, self.ASSASSIN]:
+            self.assertEqual(sides[player], 0)
+        self.assertEqual(sides[self.MORDRED], -1)
+        # since Mordred is hidden, the other players are not known to be good
+        self.assertEqual(sides[self.SERVANT], -1)
+        self.assertEqual(sides[self.MERLIN], 1)
+
+    def test_evil_players(self):
+        for player in [self.MORGANA, self.MORDRED, self.ASSASSIN]:
+            sides = self.env.get_partial_sides(player)
+            # evil players see each other, but not Oberon
+            for other in [self.MORGANA, self.MORDRED, self.ASSASSIN]:
+                self.assertEqual(sides[other], 0)
+            self.assertEqual(sides[self.OBERON], -1)
+            self.assertEqual(sides[self.MERLIN], -1)
+
+    def test_oberon(self):
+        # Oberon does not see the other evil players
+        sides = self.env.get_partial_sides(self.OBERON)
+        self.assertEqual(sides[self.OBERON], 0)
+        self.assertEqual(sides.count(-1), len(self.ROLE_NAMES) - 1)
+
+    def test_percival(self):
+        self.assertEqual(self.env.get_merlin_candidates(self.PERCIVAL), [self.MERLIN, self.MORGANA])
+        sides = self.env.get_partial_sides(self.PERCIVAL)
+        # with Morgana in the game, Percival does not know which candidate is Merlin
+        self.assertEqual(sides[self.MERLIN], -1)
+        self.assertEqual(sides[self.MORGANA], -1)
+        self.assertEqual(sides[self.PERCIVAL], 1)
+        for player in range(len(self.ROLE_NAMES)):
+            if player != self.PERCIVAL:
+                self.assertEqual(self.env.get_merlin_candidates(player), [])
+
+    def test_percival_without_morgana(self):
+        env = make_env(["Merlin", "Percival", "Servant", "Servant", "Minion", "Minion", "Assassin"])
+        self.assertEqual(env.get_merlin_candidates(1), [0])
+        self.assertEqual(env.get_partial_sides(1)[0], 1)
+
+    def test_servant(self):
+        sides = self.env.get_partial_sides(self.SERVANT)
+        self.assertEqual(sides[self.SERVANT], 1)
+        self.assertEqual(sides.count(-1), len(self.ROLE_NAMES) - 1)
+
+    def test_all_evil_seen(self):
+        # without Mordred and Oberon, Merlin and the evil players know every side
+        role_names = ["Merlin", "Servant", "Servant", "Minion", "Assassin"]
+        env = make_env(role_names)
+        expected = [1, 1, 1, 0, 0]
+        self.assertEqual(env.get_partial_sides(0), expected)
+        self.assertEqual(env.get_partial_sides(3), expected)
+        self.assertEqual(env.get_partial_sides(4), expected)
+
+
+class TestNaiveConfigs(unittest.TestCase):
+
+    def load_task(self, config_name):
+        with open("configs/tasks/avalon.yaml") as f:
+            configs = yaml.safe_load(f)
+        parameters = dict(configs["default"]["parameters"])
+        parameters.update(configs[config_name]["parameters"])
+        return AvalonBench(**parameters, verbose=False)
+
+    def check_games(self, config_name):
+        task = self.load_task(config_name)
+        for index in task.get_indices():
+            output = asyncio.run(task.start_sample(index, Session()))
+            self.assertEqual(output.status, SampleStatus.COMPLETED, output.result.get("error"))
+            self.assertIn(output.result["game_result"], ["Good wins!", "Evil wins by mission!",
+                                                         "Evil wins by assassination!"])
+            for id, role_name in enumerate(task.inputs[index]["role_names"]):
+                self.assertEqual(output.result[f"role_of_Player_{id}"], role_name)
+
+    def test_7_players(self):
+        self.check_games("avalon-dev-naive-7")
+
+    def test_10_players(self):
+        self.check_games("avalon-dev-naive-10")
+
+
+if __name__ == "__main__":
+    unittest.main()
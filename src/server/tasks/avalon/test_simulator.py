@@ -0,0 +1,32 @@
+import unittest
+
+from .engine import AvalonBasicConfig
+from .simulator import simulate_games
+
+
+class TestSimulator(unittest.TestCase):
+
+    def test_role_flags_without_assassin(self):
+        for num_players, role_flags in [(5, dict(percival=True, morgana=True, mordred=True, oberon=True)),
+                                        (7, dict(morgana=True, mordred=True, oberon=True))]:
+            with self.assertRaises(ValueError):
+                AvalonBasicConfig.from_num_players(num_players, **role_flags)
+            # the flags are checked before the games are split over the workers
+            with self.assertRaises(ValueError):
+                simulate_games(10, num_players=num_players, num_workers=2, **role_flags)
+        # 10 players have 4 evil players, enough for the Assassin and the evil special roles
+        AvalonBasicConfig.from_num_players(10, morgana=True, mordred=True, oberon=True)
+
+    def test_unsupported_num_players(self):
+        with self.assertRaises(ValueError):
+            simulate_games(10, num_players=4)
+
+    def test_special_roles(self):
+        stats = simulate_games(20, num_players=7, seed=0, percival=True, morgana=True, mordred=True)
+        self.assertEqual(stats["num_games"], 20)
+        for role_name in ["Merlin", "Percival", "Morgana", "Mordred", "Assassin"]:
+            self.assertEqual(stats["games_by_role"][role_name], 20)
+
+
+if __name__ == "__main__":
+    unittest.main()